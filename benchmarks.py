@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the data pipeline
+Times quote fetching (stub provider), quote table serialization, quote
+snapshot diffing, HTML rendering of dist/index.html, parsing
+processed_pe_data.csv, 13F information-table parsing and the P/E
+statistics over synthetic inputs scaled from 10 to 10,000 symbols and 1x
+to 100x history. Results are stored as JSON so runs from two branches can
+be compared before deploying.
+
+Usage:
+    python benchmarks.py run [--quick] [--filter NAME] [--label LABEL] [--output PATH]
+    python benchmarks.py compare BASE.json NEW.json [--threshold 1.25]
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+RESULTS_DIR = '.cache/benchmarks'
+PAGE_PATH = 'dist/index.html'
+CSV_PATH = 'src/assets/processed_pe_data.csv'
+
+SYMBOLS = (10, 100, 1_000, 10_000)
+HISTORY = (1, 10, 100)
+QUICK_SYMBOLS = (10, 1_000)
+QUICK_HISTORY = (1, 10)
+
+MAX_STATISTICS_CELLS = 20_000_000   # larger (time x symbol) matrices are skipped
+MIN_TIME = 0.5                      # keep repeating a case until this much time has passed
+MAX_REPEATS = 5
+NOISE_FLOOR = 0.001                 # differences below a millisecond are never flagged
+
+
+def measure(fn: Callable[[], object]) -> Dict[str, float]:
+    """Best and median wall time over a few repeats"""
+    times = []
+    while len(times) < MAX_REPEATS and (not times or sum(times) < MIN_TIME):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {'min_s': round(min(times), 6), 'median_s': round(statistics.median(times), 6),
+            'repeats': len(times)}
+
+
+# Each case yields (params, setup) pairs; setup prepares inputs outside the
+# timed region and returns the callable to time
+
+def quote_fetch_cases(symbols, history, workdir) -> Iterator[Tuple[Dict, Callable]]:
+    from quote_fetcher import fetch_quotes
+    from quote_providers import StubProvider
+
+    for size in symbols:
+        def setup(size=size):
+            tickers = [f'SYM{i:05d}' for i in range(size)]
+            provider = StubProvider(0)
+            return lambda: fetch_quotes(tickers, provider, max_workers=8, rate_limit=0)
+        yield {'symbols': size}, setup
+
+
+def quote_table_cases(symbols, history, workdir) -> Iterator[Tuple[Dict, Callable]]:
+    from quote_providers import StubProvider
+    from quote_table import QuoteTable
+
+    for size in symbols:
+        def setup(size=size):
+            provider = StubProvider(0)
+            quotes = {f'SYM{i:05d}': provider.get_info(f'SYM{i:05d}') for i in range(size)}
+            return lambda: QuoteTable.from_quotes(quotes).to_json()
+        yield {'symbols': size}, setup
+
+
+def snapshot_diff_cases(symbols, history, workdir) -> Iterator[Tuple[Dict, Callable]]:
+    from quote_providers import StubProvider
+    from snapshot_delta import DEFAULT_TOLERANCES, diff, quote_record
+
+    for size in symbols:
+        def setup(size=size):
+            provider = StubProvider(0)
+            quotes = {f'SYM{i:05d}': provider.get_info(f'SYM{i:05d}') for i in range(size)}
+            state = {symbol: quote_record(info) for symbol, info in quotes.items()}
+            return lambda: diff(state, quotes, DEFAULT_TOLERANCES)
+        yield {'symbols': size}, setup
+
+
+def html_render_cases(symbols, history, workdir) -> Iterator[Tuple[Dict, Callable]]:
+    from html_renderer import build_index, ensure_slots, render
+
+    with open(PAGE_PATH, 'r', encoding='utf-8') as f:
+        page = ensure_slots(f.read())
+    values = {name: '12.34' for name in {slot.name for slot in build_index(page)}}
+
+    for scale in history:
+        def setup(scale=scale):
+            content = page * scale
+            return lambda: render(content, values)
+        yield {'page_copies': scale}, setup
+
+
+def write_scaled_csv(path: str, scale: int) -> None:
+    """processed_pe_data.csv with its rows repeated scale times on a daily grid"""
+    with open(CSV_PATH, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = [row[1:] for row in reader]
+    stamps = np.datetime64('1900-01-01') + np.arange(len(rows) * scale).astype('timedelta64[D]')
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for stamp, row in zip(stamps, itertools.cycle(rows)):
+            writer.writerow([f'{stamp} 00:00:00.000000000'] + row)
+
+
+def csv_parse_cases(symbols, history, workdir) -> Iterator[Tuple[Dict, Callable]]:
+    from pe_store import PEStore
+
+    for scale in history:
+        def setup(scale=scale):
+            path = os.path.join(workdir, f'pe_{scale}.csv')
+            write_scaled_csv(path, scale)
+            store_path = os.path.join(workdir, f'pe_store_{scale}')
+            return lambda: PEStore.from_csv(path, store_path)
+        yield {'history': scale}, setup
+
+
+def xml_parse_cases(symbols, history, workdir) -> Iterator[Tuple[Dict, Callable]]:
+    from info_table import parse_information_table, write_synthetic_table
+
+    for size in symbols:
+        def setup(size=size):
+            path = os.path.join(workdir, f'infotable_{size}.xml')
+            # Several rows per security, as filers report one per manager
+            write_synthetic_table(path, rows=size * 5, securities=size)
+            return lambda: parse_information_table(path)
+        yield {'symbols': size}, setup
+
+
+def statistics_cases(symbols, history, workdir) -> Iterator[Tuple[Dict, Callable]]:
+    from pe_statistics import compute_statistics
+
+    base_rows = 1_524   # monthly observations in processed_pe_data.csv
+    for size, scale in itertools.product(symbols, history):
+        rows = base_rows * scale
+        if rows * size > MAX_STATISTICS_CELLS:
+            continue
+
+        def setup(size=size, rows=rows):
+            rng = np.random.default_rng(0)
+            matrix = 15 * np.exp(np.cumsum(rng.normal(0, 0.01, (rows, size)), axis=0))
+            matrix[rng.random((rows, size)) < 0.01] = np.nan
+            names = [f'T{i}' for i in range(size)]
+            return lambda: compute_statistics(matrix, names)
+        yield {'symbols': size, 'history': scale}, setup
+
+
+CASES = {
+    'quote_fetch': quote_fetch_cases,
+    'quote_table': quote_table_cases,
+    'snapshot_diff': snapshot_diff_cases,
+    'html_render': html_render_cases,
+    'csv_parse': csv_parse_cases,
+    'xml_parse': xml_parse_cases,
+    'statistics': statistics_cases,
+}
+
+
+def case_id(name: str, params: Dict) -> str:
+    return f"{name}[{','.join(f'{k}={v}' for k, v in params.items())}]"
+
+
+def git_label() -> str:
+    try:
+        branch = subprocess.run(['git', 'rev-parse', '--abbrev-ref', 'HEAD'],
+                                capture_output=True, text=True, check=True).stdout.strip()
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return datetime.now().strftime('%Y%m%dT%H%M%S')
+    return f"{branch.replace('/', '-')}-{commit}"
+
+
+def run_suite(quick: bool = False, name_filter: Optional[str] = None,
+              label: Optional[str] = None) -> Dict:
+    symbols = QUICK_SYMBOLS if quick else SYMBOLS
+    history = QUICK_HISTORY if quick else HISTORY
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, cases in CASES.items():
+            if name_filter and name_filter not in name:
+                continue
+            for params, setup in cases(symbols, history, workdir):
+                timing = measure(setup())
+                key = case_id(name, params)
+                results[key] = {'case': name, 'params': params, **timing}
+                print(f"✓ {key}: {timing['median_s'] * 1000:.2f} ms "
+                      f"(min {timing['min_s'] * 1000:.2f} ms, {timing['repeats']} runs)")
+    return {
+        'label': label or git_label(),
+        'created_at': datetime.now().isoformat(),
+        'quick': quick,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def compare(base: Dict, new: Dict, threshold: float = 1.25) -> List[str]:
+    """
+    Print best-time ratios for cases present in both runs
+
+    The best of several runs is compared since it is the least affected
+    by other load on the machine.
+
+    Returns:
+        Case ids that got slower than threshold x the base
+    """
+    regressions = []
+    print(f"Comparing {new['label']} against {base['label']}")
+    for key, entry in new['results'].items():
+        if key not in base['results']:
+            continue
+        before, after = base['results'][key]['min_s'], entry['min_s']
+        ratio = after / before if before else float('inf')
+        flag = ''
+        if ratio > threshold and after - before > NOISE_FLOOR:
+            flag = ' ⚠️ slower'
+            regressions.append(key)
+        elif ratio < 1 / threshold:
+            flag = ' faster'
+        print(f"  {key}: {before * 1000:.2f} -> {after * 1000:.2f} ms ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description='Data pipeline benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run')
+    run.add_argument('--quick', action='store_true', help='smaller sizes for CI')
+    run.add_argument('--filter', help='only cases whose name contains this')
+    run.add_argument('--label', help='result label, defaults to branch-commit')
+    run.add_argument('--output', help=f'result file, defaults to {RESULTS_DIR}/<label>.json')
+    cmp = commands.add_parser('compare')
+    cmp.add_argument('base')
+    cmp.add_argument('new')
+    cmp.add_argument('--threshold', type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        report = run_suite(args.quick, args.filter, args.label)
+        output = args.output or os.path.join(RESULTS_DIR, f"{report['label']}.json")
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Results written to {output}")
+        return 0
+
+    with open(args.base, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print(f"\n⚠️ {len(regressions)} cases slower than {args.threshold}x")
+        return 1
+    print("\n✓ No slowdowns")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
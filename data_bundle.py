@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Versioned data bundle for the published page
+All market, index and 13F data is written to one compact, content-hashed
+JSON file under dist/data/. The page only carries the bundle URL in a
+data-bundle attribute on <body> and fetches the data itself, so a refresh
+changes one attribute in the HTML and the static shell can be cached forever.
+
+Each updater publishes only its own sections; sections written by other
+updaters are carried over from the current bundle. A publish holds the data
+directory's lock from reading the current bundle to rewriting the pages, so
+overlapping updaters queue instead of dropping each other's sections.
+"""
+
+import glob
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from atomic_io import file_lock, write_atomic, write_json_atomic
+from html_renderer import ensure_slots, render
+
+BUNDLE_VERSION = 1
+DATA_DIR = 'dist/data'
+MANIFEST_FILE = 'manifest.json'
+KEEP_BUNDLES = 5    # older bundles stay available for pages still cached
+
+
+def _manifest_path(data_dir: str) -> str:
+    return os.path.join(data_dir, MANIFEST_FILE)
+
+
+def load_current_bundle(data_dir: str = DATA_DIR) -> Dict:
+    """Return the bundle the manifest points at, or an empty bundle"""
+    try:
+        with open(_manifest_path(data_dir), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        with open(os.path.join(data_dir, manifest['bundle']), 'r', encoding='utf-8') as f:
+            bundle = json.load(f)
+    except (FileNotFoundError, KeyError, ValueError):
+        return {'version': BUNDLE_VERSION}
+    if bundle.get('version') != BUNDLE_VERSION:
+        return {'version': BUNDLE_VERSION}
+    return bundle
+
+
+def encode_bundle(bundle: Dict) -> bytes:
+    """Compact, key-sorted encoding so identical data always hashes the same"""
+    return json.dumps(bundle, sort_keys=True, separators=(',', ':'),
+                      ensure_ascii=False, default=str).encode('utf-8')
+
+
+def content_digest(bundle: Dict) -> str:
+    """Hash of the bundle data, leaving out when it was published"""
+    data = {key: value for key, value in bundle.items() if key != 'updated_at'}
+    return hashlib.sha256(encode_bundle(data)).hexdigest()[:16]
+
+
+def write_bundle(bundle: Dict, data_dir: str = DATA_DIR) -> str:
+    """
+    Write a bundle under its content hash and point the manifest at it
+
+    Returns:
+        Bundle file name relative to data_dir
+    """
+    payload = encode_bundle(bundle)
+    digest = content_digest(bundle)
+    name = f'bundle-{digest}.json'
+    path = os.path.join(data_dir, name)
+
+    # Bundles are immutable once written, so an existing one is kept as is
+    if not os.path.exists(path):
+        write_atomic(path, payload)
+    write_json_atomic(_manifest_path(data_dir),
+                      {'version': BUNDLE_VERSION, 'bundle': name, 'sha256': digest}, indent=2)
+
+    _prune_bundles(data_dir, keep=name)
+    return name
+
+
+def _prune_bundles(data_dir: str, keep: str) -> None:
+    bundles = sorted(glob.glob(os.path.join(data_dir, 'bundle-*.json')),
+                     key=os.path.getmtime, reverse=True)
+    stale = [b for b in bundles if os.path.basename(b) != keep][KEEP_BUNDLES - 1:]
+    for path in stale:
+        os.remove(path)
+
+
+def reference_bundle(html_content: str, url: str) -> str:
+    """Point the page's data-bundle attribute at url"""
+    if 'data-bundle=' not in html_content:
+        html_content = html_content.replace('<body', '<body data-bundle=""', 1)
+    return render(html_content, {'data-bundle': url})
+
+
+def publish(sections: Dict, html_files=('dist/index.html',),
+            data_dir: str = DATA_DIR, page_values: Optional[Dict] = None) -> Optional[str]:
+    """
+    Merge sections into the current bundle, write it and reference it from the pages
+
+    Args:
+        sections: Top-level bundle keys to replace, e.g. {'indices': {...}}
+        html_files: Pages whose data-bundle attribute should be updated
+        data_dir: Directory holding the bundles, relative to the repo root
+        page_values: Extra slot values rendered in the same pass, so each
+            page is written at most once; the page's last-update attribute
+            and data source line are always rendered from updated_at
+
+    Returns:
+        Bundle file name, or None if the data was already published
+    """
+    with file_lock(data_dir):
+        current = load_current_bundle(data_dir)
+        bundle = {**current, **sections, 'version': BUNDLE_VERSION}
+        # updated_at is left out of the hash, so unchanged data leaves the
+        # bundle, manifest and pages untouched
+        if 'updated_at' in current and content_digest(bundle) == content_digest(current):
+            print("✓ Data bundle unchanged, nothing written")
+            return None
+        now = datetime.now(timezone.utc)
+        bundle['updated_at'] = now.isoformat(timespec='seconds')
+        name = write_bundle(bundle, data_dir)
+        values = {
+            **(page_values or {}),
+            'data-last-update': bundle['updated_at'],
+            'data_source': f"Yahoo Finance (更新於 {now:%H:%M} UTC)",
+        }
+
+        for html_file in html_files:
+            if not os.path.exists(html_file):
+                continue
+            # Bundle URLs are relative to the page
+            rel_dir = os.path.relpath(data_dir, os.path.dirname(html_file) or '.')
+            url = f'{rel_dir}/{name}'.replace(os.sep, '/')
+            with open(html_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            write_atomic(html_file, reference_bundle(render(ensure_slots(content), values), url))
+
+    print(f"✓ Data bundle written: {name}")
+    return name
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+SEC EDGAR 13F client
+Reads filing lists from the EDGAR submissions JSON and streams holdings
+from 13F information-table XML over one connection-pooled session. Every
+request goes through a token bucket shared by all threads so parallel fetches
+across many CIKs stay under SEC's 10 requests/second limit.
+
+SEC's fair access policy requires a User-Agent naming a real contact, so
+SEC_USER_AGENT (e.g. "pe-ratio-analysis ops@yourdomain.com") must be set
+for requests to sec.gov. Set EDGAR_BASE_URL to point both data.sec.gov and
+www.sec.gov requests at a local stand-in (see serve_recorded), and
+EDGAR_RECORD_DIR to save every response so it can be served back later.
+"""
+
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+from xml.etree.ElementTree import ParseError
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from info_table import parse_information_table, to_records
+from quote_fetcher import RateLimiter
+from run_metrics import metrics
+
+DATA_URL = 'https://data.sec.gov'
+ARCHIVES_URL = 'https://www.sec.gov'
+SEC_RATE_LIMIT = 10.0           # requests per second across all SEC hosts
+RATE_LIMIT_KEY = 'sec.gov'
+LOCAL_USER_AGENT = 'pe-ratio-analysis local-replay'    # only sent to EDGAR_BASE_URL stand-ins
+# 13F-HR/A is often a partial amendment that would replace the full original
+# in the history and diffs, so only original reports are read
+FORMS_13F = ('13F-HR',)
+
+# Filings accepted from this date report values in dollars, before it in thousands
+DOLLAR_VALUES_SINCE = '2023-01-03'
+
+
+class EdgarError(Exception):
+    """A fund's filings could not be fetched or parsed"""
+
+
+class EdgarClient:
+    def __init__(self, base_url: Optional[str] = None, user_agent: Optional[str] = None,
+                 rate_limit: float = SEC_RATE_LIMIT, pool_size: int = 10,
+                 record_dir: Optional[str] = None, timeout: float = 30):
+        base_url = base_url or os.environ.get('EDGAR_BASE_URL')
+        user_agent = user_agent or os.environ.get('SEC_USER_AGENT')
+        if not user_agent:
+            if not base_url:
+                raise ValueError("Set SEC_USER_AGENT to a name and contact email; "
+                                 "SEC rejects requests without one")
+            user_agent = LOCAL_USER_AGENT
+        self.data_url = (base_url or DATA_URL).rstrip('/')
+        self.archives_url = (base_url or ARCHIVES_URL).rstrip('/')
+        self.record_dir = record_dir or os.environ.get('EDGAR_RECORD_DIR')
+        self.timeout = timeout
+        # burst=1 keeps any one-second window at or under the limit
+        self.limiter = RateLimiter(rate_limit, burst=1)
+        self.request_count = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=3)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'User-Agent': user_agent,
+            'Accept-Encoding': 'gzip, deflate',
+        })
+
+    def _get(self, url: str) -> bytes:
+        self.limiter.acquire(RATE_LIMIT_KEY)
+        self.request_count += 1
+        metrics.count('edgar.requests')
+        with metrics.timer('edgar.request'):
+            response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        metrics.count('edgar.bytes_received', len(response.content))
+        if self.record_dir:
+            path = os.path.join(self.record_dir, urlparse(url).path.lstrip('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(response.content)
+        return response.content
+
+    def get_13f_filings(self, cik: str, count: int = 10) -> List[Dict]:
+        """Latest 13F-HR filings for a CIK from the submissions JSON, newest first"""
+        url = f"{self.data_url}/submissions/CIK{int(cik):010d}.json"
+        recent = json.loads(self._get(url))['filings']['recent']
+
+        filings = []
+        for i, form in enumerate(recent['form']):
+            if form not in FORMS_13F:
+                continue
+            filings.append({
+                'cik': cik,
+                'form': form,
+                'accession_number': recent['accessionNumber'][i],
+                'filing_date': recent['filingDate'][i],
+                'period_of_report': recent['reportDate'][i],
+            })
+            if len(filings) >= count:
+                break
+        return filings
+
+    def filing_base_url(self, filing: Dict) -> str:
+        accession = filing['accession_number'].replace('-', '')
+        return f"{self.archives_url}/Archives/edgar/data/{int(filing['cik'])}/{accession}"
+
+    def get_information_table_url(self, filing: Dict) -> Optional[str]:
+        """URL of the information-table XML in a filing, found via its index.json"""
+        base = self.filing_base_url(filing)
+        index = json.loads(self._get(f"{base}/index.json"))
+        names = [item['name'] for item in index['directory']['item']]
+        xml_files = [n for n in names if n.lower().endswith('.xml') and n.lower() != 'primary_doc.xml']
+        if not xml_files:
+            return None
+        # Prefer the conventional name when a filing carries several XML files
+        table = next((n for n in xml_files if 'infotable' in n.lower()), xml_files[0])
+        return f"{base}/{table}"
+
+    def _parse_streamed(self, url: str) -> np.ndarray:
+        """Stream a large XML response straight into the iterparse parser"""
+        if self.record_dir:
+            self._get(url)
+            return parse_information_table(
+                os.path.join(self.record_dir, urlparse(url).path.lstrip('/'))
+            )
+        self.limiter.acquire(RATE_LIMIT_KEY)
+        self.request_count += 1
+        metrics.count('edgar.requests')
+        with metrics.timer('edgar.info_table'), \
+                self.session.get(url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            return parse_information_table(response.raw)
+
+    def get_holdings(self, filing: Dict) -> List[Dict]:
+        """Holdings of one filing aggregated by CUSIP, with values in dollars"""
+        url = self.get_information_table_url(filing)
+        if url is None:
+            return []
+        table = self._parse_streamed(url)
+        if filing['filing_date'] < DOLLAR_VALUES_SINCE:
+            table['value'] *= 1000
+        return to_records(table)
+
+    def fetch_fund(self, cik: str, count: int = 1, known: Iterable[str] = ()) -> List[Dict]:
+        """
+        Latest filings for a fund with their holdings attached
+
+        Filings whose accession number is in known were ingested by an
+        earlier sync and are dropped before any holdings are downloaded.
+        """
+        known = set(known)
+        filings = [f for f in self.get_13f_filings(cik, count)
+                   if f['accession_number'] not in known]
+        for filing in filings:
+            filing['holdings'] = self.get_holdings(filing)
+        return filings
+
+    def fetch_funds(self, ciks: List[str], count: int = 1, max_workers: int = 8,
+                    known: Optional[Dict[str, Iterable[str]]] = None) -> Dict[str, List[Dict]]:
+        """
+        Fetch many funds in parallel
+
+        Returns:
+            {cik: filings}, where [] means no new filings and an EdgarError
+            stands in for a fund whose request or parse failed
+        """
+        known = known or {}
+
+        def fetch(cik):
+            try:
+                return self.fetch_fund(cik, count, known.get(cik, ()))
+            except (requests.RequestException, KeyError, ValueError, ParseError) as e:
+                print(f"⚠️ Error fetching 13F data for CIK {cik}: {e}")
+                metrics.count('edgar.fund_failures')
+                return EdgarError(f"CIK {cik}: {e}")
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ciks)))) as pool:
+            return dict(zip(ciks, pool.map(fetch, ciks)))
+
+
+def serve_recorded(directory: str, port: int = 8766) -> None:
+    """Serve recorded EDGAR responses as a local stand-in for data.sec.gov/www.sec.gov"""
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=directory, **kwargs)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    print(f"✓ Serving recorded EDGAR responses from {directory} on http://127.0.0.1:{port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    # python edgar_client.py serve <recorded_dir> [port]
+    if sys.argv[1:2] == ['serve'] and len(sys.argv) > 2:
+        serve_recorded(sys.argv[2], *[int(a) for a in sys.argv[3:4]])
+    else:
+        print("Usage: python edgar_client.py serve <recorded_dir> [port]")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Portfolio-weighted P/E for 13F funds
+Builds a (fund x symbol) matrix of holding weights and multiplies it once
+against a per-symbol quote matrix, giving every fund's value-weighted P/E,
+harmonic-mean P/E, earnings yield and P/E coverage in a single pass. Fund
+P/Es are then placed against the index P/Es and the historical P/E series.
+"""
+
+import json
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from holdings_diff import SYMBOL_CUSIPS
+
+FETCHED_HOLDINGS_FILE = 'scripts/13f-data.json'   # written by the 13F fetcher
+HOLDINGS_FILE = 'dist/13f-data.json'              # hand-maintained page data, the fallback
+
+CUSIP_SYMBOLS = {cusip: symbol for symbol, cusip in SYMBOL_CUSIPS.items()}
+
+
+def fund_positions(fund: Dict) -> List[Dict]:
+    """
+    Positions of one fund as {'symbol', 'value'}
+
+    Accepts both the page format (holdings is a list of ticker positions)
+    and the fetcher format (holdings.positions keyed by CUSIP), where
+    CUSIPs are mapped back to tickers through SYMBOL_CUSIPS.
+    """
+    holdings = fund.get('holdings', [])
+    if isinstance(holdings, dict):
+        holdings = holdings.get('positions', [])
+    positions = []
+    for holding in holdings:
+        symbol = CUSIP_SYMBOLS.get(holding.get('cusip'), holding.get('symbol'))
+        if symbol and holding.get('value'):
+            positions.append({'symbol': symbol, 'value': float(holding['value'])})
+    return positions
+
+
+def holding_symbols(funds: Dict[str, Dict]) -> List[str]:
+    """Every ticker held by any fund"""
+    return sorted({p['symbol'] for fund in funds.values() for p in fund_positions(fund)})
+
+
+def holdings_matrix(funds: Dict[str, Dict]) -> Tuple[List[str], List[str], np.ndarray]:
+    """
+    Portfolio weights as a dense (fund x symbol) matrix
+
+    Returns:
+        (fund names, symbols, weights) with each row summing to 1
+    """
+    names = list(funds)
+    symbols = holding_symbols(funds)
+    column = {symbol: i for i, symbol in enumerate(symbols)}
+    weights = np.zeros((len(names), len(symbols)))
+    for row, name in enumerate(names):
+        for position in fund_positions(funds[name]):
+            weights[row, column[position['symbol']]] += position['value']
+    totals = weights.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weights = np.where(totals > 0, weights / totals, 0.0)
+    return names, symbols, weights
+
+
+def compute_fund_pe(weights: np.ndarray, pe: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Weighted valuation for every fund from one matrix product
+
+    Holdings without a positive P/E are left out and the remaining weights
+    renormalised; coverage reports the share of value that had one.
+
+    Args:
+        weights: (fund x symbol) portfolio weights
+        pe: Trailing P/E per symbol, NaN or <= 0 when unavailable
+
+    Returns:
+        {'weighted_pe', 'harmonic_pe', 'earnings_yield', 'coverage'},
+        one value per fund
+    """
+    pe = np.asarray(pe, dtype=np.float64)
+    valid = np.isfinite(pe) & (pe > 0)
+    safe_pe = np.where(valid, pe, 1.0)
+    quotes = np.column_stack([
+        np.where(valid, safe_pe, 0.0),
+        np.where(valid, 1.0 / safe_pe, 0.0),
+        valid.astype(np.float64),
+    ])
+    weighted_pe, earnings_yield, coverage = (weights @ quotes).T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weighted_pe = weighted_pe / coverage
+        earnings_yield = earnings_yield / coverage
+        harmonic_pe = 1.0 / earnings_yield
+    return {
+        'weighted_pe': weighted_pe,
+        'harmonic_pe': harmonic_pe,
+        'earnings_yield': earnings_yield * 100,
+        'coverage': coverage * 100,
+    }
+
+
+def historical_percentiles(values: np.ndarray, series: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Percentile of each value within every historical P/E series"""
+    result = {}
+    for name, history in series.items():
+        history = np.sort(history[np.isfinite(history)])
+        if len(history):
+            result[name] = np.searchsorted(history, values, side='right') / len(history) * 100
+    return result
+
+
+def load_historical_series() -> Dict[str, np.ndarray]:
+    """Historical P/E series from the columnar store, empty if unavailable"""
+    try:
+        from pe_statistics import load_series
+        _, names, matrix = load_series()
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Historical P/E series unavailable: {e}")
+        return {}
+    return {name: matrix[:, i] for i, name in enumerate(names)}
+
+
+def fund_valuation_section(funds: Dict[str, Dict], stock_prices: Dict[str, Dict],
+                           indices: Optional[Dict[str, Dict]] = None,
+                           series: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Dict]:
+    """
+    Published valuation for every fund
+
+    Args:
+        funds: 13F data keyed by fund name
+        stock_prices: {symbol: {'pe', 'price'}} as from get_stock_data
+        indices: {name: {'pe_ratio'}} as in the data bundle
+        series: Historical P/E series, loaded from the store if None
+    """
+    names, symbols, weights = holdings_matrix(funds)
+    if not names or not symbols:
+        return {}
+    pe = np.array([stock_prices.get(s, {}).get('pe') or np.nan for s in symbols], dtype=np.float64)
+    values = compute_fund_pe(weights, pe)
+    series = load_historical_series() if series is None else series
+    percentiles = historical_percentiles(values['harmonic_pe'], series)
+    index_pe = {name: entry.get('pe_ratio') for name, entry in (indices or {}).items()
+                if entry.get('pe_ratio')}
+
+    def clean(value):
+        value = float(value)
+        return round(value, 2) if np.isfinite(value) else None
+
+    section = {}
+    for i, name in enumerate(names):
+        fund = {key: clean(array[i]) for key, array in values.items()}
+        harmonic = values['harmonic_pe'][i]
+        fund['premium_to_index_pct'] = {
+            index: clean((harmonic / pe_ratio - 1) * 100) for index, pe_ratio in index_pe.items()
+        }
+        fund['historical_percentile'] = {
+            series_name: clean(ranks[i]) for series_name, ranks in percentiles.items()
+        }
+        section[name] = fund
+    return section
+
+
+def bundled_quotes(bundle: Dict) -> Dict[str, Dict]:
+    """Quotes for every held symbol from a bundle; older bundles only carry stock_prices"""
+    return bundle.get('holding_quotes') or bundle.get('stock_prices', {})
+
+
+def load_holdings(path: Optional[str] = None) -> Dict[str, Dict]:
+    """Holdings from the last 13F fetch, or dist/13f-data.json when nothing was fetched yet"""
+    paths = [path] if path else [FETCHED_HOLDINGS_FILE, HOLDINGS_FILE]
+    for candidate in paths:
+        try:
+            with open(candidate, 'r', encoding='utf-8') as f:
+                holdings = json.load(f)
+        except FileNotFoundError:
+            continue
+        if holdings:
+            return holdings
+    return {}
+
+
+def benchmark(funds: int = 500, symbols: int = 5_000, positions: int = 300, repeat: int = 20) -> None:
+    """Time the single-pass valuation on synthetic funds"""
+    rng = np.random.default_rng(0)
+    weights = np.zeros((funds, symbols))
+    for row in range(funds):
+        held = rng.choice(symbols, positions, replace=False)
+        weights[row, held] = rng.lognormal(0, 1.5, positions)
+    weights /= weights.sum(axis=1, keepdims=True)
+    pe = rng.uniform(5, 80, symbols)
+    pe[rng.random(symbols) < 0.1] = np.nan
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        values = compute_fund_pe(weights, pe)
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(f"✓ {funds} funds x {symbols} symbols: {elapsed:.2f} ms, "
+          f"median harmonic P/E {np.nanmedian(values['harmonic_pe']):.2f}")
+
+
+if __name__ == '__main__':
+    # python fund_valuation.py benchmark   time synthetic funds
+    # python fund_valuation.py             value the fetched 13F holdings with bundled quotes
+    if sys.argv[1:2] == ['benchmark']:
+        benchmark()
+    else:
+        from data_bundle import load_current_bundle
+
+        bundle = load_current_bundle()
+        result = fund_valuation_section(load_holdings(), bundled_quotes(bundle),
+                                        bundle.get('indices', {}))
+        for fund_name, valuation in result.items():
+            print(f"✓ {fund_name}: weighted P/E={valuation['weighted_pe']}, "
+                  f"harmonic P/E={valuation['harmonic_pe']}, coverage={valuation['coverage']}%")
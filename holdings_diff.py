@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Quarter-over-quarter 13F position changes
+Keeps the per-CUSIP holdings of every ingested filing in data/13f_history
+and diffs consecutive quarters with a sorted-CUSIP merge join over the
+structured arrays from info_table, so funds with tens of thousands of
+positions across many quarters diff in milliseconds. The q<n>_change
+fields in dist/13f-data.json are regenerated from these diffs.
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from atomic_io import write_json_atomic
+from info_table import HOLDING_DTYPE
+
+HISTORY_DIR = 'data/13f_history'
+DATA_FILE = 'dist/13f-data.json'
+CHANGE_QUARTERS = 3             # q<n>_change fields kept per holding
+
+NEW, EXITED, INCREASED, DECREASED, UNCHANGED = range(5)
+STATUS_NAMES = ('new', 'exited', 'increased', 'decreased', 'unchanged')
+
+DIFF_DTYPE = np.dtype([
+    ('cusip', 'U9'),
+    ('name', 'U64'),
+    ('status', 'i1'),
+    ('prev_shares', 'f8'),
+    ('shares', 'f8'),
+    ('prev_value', 'f8'),
+    ('value', 'f8'),
+    ('share_change_pct', 'f8'),
+])
+
+# CUSIPs for the tickers shown on the page, whose holdings carry no CUSIP
+SYMBOL_CUSIPS = {
+    'AAPL': '037833100',
+    'AMZN': '023135106',
+    'AXP': '025816109',
+    'BAC': '060505104',
+    'BNY': '064058100',
+    'CVX': '166764100',
+    'GOOGL': '02079K305',
+    'JNJ': '478160104',
+    'KO': '191216100',
+    'META': '30303M102',
+    'MSFT': '594918104',
+    'NVDA': '67066G104',
+    'OXY': '674599105',
+    'PG': '742718109',
+    'VRSN': '92343E102',
+}
+
+
+def quarter_label(period_of_report: str) -> str:
+    """'2025-09-30' -> 'q3'"""
+    return f"q{(int(period_of_report[5:7]) - 1) // 3 + 1}"
+
+
+def cusip_keys(cusips: np.ndarray) -> np.ndarray:
+    """
+    Encode CUSIPs as unique int64 keys
+
+    Each of the nine characters becomes a base-40 digit (0-9, A-Z, then
+    the * @ # used for private placements), so sorting and joining work on
+    integers instead of unicode strings.
+    """
+    chars = np.ascontiguousarray(cusips, dtype='U9').view(np.uint32).reshape(-1, 9)
+    digits = _CUSIP_DIGITS[np.minimum(chars, 127)]
+    return digits @ _CUSIP_POWERS
+
+
+_CUSIP_DIGITS = np.zeros(128, dtype=np.int64)
+for _i, _c in enumerate('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ*@#'):
+    _CUSIP_DIGITS[ord(_c)] = _i + 1
+_CUSIP_POWERS = 40 ** np.arange(8, -1, -1, dtype=np.int64)
+
+
+def diff_positions(previous: np.ndarray, current: np.ndarray) -> np.ndarray:
+    """
+    Position changes between two filings
+
+    CUSIPs are encoded as integer keys, both tables are ordered by key and
+    merged with searchsorted, so the join is O(n log n) in NumPy with no
+    per-position Python work.
+
+    Args:
+        previous: Earlier filing, HOLDING_DTYPE with one row per CUSIP
+        current: Later filing, HOLDING_DTYPE with one row per CUSIP
+
+    Returns:
+        DIFF_DTYPE array over the union of CUSIPs, ordered by cusip_keys
+    """
+    def sorted_keys(table):
+        # Only the int64 keys are sorted; records are gathered once below
+        table_keys = cusip_keys(table['cusip'])
+        order = np.argsort(table_keys)
+        return table_keys[order], order
+
+    def align(table_keys, order):
+        # Row of each union key in the table, and whether it is present there
+        if not len(table_keys):
+            return np.zeros(len(keys), dtype=np.intp), np.zeros(len(keys), dtype=bool)
+        row = np.minimum(np.searchsorted(table_keys, keys), len(table_keys) - 1)
+        return order[row], table_keys[row] == keys
+
+    prev_sorted = sorted_keys(previous)
+    curr_sorted = sorted_keys(current)
+    keys = np.union1d(prev_sorted[0], curr_sorted[0])
+    prev_row, in_prev = align(*prev_sorted)
+    curr_row, in_curr = align(*curr_sorted)
+
+    diff = np.zeros(len(keys), dtype=DIFF_DTYPE)
+    if len(previous):
+        diff['cusip'] = previous['cusip'][prev_row]
+        diff['name'] = previous['name'][prev_row]
+        diff['prev_shares'] = np.where(in_prev, previous['shares'][prev_row], 0.0)
+        diff['prev_value'] = np.where(in_prev, previous['value'][prev_row], 0.0)
+    if len(current):
+        rows = curr_row[in_curr]
+        diff['cusip'][in_curr] = current['cusip'][rows]
+        diff['name'][in_curr] = current['name'][rows]
+        diff['shares'] = np.where(in_curr, current['shares'][curr_row], 0.0)
+        diff['value'] = np.where(in_curr, current['value'][curr_row], 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change = (diff['shares'] - diff['prev_shares']) / diff['prev_shares'] * 100
+    diff['share_change_pct'] = np.where(in_prev, change, np.nan)
+
+    status = np.full(len(keys), UNCHANGED, dtype=np.int8)
+    status[diff['shares'] > diff['prev_shares']] = INCREASED
+    status[diff['shares'] < diff['prev_shares']] = DECREASED
+    status[~in_prev] = NEW
+    status[~in_curr] = EXITED
+    diff['status'] = status
+    return diff
+
+
+def summarize_diff(diff: np.ndarray) -> Dict[str, int]:
+    """Number of positions per change status"""
+    counts = np.bincount(diff['status'], minlength=len(STATUS_NAMES))
+    return {name: int(count) for name, count in zip(STATUS_NAMES, counts)}
+
+
+class HoldingsHistory:
+    """Per-CUSIP holdings of every ingested filing, one compressed file each"""
+
+    def __init__(self, directory: str = HISTORY_DIR):
+        self.directory = directory
+
+    def _index_path(self, cik: str) -> str:
+        return os.path.join(self.directory, cik, 'index.json')
+
+    def _load_index(self, cik: str) -> List[Dict]:
+        try:
+            with open(self._index_path(cik), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def save(self, filing: Dict, table: np.ndarray) -> None:
+        """Store one filing's holdings table"""
+        cik = filing['cik']
+        os.makedirs(os.path.join(self.directory, cik), exist_ok=True)
+        np.savez_compressed(os.path.join(self.directory, cik, filing['accession_number'] + '.npz'),
+                            holdings=table[np.argsort(cusip_keys(table['cusip']))])
+
+        index = [f for f in self._load_index(cik)
+                 if f['accession_number'] != filing['accession_number']]
+        index.append({key: filing[key] for key in
+                      ('accession_number', 'form', 'filing_date', 'period_of_report')})
+        index.sort(key=lambda f: (f['period_of_report'], f['filing_date']))
+        write_json_atomic(self._index_path(cik), index, indent=2)
+
+    def filings(self, cik: str) -> List[Dict]:
+        """Stored filings oldest first, keeping the latest filing per period"""
+        by_period = {}
+        for filing in self._load_index(cik):
+            by_period[filing['period_of_report']] = filing
+        return [by_period[period] for period in sorted(by_period)]
+
+    def load(self, cik: str, accession_number: str) -> np.ndarray:
+        with np.load(os.path.join(self.directory, cik, accession_number + '.npz')) as data:
+            return data['holdings']
+
+    def quarterly_diffs(self, cik: str, quarters: Optional[int] = None) -> List[Dict]:
+        """
+        Diffs between consecutive stored filings, newest first
+
+        Returns:
+            [{'period_of_report', 'label', 'diff'}]
+        """
+        filings = self.filings(cik)
+        if quarters is not None:
+            filings = filings[-(quarters + 1):]
+        tables = [self.load(cik, f['accession_number']) for f in filings]
+        diffs = [
+            {
+                'period_of_report': filing['period_of_report'],
+                'label': quarter_label(filing['period_of_report']),
+                'diff': diff_positions(previous, current),
+            }
+            for filing, previous, current in zip(filings[1:], tables, tables[1:])
+        ]
+        return diffs[::-1]
+
+
+def change_fields(diffs: List[Dict], cusip: str) -> Dict[str, Optional[float]]:
+    """q<n>_change values (percent share change) for one CUSIP"""
+    fields = {}
+    for entry in diffs:
+        diff = entry['diff']
+        row = np.searchsorted(cusip_keys(diff['cusip']), cusip_keys([cusip])[0])
+        if row >= len(diff) or diff['cusip'][row] != cusip:
+            continue
+        change = float(diff['share_change_pct'][row])
+        fields[f"{entry['label']}_change"] = round(change, 1) if np.isfinite(change) else None
+    return fields
+
+
+def annotate_positions(positions: List[Dict], diffs: List[Dict]) -> None:
+    """Replace the q<n>_change fields of positions with values from diffs"""
+    for position in positions:
+        cusip = position.get('cusip') or SYMBOL_CUSIPS.get(position.get('symbol'))
+        for key in [k for k in position if k.startswith('q') and k.endswith('_change')]:
+            del position[key]
+        if cusip:
+            position.update(change_fields(diffs, cusip))
+
+
+def regenerate_change_fields(path: str = DATA_FILE, history: Optional[HoldingsHistory] = None) -> int:
+    """
+    Rewrite the q<n>_change fields in a 13F data file from stored history
+
+    Funds without at least two stored filings are left as they are.
+
+    Returns:
+        Number of funds updated
+    """
+    history = history or HoldingsHistory()
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    updated = 0
+    for fund in data.values():
+        diffs = history.quarterly_diffs(fund.get('cik', ''), CHANGE_QUARTERS)
+        if not diffs:
+            continue
+        annotate_positions(fund.get('holdings', []), diffs)
+        updated += 1
+
+    if updated:
+        write_json_atomic(path, data, indent=2, ensure_ascii=False)
+    return updated
+
+
+def benchmark(positions: int = 20_000, quarters: int = 40) -> None:
+    """Time diffs across many quarters of a synthetic large fund"""
+    rng = np.random.default_rng(0)
+    universe = np.array([f'{i:09d}' for i in range(positions * 2)])
+    tables = []
+    for _ in range(quarters):
+        table = np.zeros(positions, dtype=HOLDING_DTYPE)
+        table['cusip'] = rng.choice(universe, positions, replace=False)
+        table['shares'] = rng.uniform(1e3, 1e8, positions)
+        table['value'] = table['shares'] * rng.uniform(5, 500, positions)
+        tables.append(table)
+
+    start = time.perf_counter()
+    diffs = [diff_positions(a, b) for a, b in zip(tables, tables[1:])]
+    elapsed = time.perf_counter() - start
+    print(f"✓ {positions} positions x {quarters} quarters: {len(diffs)} diffs in "
+          f"{elapsed * 1000:.0f} ms ({elapsed / len(diffs) * 1000:.1f} ms each)")
+    print(f"✓ Latest quarter: {summarize_diff(diffs[-1])}")
+
+
+if __name__ == '__main__':
+    # python holdings_diff.py benchmark   time synthetic diffs
+    # python holdings_diff.py [data_file] regenerate q<n>_change fields
+    if sys.argv[1:2] == ['benchmark']:
+        benchmark()
+    else:
+        data_file = sys.argv[1] if len(sys.argv) > 1 else DATA_FILE
+        count = regenerate_change_fields(data_file)
+        print(f"✓ Regenerated change fields for {count} funds in {data_file}")
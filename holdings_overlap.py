@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Cross-fund holdings overlap index
+Inverts the stored 13F history into security -> (fund, quarter, value,
+weight) posting lists held in one CSR-style array, so "who holds NVDA",
+"overlap between two funds" and "most widely held names" are answered
+with a dict lookup and a few array slices. Pairwise overlap for every
+fund in a quarter comes from one matrix product, which keeps the published
+summary cheap with hundreds of filers.
+"""
+
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from holdings_diff import SYMBOL_CUSIPS, HoldingsHistory, cusip_keys
+from info_table import HOLDING_DTYPE
+
+POSTING_DTYPE = np.dtype([
+    ('fund', 'i4'),
+    ('quarter', 'i4'),
+    ('value', 'f8'),
+    ('weight', 'f8'),
+])
+
+TOP_HELD = 25
+
+
+class OverlapIndex:
+    """Inverted index from security to the funds holding it"""
+
+    def __init__(self, tables: Dict[Tuple[str, str], np.ndarray]):
+        """
+        Build the index from per-CUSIP holdings tables
+
+        Args:
+            tables: {(fund, period_of_report): HOLDING_DTYPE array}
+        """
+        self.funds = sorted({fund for fund, _ in tables})
+        self.quarters = sorted({quarter for _, quarter in tables})
+        fund_ids = {fund: i for i, fund in enumerate(self.funds)}
+        quarter_ids = {quarter: i for i, quarter in enumerate(self.quarters)}
+
+        # Only numeric columns are concatenated; CUSIPs and names are read
+        # back from the source tables for one row per security
+        sources = list(tables.values())
+        sizes = np.array([len(table) for table in sources], dtype=np.int64)
+        postings = np.empty(int(sizes.sum()), dtype=POSTING_DTYPE)
+        keys = np.empty(len(postings), dtype=np.int64)
+        start = 0
+        for (fund, quarter), table in tables.items():
+            stop = start + len(table)
+            total = table['value'].sum()
+            keys[start:stop] = cusip_keys(table['cusip'])
+            postings['fund'][start:stop] = fund_ids[fund]
+            postings['quarter'][start:stop] = quarter_ids[quarter]
+            postings['value'][start:stop] = table['value']
+            postings['weight'][start:stop] = table['value'] / total if total else 0.0
+            start = stop
+        source = np.repeat(np.arange(len(sources)), sizes)
+        source_row = np.arange(len(postings)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+
+        # Group postings by security, then quarter, largest position first
+        order = np.lexsort((-postings['value'], postings['quarter'], keys))
+        keys, postings = keys[order], postings[order]
+        source, source_row = source[order], source_row[order]
+        _, first, security = np.unique(keys, return_index=True, return_inverse=True)
+
+        self.postings = postings
+        self.security = security.astype(np.int32)
+        self.offsets = np.append(first, len(postings))
+        self.cusips = np.empty(len(first), dtype=HOLDING_DTYPE['cusip'])
+        self.names = np.empty(len(first), dtype=HOLDING_DTYPE['name'])
+        for t in np.unique(source[first]):
+            mask = source[first] == t
+            rows = source_row[first][mask]
+            self.cusips[mask] = sources[t]['cusip'][rows]
+            self.names[mask] = sources[t]['name'][rows]
+        self.lookup = {str(cusip): i for i, cusip in enumerate(self.cusips)}
+
+        # Each fund-quarter portfolio as sorted security ids with weights
+        self.portfolios = {}
+        by_portfolio = np.lexsort((self.security, postings['quarter'], postings['fund']))
+        pairs = postings['fund'][by_portfolio].astype(np.int64) * len(self.quarters) \
+            + postings['quarter'][by_portfolio]
+        bounds = np.flatnonzero(np.diff(pairs)) + 1
+        for rows in np.split(by_portfolio, bounds) if len(pairs) else []:
+            fund, quarter = postings['fund'][rows[0]], postings['quarter'][rows[0]]
+            self.portfolios[(int(fund), int(quarter))] = (self.security[rows], postings['weight'][rows],
+                                                          postings['value'][rows])
+        self._held_counts = {}
+
+    @classmethod
+    def from_history(cls, fund_names: Dict[str, str],
+                     history: Optional[HoldingsHistory] = None) -> 'OverlapIndex':
+        """Index every stored filing of the given {cik: fund name} funds"""
+        history = history or HoldingsHistory()
+        tables = {}
+        for cik, name in fund_names.items():
+            for filing in history.filings(cik):
+                tables[(name, filing['period_of_report'])] = history.load(cik, filing['accession_number'])
+        return cls(tables)
+
+    def _security_id(self, security: str) -> Optional[int]:
+        return self.lookup.get(SYMBOL_CUSIPS.get(security.upper(), security.upper()))
+
+    def _quarter_id(self, quarter: Optional[str]) -> int:
+        return self.quarters.index(quarter) if quarter else self.quarters.index(self.default_quarter())
+
+    def default_quarter(self) -> Optional[str]:
+        """Latest quarter among those reported by the most funds"""
+        if not self.portfolios:
+            return None
+        counts = np.bincount([q for _, q in self.portfolios], minlength=len(self.quarters))
+        return self.quarters[max(range(len(counts)), key=lambda q: (counts[q], q))]
+
+    def holders(self, security: str, quarter: Optional[str] = None) -> List[Dict]:
+        """
+        Funds holding a security, largest position first
+
+        Args:
+            security: CUSIP or a ticker listed in SYMBOL_CUSIPS
+            quarter: period_of_report, or None for every quarter
+        """
+        security_id = self._security_id(security)
+        if security_id is None:
+            return []
+        rows = self.postings[self.offsets[security_id]:self.offsets[security_id + 1]]
+        if quarter is not None:
+            rows = rows[rows['quarter'] == self._quarter_id(quarter)]
+        return [
+            {'fund': self.funds[fund], 'quarter': self.quarters[q], 'value': value, 'weight': weight}
+            for fund, q, value, weight in zip(rows['fund'].tolist(), rows['quarter'].tolist(),
+                                              rows['value'].tolist(),
+                                              np.round(rows['weight'] * 100, 2).tolist())
+        ]
+
+    def overlap(self, fund_a: str, fund_b: str, quarter: Optional[str] = None,
+                top: int = 10) -> Dict:
+        """
+        Shared positions of two funds in a quarter
+
+        weight_overlap is the sum over shared names of the smaller portfolio
+        weight, i.e. the share of either portfolio the two have in common.
+        """
+        quarter_id = self._quarter_id(quarter)
+        empty = (np.empty(0, dtype=np.int32), np.empty(0), np.empty(0))
+        a = self.portfolios.get((self.funds.index(fund_a), quarter_id), empty)
+        b = self.portfolios.get((self.funds.index(fund_b), quarter_id), empty)
+        common, in_a, in_b = np.intersect1d(a[0], b[0], assume_unique=True, return_indices=True)
+        combined = a[2][in_a] + b[2][in_b]
+        largest = np.argsort(-combined)[:top]
+        return {
+            'quarter': self.quarters[quarter_id],
+            'common_positions': int(len(common)),
+            'weight_overlap': round(float(np.minimum(a[1][in_a], b[1][in_b]).sum()) * 100, 2),
+            'top_common': [
+                {'cusip': str(self.cusips[common[i]]), 'name': str(self.names[common[i]]),
+                 'value': float(combined[i])}
+                for i in largest
+            ],
+        }
+
+    def most_widely_held(self, quarter: Optional[str] = None, top: int = TOP_HELD) -> List[Dict]:
+        """Securities held by the most funds in a quarter, ties broken by total value"""
+        quarter_id = self._quarter_id(quarter)
+        if quarter_id not in self._held_counts:
+            in_quarter = self.postings['quarter'] == quarter_id
+            counts = np.bincount(self.security[in_quarter], minlength=len(self.cusips))
+            values = np.bincount(self.security[in_quarter], weights=self.postings['value'][in_quarter],
+                                 minlength=len(self.cusips))
+            self._held_counts[quarter_id] = (counts, values, np.lexsort((-values, -counts)))
+        counts, values, ranked = self._held_counts[quarter_id]
+        return [
+            {'cusip': str(self.cusips[i]), 'name': str(self.names[i]),
+             'holders': int(counts[i]), 'total_value': float(values[i])}
+            for i in ranked[:top] if counts[i]
+        ]
+
+    def pairwise(self, quarter: Optional[str] = None) -> Dict:
+        """
+        Shared-position counts and weight cosine similarity for every pair
+        of funds, from one product of the (fund x security) weight matrix
+        """
+        quarter_id = self._quarter_id(quarter)
+        weights = np.zeros((len(self.funds), len(self.cusips)), dtype=np.float32)
+        for (fund, q), (securities, fund_weights, _) in self.portfolios.items():
+            if q == quarter_id:
+                weights[fund, securities] = fund_weights
+        held = (weights > 0).astype(np.float32)
+        common = held @ held.T
+        gram = weights @ weights.T
+        norms = np.sqrt(np.diag(gram))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            similarity = np.nan_to_num(gram / np.outer(norms, norms))
+        return {
+            'funds': self.funds,
+            'common_positions': common.astype(int).tolist(),
+            'similarity': np.round(similarity.astype(np.float64), 4).tolist(),
+        }
+
+    def published(self, quarter: Optional[str] = None, top: int = TOP_HELD) -> Dict:
+        """Precomputed overlap data for the multi-fund comparison page"""
+        quarter = quarter or self.default_quarter()
+        if quarter is None:
+            return {}
+        return {
+            'quarter': quarter,
+            'most_widely_held': self.most_widely_held(quarter, top),
+            'pairwise': self.pairwise(quarter),
+            'holders': {symbol: holders for symbol in SYMBOL_CUSIPS
+                        if (holders := self.holders(symbol, quarter))},
+        }
+
+
+def benchmark(filers: int = 300, positions: int = 2_000, universe: int = 20_000,
+              quarters: int = 4) -> None:
+    """Time index build and queries on synthetic filers"""
+    rng = np.random.default_rng(0)
+    cusips = np.array([f'{i:09d}' for i in range(universe)])
+    popularity = 1 / np.arange(1, universe + 1)
+    popularity /= popularity.sum()
+    tables = {}
+    for f in range(filers):
+        for q in range(quarters):
+            # Last day of the quarter: the first of the next quarter minus a day
+            period = str(np.datetime64('2025-01') + 3 * (q + 1) - np.timedelta64(1, 'D'))
+            table = np.zeros(positions, dtype=HOLDING_DTYPE)
+            table['cusip'] = rng.choice(cusips, positions, replace=False, p=popularity)
+            table['value'] = rng.lognormal(16, 2, positions)
+            table['shares'] = table['value'] / 100
+            tables[(f'FUND{f:03d}', period)] = table
+
+    start = time.perf_counter()
+    index = OverlapIndex(tables)
+    print(f"✓ Built index over {len(index.postings)} postings in {time.perf_counter() - start:.2f}s")
+
+    def timed(label, fn, repeat=100):
+        fn()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        print(f"✓ {label}: {(time.perf_counter() - start) / repeat * 1000:.3f} ms")
+
+    quarter = index.quarters[-1]
+    timed('holders of one security', lambda: index.holders(str(cusips[50]), quarter))
+    timed('overlap of two funds', lambda: index.overlap('FUND000', 'FUND001', quarter))
+    timed('most widely held (cached)', lambda: index.most_widely_held(quarter))
+    timed('pairwise matrix', lambda: index.pairwise(quarter), repeat=3)
+
+
+if __name__ == '__main__':
+    benchmark(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Single-pass HTML slot renderer
+Data values in the published pages live in stable slot markers:
+
+    <!--slot:name-->value<!--/slot-->       HTML text
+    /*slot:name*/value/*/slot*/             inline JavaScript
+    data-name="value"                       data-* attributes
+
+The page is scanned once to build an offset index of all slots and every
+value is written in one pass, so rendering is O(file size) no matter how
+many slots are updated, and rendering the same values twice is a no-op.
+"""
+
+import html
+import json
+import re
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from atomic_io import write_atomic
+from run_metrics import metrics
+
+# Both patterns start with a literal so the regex engine can skip ahead
+# with a fast substring search instead of trying every position
+SLOT_OPEN_RE = re.compile(r'slot:([\w-]+)(-->|\*/)')
+ATTR_SLOT_RE = re.compile(r'data-([\w-]+)="([^"]*)"')
+
+_SLOT_CLOSE = {'-->': '<!--/slot-->', '*/': '/*/slot*/'}
+_SLOT_KIND = {'-->': 'html', '*/': 'js'}
+
+
+class Slot(NamedTuple):
+    name: str
+    kind: str       # 'html', 'js' or 'attr'
+    start: int      # offset of the first character of the value
+    end: int        # offset just past the value
+
+
+def build_index(content: str) -> List[Slot]:
+    """Scan content once and return the offsets of every slot value"""
+    index = []
+    for match in SLOT_OPEN_RE.finditer(content):
+        name, opener = match.groups()
+        start = match.end()
+        end = content.find(_SLOT_CLOSE[opener], start)
+        if end != -1:
+            index.append(Slot(name, _SLOT_KIND[opener], start, end))
+    for match in ATTR_SLOT_RE.finditer(content):
+        index.append(Slot('data-' + match.group(1), 'attr', *match.span(2)))
+    index.sort(key=lambda slot: slot.start)
+    return index
+
+
+def _encode(value, kind: str) -> str:
+    if kind == 'js':
+        return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    text = str(value)
+    if kind == 'attr':
+        return html.escape(text, quote=True)
+    return html.escape(text, quote=False)
+
+
+def render(content: str, values: Dict, index: Optional[List[Slot]] = None) -> str:
+    """
+    Write values into their slots in a single pass
+
+    Args:
+        content: Page source containing slot markers
+        values: Slot name to value; slots without a value are left untouched
+        index: Precomputed slot index for content, built if omitted
+
+    Returns:
+        Rendered page source
+    """
+    with metrics.timer('html.render'):
+        if index is None:
+            index = build_index(content)
+        parts = []
+        pos = 0
+        for slot in index:
+            if slot.name not in values or slot.start < pos:
+                continue
+            parts.append(content[pos:slot.start])
+            parts.append(_encode(values[slot.name], slot.kind))
+            pos = slot.end
+        parts.append(content[pos:])
+        return ''.join(parts)
+
+
+# Legacy markup produced by the old regex updaters, mapped to slot markers
+_LEGACY_HTML_SLOTS = [
+    (r'(<div style="font-size: 1\.5em; font-weight: bold; color: #667eea; margin: 10px 0;">)([\d.]+)', 'sp500_pe'),
+    (r'(<div style="font-size: 1\.5em; font-weight: bold; color: #764ba2; margin: 10px 0;">)([\d.]+)', 'nasdaq_pe'),
+    (r'(<div style="font-size: 1\.5em; font-weight: bold; color: #22c55e; margin: 10px 0;">)([\d.]+)', 'hangseng_pe'),
+    (r'(<div style="font-size: 1\.5em; font-weight: bold; color: #f97316; margin: 10px 0;">)([\d.]+)', 'dowjones_pe'),
+    (r'(S&P 500 P/E</div>\s*<div class="summary-value">)([\d.]+)', 'sp500_pe'),
+    (r'(納斯達克 P/E</div>\s*<div class="summary-value">)([\d.]+)', 'nasdaq_pe'),
+    (r'(恒生指數 P/E</div>\s*<div class="summary-value">)([\d.]+)', 'hangseng_pe'),
+    (r'(道瓊斯 P/E</div>\s*<div class="summary-value">)([\d.]+)', 'dowjones_pe'),
+    (r'(總持倉市值</div>\s*<div class="summary-value">)(\$[\d.]+B)', 'berkshire_total_value'),
+    (r'(現金及等價物</div>\s*<div class="summary-value">)(\$[\d.]+B)', 'berkshire_cash'),
+    (r'(<div class="summary-value">)(\$750\.2B)', 'vanguard_total_value'),
+    (r'(<div class="summary-value">)(\$32\.8B)', 'soros_total_value'),
+    (r'(<span>數據日期：)([^<]*)', 'filing_date'),
+    (r'(發布日期：)(\d{4}年\d{2}月\d{2}日)', 'publish_date'),
+    (r'(最後更新：)(\d{4}年\d{2}月\d{2}日[^<]*?UTC)', 'last_updated'),
+    (r'(數據來源：)([^<]+)', 'data_source'),
+]
+
+
+def mark_slots(content: str) -> str:
+    """
+    Convert legacy markup into slot markers
+
+    Only needed once per page; already marked content is returned unchanged.
+    """
+    for pattern, name in _LEGACY_HTML_SLOTS:
+        content = re.sub(
+            pattern,
+            lambda m: f'{m.group(1)}<!--slot:{name}-->{m.group(2)}<!--/slot-->',
+            content
+        )
+
+    content = re.sub(
+        r'(const stockPriceData = )(\{.*\})(;)',
+        r'\g<1>/*slot:stock_price_data*/\g<2>/*/slot*/\g<3>',
+        content
+    )
+
+    # Collapse the duplicate data-last-update attributes left by the old updater
+    def dedupe_body(match):
+        attrs = re.findall(r'\sdata-last-update="[^"]*"', match.group(0))
+        return f'<body{attrs[-1]}>' if attrs else match.group(0)
+
+    content = re.sub(r'<body(?:\sdata-last-update="[^"]*")+>', dedupe_body, content)
+    content = content.replace('<body>', '<body data-last-update="">', 1)
+    return content
+
+
+def ensure_slots(content: str) -> str:
+    """Mark legacy slots only when the page has no slot markers yet"""
+    if 'slot:' in content:
+        return content
+    return mark_slots(content)
+
+
+def render_file(path: str, values: Dict) -> bool:
+    """Render values into a page file; returns False if the file is missing"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except FileNotFoundError:
+        print(f"Error: {path} not found")
+        return False
+
+    write_atomic(path, render(ensure_slots(content), values))
+    return True
+
+
+def _legacy_regex_chain(content: str, values: Dict) -> str:
+    """The chained re.sub updates this module replaces, kept for benchmarking"""
+    for color, key in (('667eea', 'sp500_pe'), ('764ba2', 'nasdaq_pe'),
+                       ('22c55e', 'hangseng_pe'), ('f97316', 'dowjones_pe')):
+        content = re.sub(
+            rf'(<div style="font-size: 1\.5em; font-weight: bold; color: #{color}; margin: 10px 0;">)[\d.]+(</div>)',
+            rf'\g<1>{values[key]}\g<2>', content, count=1
+        )
+    content = re.sub(r'const stockPriceData = \{[^}]*\};',
+                     'const stockPriceData = ' + values['stock_price_data'] + ';', content)
+    content = re.sub(r'發布日期：\d{4}年\d{2}月\d{2}日', f"發布日期：{values['publish_date']}", content)
+    content = re.sub(r'數據來源：[^<]+', f"數據來源：{values['data_source']}", content)
+    content = re.sub(r'<body>', f"<body data-last-update=\"{values['data-last-update']}\">", content)
+    return content
+
+
+def benchmark(path: str = 'dist/index.html', size_mb: float = 4, repeat: int = 5) -> None:
+    """Compare the legacy regex chain with the slot renderer on a padded page"""
+    with open(path, 'r', encoding='utf-8') as f:
+        page = f.read()
+    head, tail = page.split('</body>', 1)
+    filler = '<p class="filler">本益比 P/E 歷史數據 ' + 'x' * 200 + '</p>\n'
+    copies = int(size_mb * 1024 * 1024 / len(filler.encode('utf-8')))
+    page = head + filler * copies + '</body>' + tail
+
+    values = {
+        'sp500_pe': 29.2, 'nasdaq_pe': 36.5, 'hangseng_pe': 11.8, 'dowjones_pe': 27.3,
+        'stock_price_data': json.dumps({'AAPL': {'pe': 37.18, 'price': 276.97}}),
+        'publish_date': '2025年11月26日',
+        'data_source': 'Yahoo Finance (更新於 09:24 UTC)',
+        'data-last-update': '2025-11-26T09:24:00',
+    }
+    marked = mark_slots(page)
+    size = len(page.encode('utf-8')) / (1024 * 1024)
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    legacy = timed(lambda: _legacy_regex_chain(page, values))
+    single = timed(lambda: render(marked, values))
+    index = build_index(marked)
+    indexed = timed(lambda: render(marked, values, index))
+    print(f"Page size: {size:.1f} MB, {len(index)} slots")
+    print(f"✓ Legacy regex chain: {legacy:.1f} ms")
+    print(f"✓ Single-pass render: {single:.1f} ms")
+    print(f"✓ Render with prebuilt index: {indexed:.1f} ms")
+
+
+if __name__ == '__main__':
+    # python html_renderer.py mark <file>...   convert legacy markup in place
+    # python html_renderer.py [size_mb]         run the benchmark
+    if sys.argv[1:2] == ['mark']:
+        for target in sys.argv[2:]:
+            with open(target, 'r', encoding='utf-8') as f:
+                marked_content = mark_slots(f.read())
+            write_atomic(target, marked_content)
+            print(f"✓ {target}: {len(build_index(marked_content))} slots")
+    else:
+        benchmark(size_mb=float(sys.argv[1]) if len(sys.argv) > 1 else 4)
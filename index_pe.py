@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Index P/E computation engine
+Computes index valuations from constituent price, shares and EPS arrays
+read from local constituent files, so it runs offline
+
+Constituent files live in data/constituents/<SYMBOL>.csv (index symbol
+without the leading ^, e.g. GSPC.csv) with the columns:
+    symbol,price,shares,eps
+Shares should be the float-adjusted share count used for index weighting.
+An empty eps cell marks missing earnings.
+
+No constituent files are shipped: until one is generated for an index,
+get_index_pe() in the updaters keeps returning its published constants.
+To generate one, list the member tickers one per line in
+data/constituents/<SYMBOL>.txt and run
+    python index_pe.py refresh ^GSPC
+which fetches every member through the quote provider and writes the CSV.
+"""
+
+import csv
+import io
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from atomic_io import write_atomic
+
+CONSTITUENTS_DIR = 'data/constituents'
+
+METHODS = ('earnings_weighted', 'cap_weighted')
+
+
+def constituents_path(index_symbol: str, directory: str = CONSTITUENTS_DIR) -> str:
+    return os.path.join(directory, index_symbol.lstrip('^') + '.csv')
+
+
+def members_path(index_symbol: str, directory: str = CONSTITUENTS_DIR) -> str:
+    return os.path.join(directory, index_symbol.lstrip('^') + '.txt')
+
+
+def load_members(path: str) -> List[str]:
+    """Member tickers from a membership list, skipping blank and # lines"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def load_constituents(path: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Load (price, shares, eps) arrays from a constituent file, None if missing"""
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+    except FileNotFoundError:
+        return None
+
+    def column(name):
+        return np.array([float(row[name]) if row.get(name) else np.nan for row in rows],
+                        dtype=np.float64)
+
+    return column('price'), column('shares'), column('eps')
+
+
+def compute_index_pe(price: np.ndarray, shares: np.ndarray, eps: np.ndarray,
+                     method: str = 'earnings_weighted',
+                     negative_earnings: str = 'include') -> float:
+    """
+    Compute an index P/E from constituent arrays
+
+    Args:
+        price: Last price per constituent
+        shares: Index (float-adjusted) shares per constituent
+        eps: Trailing twelve month EPS per constituent, NaN if missing
+        method: 'earnings_weighted' for aggregate market cap over aggregate
+            earnings (the published index P/E convention, equal to the
+            earnings-weighted mean of constituent P/Es), or 'cap_weighted'
+            for the market-cap-weighted mean of constituent P/Es
+        negative_earnings: 'include' keeps losses in aggregate earnings as
+            S&P does, 'exclude' drops loss makers, 'zero' counts them as
+            zero earnings. The cap-weighted mean always excludes them since
+            their P/E is undefined.
+
+    Returns:
+        Index P/E, or NaN if no constituent has usable earnings
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown index P/E method: {method}")
+
+    price = np.asarray(price, dtype=np.float64)
+    shares = np.asarray(shares, dtype=np.float64)
+    eps = np.asarray(eps, dtype=np.float64)
+
+    market_cap = price * shares
+    earnings = eps * shares
+    valid = np.isfinite(market_cap) & np.isfinite(earnings)
+
+    if method == 'cap_weighted':
+        mask = valid & (earnings > 0)
+        if not mask.any():
+            return float('nan')
+        weights = market_cap[mask]
+        return float(np.dot(weights, market_cap[mask] / earnings[mask]) / weights.sum())
+
+    if negative_earnings == 'exclude':
+        valid &= earnings > 0
+    elif negative_earnings == 'zero':
+        earnings = np.where(earnings < 0, 0.0, earnings)
+    elif negative_earnings != 'include':
+        raise ValueError(f"Unknown negative earnings convention: {negative_earnings}")
+
+    total_earnings = earnings[valid].sum()
+    if total_earnings <= 0:
+        return float('nan')
+    return float(market_cap[valid].sum() / total_earnings)
+
+
+def index_pe(index_symbol: str, method: str = 'earnings_weighted',
+             directory: str = CONSTITUENTS_DIR) -> Optional[float]:
+    """P/E for an index from its constituent file, None if unavailable"""
+    arrays = load_constituents(constituents_path(index_symbol, directory))
+    if arrays is None:
+        return None
+    pe = compute_index_pe(*arrays, method=method)
+    return round(pe, 2) if np.isfinite(pe) else None
+
+
+def compute_all(index_symbols, directory: str = CONSTITUENTS_DIR) -> Dict[str, Dict[str, float]]:
+    """Both P/E methods for every index that has a constituent file"""
+    results = {}
+    for symbol in index_symbols:
+        arrays = load_constituents(constituents_path(symbol, directory))
+        if arrays is None:
+            continue
+        results[symbol] = {
+            method: round(compute_index_pe(*arrays, method=method), 2)
+            for method in METHODS
+        }
+    return results
+
+
+def constituent_row(symbol: str, info: Optional[Dict]) -> Dict[str, object]:
+    """
+    A constituent file row from a quote info dict
+
+    Shares prefer the float count and fall back to market cap over price;
+    EPS prefers trailingEps and falls back to price over trailing P/E, which
+    leaves loss makers without a P/E as missing earnings.
+    """
+    info = info or {}
+    price = info.get('currentPrice') or info.get('regularMarketPrice')
+    shares = info.get('floatShares')
+    if not shares and price and info.get('marketCap'):
+        shares = info['marketCap'] / price
+    eps = info.get('trailingEps')
+    if eps is None and price and info.get('trailingPE'):
+        eps = price / info['trailingPE']
+    return {'symbol': symbol, 'price': price or '', 'shares': shares or '',
+            'eps': '' if eps is None else eps}
+
+
+def refresh(index_symbol: str, members: Optional[List[str]] = None,
+            directory: str = CONSTITUENTS_DIR, provider=None) -> Optional[str]:
+    """
+    Rewrite an index's constituent file from fresh member quotes
+
+    Args:
+        index_symbol: Index symbol, e.g. ^GSPC
+        members: Member tickers, defaults to the index's membership list
+        directory: Where the membership list and constituent file live
+        provider: Quote provider, defaults to the one selected by QUOTE_PROVIDER
+
+    Returns:
+        Path written, or None if no member returned a price
+    """
+    # Imported here so computing from existing files never loads a provider
+    from quote_fetcher import fetch_quotes
+
+    if members is None:
+        members = load_members(members_path(index_symbol, directory))
+    quotes = fetch_quotes(members, provider)
+    rows = [constituent_row(symbol, quotes.get(symbol)) for symbol in members]
+    priced = sum(1 for row in rows if row['price'] != '')
+    if not priced:
+        print(f"⚠️ No quotes for {index_symbol} members, keeping the previous file")
+        return None
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=['symbol', 'price', 'shares', 'eps'],
+                            lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(rows)
+    path = constituents_path(index_symbol, directory)
+    write_atomic(path, buffer.getvalue())
+    print(f"✓ {index_symbol}: {priced}/{len(members)} members priced, wrote {path}")
+    return path
+
+
+def benchmark(sizes=(500, 3000, 10000), repeat: int = 20) -> None:
+    """Time both methods on synthetic constituent arrays"""
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        price = rng.uniform(5, 900, size)
+        shares = rng.uniform(1e7, 1e10, size)
+        eps = price / rng.uniform(8, 60, size)
+        eps[rng.random(size) < 0.05] *= -1
+        eps[rng.random(size) < 0.02] = np.nan
+        for method in METHODS:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                pe = compute_index_pe(price, shares, eps, method=method)
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            print(f"✓ {size} constituents, {method}: P/E={pe:.2f} in {elapsed:.3f} ms")
+
+
+if __name__ == '__main__':
+    # python index_pe.py refresh index_symbol ...   rebuild constituent files from quotes
+    # python index_pe.py [index_symbol ...]         compute from constituent files
+    # python index_pe.py                            run the benchmark
+    if sys.argv[1:2] == ['refresh']:
+        for symbol in sys.argv[2:]:
+            refresh(symbol)
+    elif len(sys.argv) > 1:
+        for symbol, values in compute_all(sys.argv[1:]).items():
+            print(f"✓ {symbol}: " + ', '.join(f"{k}={v}" for k, v in values.items()))
+    else:
+        benchmark()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Streaming parser for 13F information-table XML
+Walks the document with iterparse, clearing every <infoTable> element once
+it has been read, so peak memory stays flat no matter how many rows a filer
+reports. Rows are aggregated by CUSIP on the fly into a NumPy structured
+array.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from typing import BinaryIO, Dict, Iterator, List, Union
+
+import numpy as np
+
+HOLDING_DTYPE = np.dtype([
+    ('cusip', 'U9'),
+    ('name', 'U64'),
+    ('value', 'f8'),
+    ('shares', 'f8'),
+])
+
+Source = Union[str, bytes, BinaryIO]
+
+
+class Holding:
+    """One information-table row"""
+    __slots__ = ('name', 'cusip', 'value', 'shares', 'share_type', 'put_call')
+
+    def __init__(self, name, cusip, value, shares, share_type, put_call):
+        self.name = name
+        self.cusip = cusip
+        self.value = value
+        self.shares = shares
+        self.share_type = share_type
+        self.put_call = put_call
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_holdings(source: Source) -> Iterator[Holding]:
+    """
+    Yield holdings from an information table without building the full tree
+
+    Args:
+        source: File path, raw XML bytes or a binary file object
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    root = None
+    fields = {}
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = element
+            continue
+
+        tag = _local(element.tag)
+        if tag != 'infoTable':
+            fields[tag] = (element.text or '').strip()
+            continue
+
+        yield Holding(
+            fields.get('nameOfIssuer', ''),
+            fields.get('cusip', ''),
+            float(fields.get('value') or 0),
+            float(fields.get('sshPrnamt') or 0),
+            fields.get('sshPrnamtType', ''),
+            fields.get('putCall', ''),
+        )
+        fields = {}
+        # Drop the finished row so the tree never grows
+        element.clear()
+        root.clear()
+
+
+def aggregate_by_cusip(holdings: Iterator[Holding], include_options: bool = False) -> np.ndarray:
+    """
+    Merge rows for the same security as they stream past
+
+    Filers report one row per manager or share class. Put/call rows describe
+    option exposure rather than shares held and are skipped unless
+    include_options is set.
+
+    Returns:
+        Structured array with HOLDING_DTYPE, one row per CUSIP
+    """
+    index: Dict[str, int] = {}
+    cusips: List[str] = []
+    names: List[str] = []
+    values: List[float] = []
+    shares: List[float] = []
+
+    for holding in holdings:
+        if holding.put_call and not include_options:
+            continue
+        row = index.get(holding.cusip)
+        if row is None:
+            index[holding.cusip] = len(cusips)
+            cusips.append(holding.cusip)
+            names.append(holding.name)
+            values.append(holding.value)
+            shares.append(holding.shares)
+        else:
+            values[row] += holding.value
+            shares[row] += holding.shares
+
+    table = np.empty(len(cusips), dtype=HOLDING_DTYPE)
+    table['cusip'] = cusips
+    table['name'] = names
+    table['value'] = values
+    table['shares'] = shares
+    return table
+
+
+def parse_information_table(source: Source, include_options: bool = False) -> np.ndarray:
+    """Stream an information table into a per-CUSIP structured array"""
+    return aggregate_by_cusip(iter_holdings(source), include_options)
+
+
+def to_records(table: np.ndarray) -> List[Dict]:
+    """Plain dicts for JSON output"""
+    return [
+        {'cusip': str(row['cusip']), 'name': str(row['name']),
+         'value': float(row['value']), 'shares': float(row['shares'])}
+        for row in table
+    ]
+
+
+def from_records(records: List[Dict]) -> np.ndarray:
+    """Structured array from plain dicts produced by to_records"""
+    table = np.empty(len(records), dtype=HOLDING_DTYPE)
+    for field in HOLDING_DTYPE.names:
+        table[field] = [record[field] for record in records]
+    return table
+
+
+def write_synthetic_table(path: str, rows: int = 100_000, securities: int = 20_000) -> None:
+    """Write a synthetic information table for benchmarks"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<informationTable xmlns="http://www.sec.gov/edgar/document/thirteenf/informationtable">\n')
+        for i in range(rows):
+            security = i % securities
+            f.write(
+                f'<infoTable><nameOfIssuer>ISSUER {security}</nameOfIssuer>'
+                f'<titleOfClass>COM</titleOfClass><cusip>{security:09d}</cusip>'
+                f'<value>{(i % 997 + 1) * 1000}</value>'
+                f'<shrsOrPrnAmt><sshPrnamt>{i % 991 + 1}</sshPrnamt><sshPrnamtType>SH</sshPrnamtType></shrsOrPrnAmt>'
+                f'<investmentDiscretion>SOLE</investmentDiscretion>'
+                f'<votingAuthority><Sole>{i}</Sole><Shared>0</Shared><None>0</None></votingAuthority>'
+                f'</infoTable>\n'
+            )
+        f.write('</informationTable>\n')
+
+
+def benchmark(rows: int = 100_000) -> None:
+    """Compare the streaming parser with building the full tree"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'infotable.xml')
+        write_synthetic_table(path, rows)
+        size = os.path.getsize(path) / (1024 * 1024)
+
+        def measure(fn):
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+            return result, elapsed, peak
+
+        def full_tree():
+            tree = ET.parse(path)
+            return sum(1 for e in tree.iter() if _local(e.tag) == 'infoTable')
+
+        table, stream_s, stream_mb = measure(lambda: parse_information_table(path))
+        count, tree_s, tree_mb = measure(full_tree)
+
+    print(f"Synthetic info table: {rows} rows, {size:.1f} MB")
+    print(f"✓ Streaming parse: {stream_s:.2f}s, peak {stream_mb:.1f} MB, {len(table)} securities")
+    print(f"✓ Full tree parse: {tree_s:.2f}s, peak {tree_mb:.1f} MB, {count} rows")
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Market-hours-aware quote refresh scheduler
+Knows the NYSE and HKEX trading sessions, lunch break, holidays and half
+days, and only refreshes a symbol while its market is open, plus once
+after the close to capture the closing quote. While open, each symbol is
+due again after an interval that shrinks with its latest absolute move, and
+due symbols are fetched most-overdue first in bounded batches. Every batch
+is written to the quote cache and published with the stale quotes of the
+other symbols, unless no quote moved beyond the snapshot tolerances.
+
+Usage:
+    python market_scheduler.py             run until interrupted
+    python market_scheduler.py --once      one refresh pass, e.g. from cron
+    python market_scheduler.py --plan      print market status and due symbols
+    python market_scheduler.py simulate [--days 7]
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import date, datetime, time as clock, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from atomic_io import write_json_atomic
+from quote_cache import FIELD_TTLS
+from quote_fetcher import DEFAULT_RATE_LIMIT, fetch_quotes
+from quote_providers import CachedProvider, QuoteProvider, StubProvider, get_provider
+from quote_table import region_of
+from run_metrics import instrumented, metrics
+
+STATE_FILE = '.cache/scheduler_state.json'
+BASE_INTERVAL = 10 * 60       # seconds between refreshes of a quiet symbol
+MIN_INTERVAL = 2 * 60         # floor for the most volatile symbols
+VOLATILITY_STEP = 1.0         # each 1% absolute move divides the interval by one more
+CLOSE_SETTLE = 5 * 60         # wait after a close before taking the closing quote
+MAX_BATCH = 50                # symbols per fetch
+MIN_SLEEP = 5
+MAX_SLEEP = 15 * 60
+LOOKAROUND_DAYS = 14          # how far to search for the previous close or next open
+
+# Index symbols trading with a market other than their suffix suggests
+INDEX_MARKETS = {'^HSI': 'HK'}
+
+
+class Market:
+    """Trading sessions of one exchange in its local time zone"""
+
+    def __init__(self, name: str, timezone_name: str, sessions: List[Tuple[str, str]],
+                 holidays: List[str], half_days: List[str], half_day_close: str):
+        self.name = name
+        self.tz = ZoneInfo(timezone_name)
+        self.sessions = [(clock.fromisoformat(start), clock.fromisoformat(end)) for start, end in sessions]
+        self.holidays = frozenset(date.fromisoformat(day) for day in holidays)
+        self.half_days = frozenset(date.fromisoformat(day) for day in half_days)
+        self.half_day_close = clock.fromisoformat(half_day_close)
+        self.calendar_years = {day.year for day in self.holidays}
+        self._warned = set()
+
+    def sessions_on(self, day: date) -> List[Tuple[datetime, datetime]]:
+        """Open and close times of the sessions on a local calendar day"""
+        if day.weekday() >= 5 or day in self.holidays:
+            return []
+        sessions = []
+        for start, end in self.sessions:
+            if day in self.half_days:
+                if start >= self.half_day_close:
+                    continue
+                end = min(end, self.half_day_close)
+            sessions.append((datetime.combine(day, start, self.tz), datetime.combine(day, end, self.tz)))
+        return sessions
+
+    def _sessions_around(self, now: datetime, step: int) -> List[Tuple[datetime, datetime]]:
+        today = now.astimezone(self.tz).date()
+        days = [today + timedelta(days=step * i) for i in range(LOOKAROUND_DAYS)]
+        return [session for day in days for session in self.sessions_on(day)]
+
+    def is_open(self, now: datetime) -> bool:
+        today = now.astimezone(self.tz).date()
+        if today.year not in self.calendar_years and today.year not in self._warned:
+            self._warned.add(today.year)
+            print(f"⚠️ No {self.name} holiday calendar for {today.year}; assuming every weekday trades")
+        return any(start <= now < end for start, end in self.sessions_on(today))
+
+    def last_close(self, now: datetime) -> Optional[datetime]:
+        closes = [end for _, end in self._sessions_around(now, -1) if end <= now]
+        return max(closes, default=None)
+
+    def next_open(self, now: datetime) -> Optional[datetime]:
+        opens = [start for start, _ in self._sessions_around(now, 1) if start > now]
+        return min(opens, default=None)
+
+
+# Exchange calendars as published by NYSE and HKEX; extend each December
+MARKETS = {
+    'US': Market(
+        'NYSE', 'America/New_York', [('09:30', '16:00')],
+        holidays=[
+            '2025-01-01', '2025-01-09', '2025-01-20', '2025-02-17', '2025-04-18', '2025-05-26',
+            '2025-06-19', '2025-07-04', '2025-09-01', '2025-11-27', '2025-12-25',
+            '2026-01-01', '2026-01-19', '2026-02-16', '2026-04-03', '2026-05-25', '2026-06-19',
+            '2026-07-03', '2026-09-07', '2026-11-26', '2026-12-25',
+        ],
+        half_days=['2025-07-03', '2025-11-28', '2025-12-24', '2026-11-27', '2026-12-24'],
+        half_day_close='13:00',
+    ),
+    'HK': Market(
+        'HKEX', 'Asia/Hong_Kong', [('09:30', '12:00'), ('13:00', '16:00')],
+        holidays=[
+            '2025-01-01', '2025-01-29', '2025-01-30', '2025-01-31', '2025-04-04', '2025-04-18',
+            '2025-04-21', '2025-05-01', '2025-05-05', '2025-07-01', '2025-10-01', '2025-10-07',
+            '2025-10-29', '2025-12-25', '2025-12-26',
+            '2026-01-01', '2026-02-17', '2026-02-18', '2026-02-19', '2026-04-03', '2026-04-06',
+            '2026-04-07', '2026-05-01', '2026-05-25', '2026-06-19', '2026-07-01', '2026-10-01',
+            '2026-10-19', '2026-12-25',
+        ],
+        half_days=['2025-01-28', '2025-12-24', '2025-12-31', '2026-02-16', '2026-12-24', '2026-12-31'],
+        half_day_close='12:00',
+    ),
+}
+
+
+def market_of(symbol: str) -> Market:
+    return MARKETS[INDEX_MARKETS.get(symbol) or region_of(symbol)]
+
+
+def scheduled_symbols() -> List[str]:
+    """Every symbol the market updaters quote, indices included"""
+    import update_data
+    import update_market_data
+    from fund_valuation import load_holdings
+
+    symbols = update_market_data.quote_symbols(load_holdings())
+    return symbols + [s for s in update_data.all_symbols() if s not in symbols]
+
+
+def publish_quotes(quotes: Dict[str, Dict]) -> None:
+    import update_market_data
+    from fund_valuation import load_holdings
+    from snapshot_delta import SnapshotLog
+
+    state, delta = SnapshotLog().publish(quotes)
+    if delta is None:
+        metrics.count('scheduler.publishes_skipped')
+        return
+    update_market_data.publish_market_data(state, load_holdings())
+
+
+class RefreshScheduler:
+    def __init__(self, symbols: List[str], provider: Optional[QuoteProvider] = None,
+                 publish: Optional[Callable[[Dict[str, Dict]], None]] = publish_quotes,
+                 state_file: Optional[str] = STATE_FILE, max_batch: int = MAX_BATCH,
+                 rate_limit: float = DEFAULT_RATE_LIMIT):
+        """
+        Args:
+            symbols: Symbols to keep fresh
+            provider: Quote provider; a cached provider is unwrapped so every
+                refresh reaches upstream and the cache keeps the last quotes
+            publish: Called with the latest quote of every symbol after a batch
+            state_file: When each symbol was last fetched, None to keep it in memory
+        """
+        provider = provider or get_provider()
+        self.cache = provider.cache if isinstance(provider, CachedProvider) else None
+        self.provider = provider.provider if isinstance(provider, CachedProvider) else provider
+        self.symbols = list(dict.fromkeys(symbols))
+        self.publish = publish
+        self.state_file = state_file
+        self.max_batch = max_batch
+        self.rate_limit = rate_limit
+        self.state: Dict[str, Dict] = self._load_state()
+        # Last known quotes, so a publish always covers every symbol
+        self.quotes: Dict[str, Dict] = {}
+        if self.cache is not None:
+            for symbol in self.symbols:
+                values, _ = self.cache.get(symbol, FIELD_TTLS)
+                if values:
+                    self.quotes[symbol] = values
+
+    def _load_state(self) -> Dict[str, Dict]:
+        if not self.state_file:
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self) -> None:
+        if not self.state_file:
+            return
+        write_json_atomic(self.state_file, self.state, indent=2, sort_keys=True)
+
+    @staticmethod
+    def interval(state: Dict) -> float:
+        move = abs(state.get('change_percent') or 0)
+        return max(MIN_INTERVAL, BASE_INTERVAL / (1 + move / VOLATILITY_STEP))
+
+    def next_due(self, symbol: str, now: datetime) -> float:
+        """Epoch seconds at which the symbol should next be fetched"""
+        state = self.state.get(symbol, {})
+        attempted = state.get('attempted_at')
+        if attempted is None:
+            return now.timestamp()
+        market = market_of(symbol)
+        if market.is_open(now):
+            return attempted + self.interval(state)
+        close = market.last_close(now)
+        if close is not None and attempted < close.timestamp() + CLOSE_SETTLE:
+            return close.timestamp() + CLOSE_SETTLE
+        opening = market.next_open(now)
+        return opening.timestamp() if opening else float('inf')
+
+    def due(self, now: datetime) -> List[str]:
+        """Symbols due now, most overdue relative to their interval first"""
+        timestamp = now.timestamp()
+
+        def overdue(symbol):
+            state = self.state.get(symbol, {})
+            if state.get('attempted_at') is None:
+                return float('inf')
+            return (timestamp - state['attempted_at']) / self.interval(state)
+
+        due = [s for s in self.symbols if self.next_due(s, now) <= timestamp]
+        return sorted(due, key=overdue, reverse=True)
+
+    def tick(self, now: Optional[datetime] = None) -> List[str]:
+        """Fetch one batch of due symbols and publish; returns those refreshed"""
+        now = now or datetime.now(timezone.utc)
+        batch = self.due(now)[:self.max_batch]
+        if not batch:
+            return []
+        quotes = fetch_quotes(batch, self.provider, rate_limit=self.rate_limit)
+        refreshed = []
+        for symbol, info in quotes.items():
+            entry = self.state.setdefault(symbol, {})
+            # Failures also wait a full interval instead of retrying every pass
+            entry['attempted_at'] = now.timestamp()
+            if info is None:
+                continue
+            entry['refreshed_at'] = now.timestamp()
+            entry['change_percent'] = info.get('regularMarketChangePercent')
+            self.quotes[symbol] = info
+            if self.cache is not None:
+                self.cache.put(symbol, info, FIELD_TTLS)
+            refreshed.append(symbol)
+        metrics.count('scheduler.refreshed', len(refreshed))
+        metrics.count('scheduler.failures', len(batch) - len(refreshed))
+        self._save_state()
+        if refreshed and self.publish:
+            self.publish(self.quotes)
+        return refreshed
+
+    def sleep_seconds(self, now: datetime) -> float:
+        earliest = min((self.next_due(s, now) for s in self.symbols), default=float('inf'))
+        return min(MAX_SLEEP, max(MIN_SLEEP, earliest - now.timestamp()))
+
+    def run(self, once: bool = False) -> None:
+        while True:
+            now = datetime.now(timezone.utc)
+            refreshed = self.tick(now)
+            if refreshed:
+                print(f"✓ {now.strftime('%H:%M:%S')} refreshed {len(refreshed)} symbols: "
+                      f"{', '.join(refreshed[:8])}{' ...' if len(refreshed) > 8 else ''}")
+            if once:
+                return
+            time.sleep(self.sleep_seconds(datetime.now(timezone.utc)))
+
+    def plan(self, now: Optional[datetime] = None) -> None:
+        now = now or datetime.now(timezone.utc)
+        for key, market in MARKETS.items():
+            status = 'open' if market.is_open(now) else 'closed'
+            opening = market.next_open(now)
+            print(f"✓ {market.name}: {status}, next open "
+                  f"{opening.isoformat() if opening else 'unknown'}")
+        due = self.due(now)
+        print(f"✓ {len(due)} of {len(self.symbols)} symbols due: {', '.join(due[:20])}"
+              f"{' ...' if len(due) > 20 else ''}")
+
+
+def simulate(days: int = 7, step: int = 60, fixed_interval: int = BASE_INTERVAL) -> None:
+    """
+    Replay a stretch of calendar time against the stub provider
+
+    Compares upstream calls and the average quote age while markets are
+    open with refreshing every symbol every fixed_interval seconds.
+    """
+    symbols = scheduled_symbols()
+    scheduler = RefreshScheduler(symbols, StubProvider(), publish=None, state_file=None,
+                                 rate_limit=0)
+    start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    calls = fixed_calls = 0
+    ages, fixed_ages = [], []
+    for minute in range(0, days * 24 * 60 * 60, step):
+        now = start + timedelta(seconds=minute)
+        calls += len(scheduler.tick(now))
+        if minute % fixed_interval == 0:
+            fixed_calls += len(symbols)
+        for symbol in symbols:
+            if market_of(symbol).is_open(now):
+                ages.append(now.timestamp() - scheduler.state[symbol]['refreshed_at'])
+                fixed_ages.append(minute % fixed_interval)
+    print(f"✓ {days} days, {len(symbols)} symbols from {start.date()}")
+    print(f"  fixed every {fixed_interval // 60} min: {fixed_calls} calls, "
+          f"mean age while open {sum(fixed_ages) / max(1, len(fixed_ages)) / 60:.1f} min")
+    print(f"  market-hours scheduler: {calls} calls, "
+          f"mean age while open {sum(ages) / max(1, len(ages)) / 60:.1f} min")
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description='Market-hours-aware quote refresh')
+    parser.add_argument('command', nargs='?', choices=['run', 'simulate'], default='run')
+    parser.add_argument('--once', action='store_true', help='one refresh pass and exit')
+    parser.add_argument('--plan', action='store_true', help='show what is due without fetching')
+    parser.add_argument('--days', type=int, default=7, help='simulated days')
+    args = parser.parse_args(argv)
+
+    if args.command == 'simulate':
+        simulate(args.days)
+        return 0
+    scheduler = RefreshScheduler(scheduled_symbols())
+    if args.plan:
+        scheduler.plan()
+        return 0
+    try:
+        with instrumented('market_scheduler'):
+            scheduler.run(once=args.once)
+    except KeyboardInterrupt:
+        print("\n✓ Scheduler stopped")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
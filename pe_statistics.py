@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Historical P/E statistics
+Computes long-run means, medians, percentiles, z-scores, rolling windows and
+drawdowns for every P/E series in one vectorized pass over a (time x series)
+matrix, and generates src/data/peStatistics.js for the frontend.
+"""
+
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from atomic_io import write_atomic
+from pe_store import open_store
+
+JS_OUTPUT = 'src/data/peStatistics.js'
+PERCENTILES = (5, 25, 75, 95)
+ROLLING_YEARS = (5, 10, 20)
+
+
+YEAR_ROW_MAX = 3000     # a positive timestamp below this many ns is a year, not a date
+
+
+def _month_values(values: np.ndarray) -> np.ndarray:
+    """
+    One column's monthly values from the rows of one year
+
+    The year rows are the cross product of the monthly series they join, so
+    a column either repeats with a period (the inner series) or is constant
+    over blocks (the outer series); the shorter reading is its months.
+    """
+    n = len(values)
+    divisors = [d for d in range(1, n + 1) if n % d == 0]
+    period = next(d for d in divisors if (values == np.resize(values[:d], n)).all())
+    block = next(d for d in reversed(divisors) if (values == np.repeat(values[::d], d)).all())
+    return values[:period] if period <= n // block else values[::block]
+
+
+def _drop_fills(values: np.ndarray) -> np.ndarray:
+    """
+    NaN out the fill values around a column's real observations
+
+    A leading constant run longer than one row is a backfill or an imputed
+    placeholder, and a trailing run repeats the last observation, so only
+    its first row is kept.
+    """
+    present = np.flatnonzero(~np.isnan(values))
+    if len(present) < 2:
+        return values
+    observed = values[present]
+    starts = np.flatnonzero(np.concatenate(([True], observed[1:] != observed[:-1])))
+    if len(starts) == 1:
+        return values
+    values = values.copy()
+    if starts[1] > 1:
+        values[present[:starts[1]]] = np.nan
+    values[present[starts[-1] + 1:]] = np.nan
+    return values
+
+
+def load_series(store=None) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """
+    Load the P/E series as a monthly (time x series) matrix
+
+    processed_pe_data.csv is an outer join of two layouts: rows stamped with
+    a year as nanoseconds since the epoch hold the cross product of the
+    monthly Shiller and multpl values of that year, and dated rows hold the
+    other series. Each column is read from the layout in which it varies,
+    year rows are decoded into month-start dates, dated rows are snapped to
+    their month, and the placeholder runs each column was padded with are
+    dropped. Months without an observation are NaN.
+    """
+    store = store or open_store()
+    stamps = store.timestamps().view('<i8')
+    names = store.names
+    columns = [store.column(name) for name in names]
+
+    year_rows = (stamps > 0) & (stamps < YEAR_ROW_MAX)
+    years, group_starts = np.unique(stamps[year_rows], return_index=True)
+    group_ends = np.append(group_starts[1:], year_rows.sum())
+    dated_months = stamps[~year_rows].view('datetime64[ns]').astype('datetime64[M]')
+
+    year_months = (years - 1970).astype('datetime64[Y]').astype('datetime64[M]')
+    bounds = np.concatenate((year_months, year_months + 11, dated_months))
+    first = bounds.min()
+    months = np.arange(first, bounds.max() + 1, dtype='datetime64[M]')
+    matrix = np.full((len(months), len(names)), np.nan)
+
+    for i, values in enumerate(columns):
+        in_years = values[year_rows]
+        if len(in_years) and not (in_years == in_years[0]).all():
+            for year_month, start, end in zip(year_months, group_starts, group_ends):
+                monthly = _month_values(in_years[start:end])
+                row = (year_month - first).astype(np.int64)
+                matrix[row:row + len(monthly), i] = monthly
+        else:
+            # Later rows of a month overwrite earlier ones
+            matrix[(dated_months - first).astype(np.int64), i] = values[~year_rows]
+        matrix[:, i] = _drop_fills(matrix[:, i])
+
+    keep = ~np.isnan(matrix).all(axis=1)
+    return months[keep].astype('datetime64[ns]'), names, matrix[keep]
+
+
+def _last_valid(matrix: np.ndarray) -> np.ndarray:
+    present = ~np.isnan(matrix)
+    last = matrix.shape[0] - 1 - np.argmax(present[::-1], axis=0)
+    return matrix[last, np.arange(matrix.shape[1])]
+
+
+def _sorted_percentiles(sorted_matrix: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Linear-interpolated percentile per column of a NaN-last sorted matrix"""
+    position = (np.maximum(counts, 1) - 1) * (q / 100.0)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.ceil(position).astype(np.intp)
+    low = np.take_along_axis(sorted_matrix, lower[None, :], axis=0)[0]
+    high = np.take_along_axis(sorted_matrix, upper[None, :], axis=0)[0]
+    result = low + (high - low) * (position - lower)
+    return np.where(counts > 0, result, np.nan)
+
+
+def rolling_mean_std(matrix: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """NaN-aware trailing rolling mean and std for every column via cumulative sums"""
+    present = ~np.isnan(matrix)
+    values = np.where(present, matrix, 0.0)
+
+    def window_sum(a):
+        c = np.cumsum(a, axis=0)
+        c[window:] = c[window:] - c[:-window]
+        return c
+
+    n = window_sum(present.astype(np.float64))
+    s = window_sum(values)
+    sq = window_sum(values * values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = s / n
+        var = np.maximum(sq / n - mean * mean, 0.0)
+    full = np.arange(1, matrix.shape[0] + 1)[:, None] >= window
+    mean = np.where(full & (n > 0), mean, np.nan)
+    std = np.where(full & (n > 0), np.sqrt(var), np.nan)
+    return mean, std
+
+
+def compute_statistics(matrix: np.ndarray, names: List[str],
+                       periods_per_year: int = 12) -> Dict[str, Dict[str, float]]:
+    """
+    Summary statistics for every column of a (time x series) matrix
+
+    Returns:
+        {series: {statistic: value}}
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    counts = (~np.isnan(matrix)).sum(axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nansum(matrix, axis=0) / counts
+        std = np.sqrt(np.nansum((matrix - mean) ** 2, axis=0) / counts)
+
+        # NaNs sort last, so every percentile is an index into the valid prefix
+        sorted_matrix = np.sort(matrix, axis=0)
+        median = _sorted_percentiles(sorted_matrix, counts, 50)
+        percentiles = {q: _sorted_percentiles(sorted_matrix, counts, q) for q in PERCENTILES}
+
+        current = _last_valid(matrix)
+        z_score = (current - mean) / std
+        percentile_rank = (matrix <= current).sum(axis=0) / counts * 100
+
+        running_peak = np.fmax.accumulate(matrix, axis=0)
+        drawdown = matrix / running_peak - 1
+        max_drawdown = np.nanmin(drawdown, axis=0)
+        current_drawdown = _last_valid(drawdown)
+
+        # Only the latest window feeds the summary; rolling_mean_std gives full series
+        rolling = {}
+        for years in ROLLING_YEARS:
+            window = years * periods_per_year
+            tail = matrix[-window:]
+            tail_counts = (~np.isnan(tail)).sum(axis=0)
+            tail_mean = np.nansum(tail, axis=0) / tail_counts
+            tail_std = np.sqrt(np.nansum((tail - tail_mean) ** 2, axis=0) / tail_counts)
+            if matrix.shape[0] < window:
+                tail_mean = tail_std = np.full(matrix.shape[1], np.nan)
+            rolling[years] = (tail_mean, tail_std)
+
+    stats = {
+        'count': counts,
+        'mean': mean,
+        'median': median,
+        'std': std,
+        'current': current,
+        'z_score': z_score,
+        'percentile_rank': percentile_rank,
+        'change_pct': (current / mean - 1) * 100,
+        'max_drawdown_pct': max_drawdown * 100,
+        'current_drawdown_pct': current_drawdown * 100,
+    }
+    stats.update({f'p{q}': values for q, values in percentiles.items()})
+    for years, (r_mean, r_std) in rolling.items():
+        stats[f'rolling_{years}y_mean'] = r_mean
+        stats[f'rolling_{years}y_std'] = r_std
+
+    def clean(value):
+        value = float(value)
+        return round(value, 2) if np.isfinite(value) else None
+
+    return {
+        name: {key: clean(values[i]) for key, values in stats.items()}
+        for i, name in enumerate(names)
+    }
+
+
+def generate_js(stats: Dict[str, Dict[str, float]], last_date, path: str = JS_OUTPUT) -> None:
+    """Write the generated JS data module consumed by peRatioData.js"""
+    averages = {name: s['mean'] for name, s in stats.items()}
+    current = {name: s['current'] for name, s in stats.items()}
+
+    def block(value):
+        return json.dumps(value, indent=2, ensure_ascii=False)
+
+    content = (
+        "// Generated by pe_statistics.py from src/assets/processed_pe_data.csv.\n"
+        "// Do not edit by hand; rerun `python pe_statistics.py` instead.\n\n"
+        f"export const dataThrough = \"{str(last_date)[:10]}\";\n\n"
+        f"export const historicalAverages = {block(averages)};\n\n"
+        f"export const currentRatios = {block(current)};\n\n"
+        f"export const peStatistics = {block(stats)};\n"
+    )
+    write_atomic(path, content)
+
+
+def benchmark(tickers=(10, 100, 500), years: int = 50, repeat: int = 3) -> None:
+    """Time compute_statistics on synthetic daily data"""
+    rng = np.random.default_rng(0)
+    days = years * 252
+    for n in tickers:
+        matrix = 15 * np.exp(np.cumsum(rng.normal(0, 0.01, (days, n)), axis=0))
+        matrix[rng.random((days, n)) < 0.01] = np.nan
+        names = [f'T{i}' for i in range(n)]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            compute_statistics(matrix, names, periods_per_year=252)
+        elapsed = (time.perf_counter() - start) / repeat
+        print(f"✓ {n} tickers x {days} days: {elapsed * 1000:.0f} ms")
+
+
+def main() -> None:
+    timestamps, names, matrix = load_series()
+    stats = compute_statistics(matrix, names)
+    generate_js(stats, timestamps[-1])
+    for name, s in stats.items():
+        print(f"✓ {name}: mean={s['mean']}, current={s['current']}, z={s['z_score']}")
+    print(f"\n✓ Statistics written to {JS_OUTPUT}")
+    print(f"Generated at: {datetime.now().isoformat()}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['benchmark']:
+        benchmark()
+    else:
+        main()
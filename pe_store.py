@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Columnar time-series store for the P/E series
+Keeps processed_pe_data.csv as run-length encoded columns of raw
+little-endian binary files that are memory-mapped on load:
+
+    data/pe_store/meta.json              column names, dtypes and run counts
+    data/pe_store/<column>.values        value of each run
+    data/pe_store/<column>.ends          row offset just past each run
+
+The timestamp column is stored as int64 nanoseconds since the epoch so the
+CSV round-trips exactly. Every file is replaced atomically and meta.json,
+which holds the run counts the columns are mapped with, is replaced last,
+so readers never see a half-written store. Appending a row rewrites every
+column's run ends (the values file only where a new run starts), which stay
+small under RLE. meta.json also records the row count, so a crash part way
+through an append, which leaves the columns with different lengths, is
+detected on open and the store is rebuilt from the CSV.
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from atomic_io import write_atomic, write_json_atomic
+
+STORE_VERSION = 1
+DEFAULT_STORE_PATH = 'data/pe_store'
+DEFAULT_CSV_PATH = 'src/assets/processed_pe_data.csv'
+TIMESTAMP = 'timestamp'
+PE_COLUMNS = ['PE_Shiller', 'PE_multpl', 'PE_investorsfriend', 'PE_fullratio', 'PE_HSI']
+
+
+class RLEColumn:
+    """A column stored as runs of repeated values"""
+
+    def __init__(self, values: np.ndarray, ends: np.ndarray):
+        self.values = values
+        self.ends = ends
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> 'RLEColumn':
+        array = np.asarray(array)
+        if not len(array):
+            return cls(array[:0], np.zeros(0, dtype=np.int64))
+        same = array[1:] == array[:-1]
+        if array.dtype.kind == 'f':
+            same |= np.isnan(array[1:]) & np.isnan(array[:-1])
+        starts = np.flatnonzero(np.concatenate(([True], ~same)))
+        ends = np.append(starts[1:], len(array)).astype(np.int64)
+        return cls(array[starts], ends)
+
+    def __len__(self) -> int:
+        return int(self.ends[-1]) if len(self.ends) else 0
+
+    def counts(self) -> np.ndarray:
+        return np.diff(self.ends, prepend=0)
+
+    def decode(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Expand rows [start, stop) without decoding the other runs"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return self.values[:0].copy()
+        first = int(np.searchsorted(self.ends, start, side='right'))
+        last = int(np.searchsorted(self.ends, stop - 1, side='right'))
+        seg_ends = np.array(self.ends[first:last + 1])
+        seg_ends[-1] = stop
+        counts = np.diff(seg_ends, prepend=start)
+        return np.repeat(self.values[first:last + 1], counts)
+
+    def matches_last(self, value) -> bool:
+        if not len(self.values):
+            return False
+        last = self.values[-1]
+        if self.values.dtype.kind == 'f' and np.isnan(last) and np.isnan(value):
+            return True
+        return last == value
+
+
+class PEStore:
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self._load()
+
+    def _file(self, column: str, part: str) -> str:
+        return os.path.join(self.path, f'{column}.{part}')
+
+    def _load(self) -> None:
+        with open(os.path.join(self.path, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported P/E store version in {self.path}")
+
+        self.columns = {}
+        for name in [TIMESTAMP] + self.meta['columns']:
+            runs = self.meta['runs'][name]
+            dtype = np.dtype(self.meta['dtypes'][name])
+            self.columns[name] = RLEColumn(
+                self._map(self._file(name, 'values'), dtype, runs),
+                self._map(self._file(name, 'ends'), np.dtype('<i8'), runs),
+            )
+        rows = self.meta.get('rows', len(self.columns[TIMESTAMP]))
+        if any(len(column) != rows for column in self.columns.values()):
+            raise ValueError(f"P/E store in {self.path} holds a partial append")
+
+    @staticmethod
+    def _map(path: str, dtype: np.dtype, count: int) -> np.ndarray:
+        if not count:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+    @classmethod
+    def create(cls, path: str, timestamps: np.ndarray,
+               data: Dict[str, np.ndarray], index_label: str = '') -> 'PEStore':
+        """Write a new store from full column arrays"""
+        arrays = {TIMESTAMP: np.asarray(timestamps, dtype='<i8')}
+        arrays.update({name: np.asarray(values, dtype='<f8') for name, values in data.items()})
+
+        meta = {
+            'version': STORE_VERSION,
+            'index_label': index_label,
+            'columns': list(data),
+            'dtypes': {},
+            'runs': {},
+            'rows': len(arrays[TIMESTAMP]),
+        }
+        for name, array in arrays.items():
+            column = RLEColumn.from_array(array)
+            write_atomic(os.path.join(path, f'{name}.values'), column.values.tobytes())
+            write_atomic(os.path.join(path, f'{name}.ends'), column.ends.astype('<i8').tobytes())
+            meta['dtypes'][name] = array.dtype.str
+            meta['runs'][name] = len(column.values)
+
+        write_json_atomic(os.path.join(path, 'meta.json'), meta, indent=2)
+        return cls(path)
+
+    @classmethod
+    def from_csv(cls, csv_path: str = DEFAULT_CSV_PATH,
+                 path: str = DEFAULT_STORE_PATH) -> 'PEStore':
+        """Import processed_pe_data.csv into a new store"""
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            rows = list(reader)
+
+        stamps = np.array([row[0].replace(' ', 'T') for row in rows], dtype='datetime64[ns]')
+        data = {}
+        for i, name in enumerate(header[1:], start=1):
+            data[name] = np.array([float(row[i]) if row[i] else np.nan for row in rows])
+        return cls.create(path, stamps.view('<i8'), data, index_label=header[0])
+
+    def __len__(self) -> int:
+        return len(self.columns[TIMESTAMP])
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.meta['columns'])
+
+    def timestamps(self) -> np.ndarray:
+        return self.columns[TIMESTAMP].decode().view('datetime64[ns]')
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name].decode()
+
+    def slice(self, start=None, end=None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Rows with start <= timestamp < end
+
+        Args:
+            start, end: Anything np.datetime64 accepts, e.g. '2000-01-01'; None is open
+
+        Returns:
+            (timestamps, {column: values})
+        """
+        stamps = self.columns[TIMESTAMP]
+        run_mask = np.ones(len(stamps.values), dtype=bool)
+        if start is not None:
+            run_mask &= stamps.values >= np.datetime64(start, 'ns').astype('<i8')
+        if end is not None:
+            run_mask &= stamps.values < np.datetime64(end, 'ns').astype('<i8')
+
+        # Contiguous range: decode just that window of every column
+        selected = np.flatnonzero(run_mask)
+        if not len(selected):
+            return np.zeros(0, dtype='datetime64[ns]'), {n: np.zeros(0) for n in self.names}
+        if selected[-1] - selected[0] + 1 == len(selected):
+            lo = int(stamps.ends[selected[0] - 1]) if selected[0] else 0
+            hi = int(stamps.ends[selected[-1]])
+            return (stamps.decode(lo, hi).view('datetime64[ns]'),
+                    {n: self.columns[n].decode(lo, hi) for n in self.names})
+
+        row_mask = np.repeat(run_mask, stamps.counts())
+        return (stamps.decode()[row_mask].view('datetime64[ns]'),
+                {n: self.columns[n].decode()[row_mask] for n in self.names})
+
+    def append(self, timestamp, values: Dict[str, float]) -> None:
+        """
+        Append one row after the last one
+
+        Each column's last run is extended when the value is unchanged,
+        otherwise a run is added; every .ends file is rewritten either way.
+        Files are replaced one at a time and meta.json last, so a crash part
+        way through is caught by the row count check on the next open.
+        """
+        row = {TIMESTAMP: np.datetime64(timestamp, 'ns').astype('<i8')}
+        n = len(self)
+        if n and row[TIMESTAMP] <= self.columns[TIMESTAMP].values[-1]:
+            raise ValueError(f"Timestamp {timestamp} is not after the last row of the P/E store")
+        for name in self.names:
+            row[name] = float(values.get(name, np.nan))
+
+        for name, value in row.items():
+            column = self.columns[name]
+            dtype = np.dtype(self.meta['dtypes'][name])
+            ends = np.array(column.ends, dtype='<i8')
+            if column.matches_last(value):
+                ends[-1] = n + 1
+            else:
+                values = np.append(column.values, np.array([value], dtype=dtype))
+                write_atomic(self._file(name, 'values'), values.tobytes())
+                ends = np.append(ends, np.array([n + 1], dtype='<i8'))
+                self.meta['runs'][name] += 1
+            write_atomic(self._file(name, 'ends'), ends.tobytes())
+
+        self.meta['rows'] = n + 1
+        write_json_atomic(os.path.join(self.path, 'meta.json'), self.meta, indent=2)
+        self._load()
+
+    def to_csv(self, csv_path: str = DEFAULT_CSV_PATH) -> None:
+        """Export the store in the original processed_pe_data.csv format"""
+
+        def expand(column, strings):
+            return np.repeat(np.array(strings, dtype=object), column.counts()).tolist()
+
+        # Each distinct run value is formatted once, then repeated
+        stamps = self.columns[TIMESTAMP]
+        stamp_strings = np.char.replace(
+            np.datetime_as_string(np.asarray(stamps.values).view('datetime64[ns]'), unit='ns'),
+            'T', ' '
+        )
+        columns = [expand(stamps, stamp_strings.tolist())]
+        for name in self.names:
+            column = self.columns[name]
+            strings = ['' if np.isnan(v) else repr(float(v)) for v in column.values]
+            columns.append(expand(column, strings))
+
+        header = ','.join([self.meta['index_label']] + self.names)
+        write_atomic(csv_path, header + '\n' + '\n'.join(map(','.join, zip(*columns))) + '\n')
+
+
+def open_store(path: str = DEFAULT_STORE_PATH, csv_path: str = DEFAULT_CSV_PATH) -> PEStore:
+    """Open the store, importing the CSV first if the store is missing, older than it or inconsistent"""
+    meta_path = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_path):
+        return PEStore.from_csv(csv_path, path)
+    # A CSV edited or pulled after the import leaves the store stale
+    if os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(meta_path):
+        print(f"✓ {csv_path} changed since the last import, rebuilding {path}")
+        return PEStore.from_csv(csv_path, path)
+    try:
+        return PEStore(path)
+    except ValueError as e:
+        print(f"⚠️ {e}, rebuilding it from {csv_path}")
+        return PEStore.from_csv(csv_path, path)
+
+
+def benchmark(csv_path: str = DEFAULT_CSV_PATH, path: str = '/tmp/pe_store_bench',
+              repeat: int = 10) -> None:
+    """Compare parsing the CSV with loading, slicing and exporting the store"""
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = fn()
+        return (time.perf_counter() - start) / repeat * 1000, result
+
+    def parse_csv():
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            next(reader)
+            return [(row[0], [float(v) for v in row[1:]]) for row in reader]
+
+    parse_ms, _ = timed(parse_csv)
+    PEStore.from_csv(csv_path, path)
+    load_ms, _ = timed(lambda: [PEStore(path).column(n) for n in PE_COLUMNS])
+    store = PEStore(path)
+    slice_ms, _ = timed(lambda: store.slice('2000-01-01', '2020-01-01'))
+    export_ms, _ = timed(lambda: store.to_csv(os.path.join(path, 'export.csv')))
+
+    runs = sum(store.meta['runs'].values())
+    print(f"Rows: {len(store)}, runs stored: {runs}")
+    print(f"✓ Parse CSV text: {parse_ms:.2f} ms")
+    print(f"✓ Load store (all columns): {load_ms:.2f} ms")
+    print(f"✓ Slice 2000-2020: {slice_ms:.2f} ms")
+    print(f"✓ Export to CSV: {export_ms:.2f} ms")
+
+
+if __name__ == '__main__':
+    # python pe_store.py import [csv] [store]   build the store from the CSV
+    # python pe_store.py export [store] [csv]   write the CSV for the frontend
+    # python pe_store.py                        run the benchmark
+    command, args = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else ('benchmark', [])
+    if command == 'import':
+        store = PEStore.from_csv(*args)
+        print(f"✓ Imported {len(store)} rows into {store.path}")
+    elif command == 'export':
+        csv_target = args[1] if len(args) > 1 else DEFAULT_CSV_PATH
+        PEStore(*args[:1]).to_csv(csv_target)
+        print(f"✓ Exported to {csv_target}")
+    else:
+        benchmark()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Unified update pipeline
+Runs every update step (quotes, 13F, analytics, sentiment, render) as
+stages of one dependency graph. Independent stages run in parallel, a stage
+is skipped when the content hash of its input files and upstream results
+matches the last successful run, and all bundle sections are published in
+one write at the end, so each page and bundle is written at most once per
+run.
+
+Skipped stages return None; their sections are already in the current
+bundle, which publish merges into. Quotes pass through the snapshot log,
+so a run in which no quote moved beyond its tolerance leaves the market
+and render stages unchanged and nothing is written. The 13F branch is an
+optional dependency: when EDGAR fails, fund analytics use the last saved
+13F data and render still publishes the quotes. A stage's hash is only
+recorded once everything downstream of it has succeeded, so a failed
+render is retried with its inputs on the next run.
+
+Usage:
+    python pipeline.py                 run every stage
+    python pipeline.py --force         ignore recorded hashes
+    python pipeline.py --skip thirteen_f
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from atomic_io import write_json_atomic
+from run_metrics import instrumented, metrics
+
+STATE_FILE = '.cache/pipeline_state.json'
+SCRIPTS_DIR = Path(__file__).resolve().parent / 'scripts'
+
+
+class Stage:
+    def __init__(self, name: str, run: Callable[[Dict], Optional[Dict]],
+                 deps: Sequence[str] = (), inputs: Sequence[str] = (),
+                 volatile: bool = False, optional: Sequence[str] = ()):
+        """
+        Args:
+            name: Stage name
+            run: Called with {dep name: dep result}; returns the stage result
+            deps: Stages that must finish first
+            optional: Deps whose failure passes None instead of blocking the stage
+            inputs: Files whose content decides whether the stage reruns
+            volatile: Always run (the stage reads external data)
+        """
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.inputs = tuple(inputs)
+        self.volatile = volatile
+        self.optional = frozenset(optional)
+
+
+def content_hash(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def file_hash(path: str) -> Optional[str]:
+    """Content hash of a file, or of every file under a directory"""
+    if os.path.isdir(path):
+        return content_hash({
+            name: file_hash(os.path.join(path, name)) for name in sorted(os.listdir(path))
+        })
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+class Pipeline:
+    def __init__(self, stages: Iterable[Stage], state_file: str = STATE_FILE,
+                 max_workers: int = 4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_file = state_file
+        self.max_workers = max_workers
+        for stage in self.stages.values():
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {missing}")
+        self.order = self._topological_order()
+        self.dependents = self._dependents()
+
+    def _topological_order(self) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through stage {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _dependents(self) -> Dict[str, set]:
+        """Every stage downstream of each stage"""
+        dependents = {name: set() for name in self.stages}
+        for name in self.order:
+            for dep in self.stages[name].deps:
+                dependents[dep].add(name)
+        for name in reversed(self.order):
+            for child in list(dependents[name]):
+                dependents[name] |= dependents[child]
+        return dependents
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict) -> None:
+        write_json_atomic(self.state_file, state, indent=2, sort_keys=True)
+
+    def _input_key(self, stage: Stage, result_hashes: Dict[str, str]) -> str:
+        return content_hash({
+            'files': {path: file_hash(path) for path in stage.inputs},
+            'deps': {dep: result_hashes.get(dep) for dep in stage.deps},
+        })
+
+    def run(self, force: bool = False, skip: Iterable[str] = ()) -> Dict[str, str]:
+        """
+        Run the graph
+
+        Args:
+            force: Run every stage regardless of recorded input hashes
+            skip: Stages to leave out; their dependents run with None results
+
+        Returns:
+            {stage: 'ran' | 'unchanged' | 'skipped' | 'failed' | 'blocked'}
+        """
+        state = self._load_state()
+        skip = set(skip)
+        status: Dict[str, str] = {}
+        results: Dict[str, Optional[Dict]] = {}
+        result_hashes = {name: entry.get('result') for name, entry in state.items()}
+        recorded: Dict[str, Dict] = {}
+        pending = list(self.order)
+        running = {}
+
+        def settle(name, outcome, result=None):
+            status[name] = outcome
+            results[name] = result
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if any(dep not in status for dep in stage.deps):
+                        continue
+                    pending.remove(name)
+                    if name in skip:
+                        settle(name, 'skipped')
+                        print(f"⏭ {name}: skipped")
+                        continue
+                    if any(status[dep] in ('failed', 'blocked') for dep in stage.deps
+                           if dep not in stage.optional):
+                        settle(name, 'blocked')
+                        print(f"⚠️ {name}: blocked by a failed dependency")
+                        continue
+                    key = self._input_key(stage, result_hashes)
+                    if not force and not stage.volatile and state.get(name, {}).get('inputs') == key:
+                        settle(name, 'unchanged')
+                        print(f"✓ {name}: inputs unchanged, skipped")
+                        continue
+                    dep_results = {dep: results.get(dep) for dep in stage.deps}
+                    running[pool.submit(self._timed, stage, dep_results)] = (name, key)
+
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name, key = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        settle(name, 'failed')
+                        print(f"❌ {name}: {e}")
+                        continue
+                    settle(name, 'ran', result)
+                    result_hashes[name] = content_hash(result)
+                    recorded[name] = {'inputs': key, 'result': result_hashes[name]}
+
+        # Keys of failed stages, and of stages whose results did not make it
+        # downstream, are left as they were so they rerun next time
+        for name, entry in recorded.items():
+            if all(status.get(child) in ('ran', 'unchanged') for child in self.dependents[name]):
+                state[name] = entry
+        self._save_state(state)
+        return status
+
+    @staticmethod
+    def _timed(stage: Stage, dep_results: Dict) -> Optional[Dict]:
+        start = time.perf_counter()
+        with metrics.timer(f'stage.{stage.name}'):
+            result = stage.run(dep_results)
+        print(f"✓ {stage.name}: done in {time.perf_counter() - start:.2f}s")
+        return result
+
+
+def load_script(filename: str):
+    """Import one of the hyphenated scripts/*.py files as a module"""
+    path = SCRIPTS_DIR / filename
+    spec = importlib.util.spec_from_file_location(path.stem.replace('-', '_'), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def merge_sections(target: Dict, sections: Dict) -> None:
+    """Merge bundle sections, combining entries that two stages both fill"""
+    for key, value in sections.items():
+        current = target.get(key)
+        if isinstance(current, dict) and isinstance(value, dict):
+            for entry_key, entry in value.items():
+                if isinstance(current.get(entry_key), dict) and isinstance(entry, dict):
+                    current[entry_key] = {**entry, **current[entry_key]}
+                else:
+                    current.setdefault(entry_key, entry)
+        else:
+            target[key] = value
+
+
+def build_stages() -> List[Stage]:
+    """The update pipeline shared by both scheduled workflows"""
+    import update_data
+    import update_html
+    import update_market_data
+    from fund_valuation import load_holdings
+    from quote_fetcher import fetch_quotes
+    from snapshot_delta import SnapshotLog
+
+    fetch_13f = load_script('fetch-13f-data-fixed.py')
+    html_updater = load_script('update-html-data-fixed.py').HTMLDataUpdater()
+
+    def quotes(_):
+        symbols = update_market_data.quote_symbols(load_holdings())
+        symbols += [s for s in update_data.all_symbols() if s not in symbols]
+        # The published snapshot only changes when a quote moved beyond its
+        # tolerance, so an empty delta leaves every downstream stage unchanged
+        state, delta = SnapshotLog().publish(fetch_quotes(symbols))
+        if delta is None:
+            print("✓ quotes: no moves beyond tolerance since the last snapshot")
+        return state
+
+    def market(deps):
+        sections, holding_quotes = update_market_data.build_market_sections(
+            deps['quotes'], load_holdings())
+        # The snapshot adds index prices and the regional stock lists
+        snapshot = update_html.build_sections(update_data.collect_market_data(deps['quotes']))
+        merge_sections(sections, snapshot)
+        return {'sections': sections, 'holding_quotes': holding_quotes}
+
+    def thirteen_f(_):
+        return fetch_13f.main()
+
+    def pe_statistics(_):
+        import pe_statistics as statistics
+        statistics.main()
+
+    def sentiment(_):
+        import sentiment as fear_greed
+
+        joint = fear_greed.analyze()
+        if not joint:
+            return None
+        section = fear_greed.bundle_section(joint)
+        fear_greed.generate_js(section)
+        return {'fear_greed': section}
+
+    def fund_analytics(deps):
+        data = deps['thirteen_f'] if deps['thirteen_f'] is not None else html_updater.load_data()
+        market_result = deps['market'] or {}
+        sections = market_result.get('sections', {})
+        return html_updater.bundle_sections(data, market_result.get('holding_quotes'),
+                                            sections.get('indices'))
+
+    def render(deps):
+        from data_bundle import publish
+
+        sections = {}
+        if deps['market']:
+            merge_sections(sections, deps['market']['sections'])
+        if deps['fund_analytics']:
+            merge_sections(sections, deps['fund_analytics'])
+        if deps['sentiment']:
+            merge_sections(sections, deps['sentiment'])
+        if not sections:
+            return None
+        data = sections.get('thirteen_f') or html_updater.load_data()
+        publish(sections, html_files=html_updater.html_files,
+                page_values=html_updater.page_values(data))
+        return {'published': sorted(sections)}
+
+    return [
+        Stage('quotes', quotes, volatile=True),
+        Stage('thirteen_f', thirteen_f, volatile=True),
+        Stage('pe_statistics', pe_statistics, inputs=['src/assets/processed_pe_data.csv']),
+        Stage('market', market, deps=['quotes'], inputs=['data/constituents']),
+        Stage('fund_analytics', fund_analytics, deps=['market', 'thirteen_f'],
+              optional=['thirteen_f'], inputs=['scripts/13f-data.json', 'dist/13f-data.json']),
+        Stage('sentiment', sentiment, inputs=['data/sentiment', 'src/assets/processed_pe_data.csv']),
+        Stage('render', render, deps=['market', 'fund_analytics', 'sentiment'],
+              optional=['fund_analytics', 'sentiment']),
+    ]
+
+
+def main(argv: List[str]) -> int:
+    force = '--force' in argv
+    skip = []
+    if '--skip' in argv:
+        skip = argv[argv.index('--skip') + 1].split(',')
+
+    start = time.perf_counter()
+    with instrumented('pipeline') as run:
+        status = Pipeline(build_stages()).run(force=force, skip=skip)
+        for outcome in status.values():
+            run.count(f'stages.{outcome}')
+    print(f"\n✓ Pipeline finished in {time.perf_counter() - start:.2f}s")
+    for name, outcome in status.items():
+        print(f"  {name}: {outcome}")
+    return 1 if any(outcome in ('failed', 'blocked') for outcome in status.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Historical daily price and earnings backfill
+Downloads daily closes in fixed date chunks and reported quarterly EPS for
+every tracked symbol through the rate-limited fetch pool, derives each
+symbol's daily trailing P/E with array operations and writes a columnar
+store:
+
+    data/price_history/chunks/<symbol>/<start>.npz   one downloaded chunk
+    data/price_history/checkpoint.json               finished chunks
+    data/price_history/store/meta.json               symbols and row offsets
+    data/price_history/store/<column>.values         raw little-endian columns
+
+Chunks sit on a fixed calendar grid, so a rerun only downloads chunks it
+has not finished; the chunk still open at today and EPS older than a week
+are fetched again. The checkpoint is written every few chunks, so an
+interrupted backfill resumes where it stopped.
+
+Usage:
+    python price_history.py backfill [--years 10] [--chunk-days 365] [--symbols A,B] [--workers 8]
+    python price_history.py show SYMBOL
+    python price_history.py benchmark
+"""
+
+import argparse
+import bisect
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from atomic_io import write_atomic, write_json_atomic
+from quote_fetcher import DEFAULT_MAX_WORKERS, DEFAULT_RATE_LIMIT, RateLimiter, call_with_retry
+from quote_providers import QuoteProvider, StubProvider, get_provider
+from run_metrics import instrumented, metrics
+
+HISTORY_DIR = 'data/price_history'
+STORE_VERSION = 1
+DEFAULT_YEARS = 10
+DEFAULT_CHUNK_DAYS = 365
+EPS_MAX_AGE_DAYS = 7
+CHECKPOINT_EVERY = 25         # finished chunks between checkpoint writes
+TTM_QUARTERS = 4
+
+# Store column -> dtype
+COLUMNS = {'date': '<i4', 'close': '<f8', 'ttm_eps': '<f8', 'pe': '<f8'}
+EARNINGS_COLUMNS = {'earnings_date': '<i4', 'eps': '<f8'}
+
+
+def tracked_symbols() -> List[str]:
+    """Every stock quoted by the update scripts, including 13F holdings"""
+    import update_data
+    import update_market_data
+    from fund_valuation import load_holdings
+
+    symbols = update_market_data.quote_symbols(load_holdings())
+    symbols += [s for s in update_data.all_symbols() if s not in symbols]
+    return [s for s in symbols if not s.startswith('^')]
+
+
+def chunk_grid(start: date, end: date, chunk_days: int) -> List[Tuple[date, date]]:
+    """Half-open [start, end) chunks aligned to multiples of chunk_days since the epoch"""
+    epoch = date(1970, 1, 1)
+    first = (start - epoch).days // chunk_days
+    last = (end - epoch).days // chunk_days
+    return [
+        (epoch + timedelta(days=k * chunk_days), epoch + timedelta(days=(k + 1) * chunk_days))
+        for k in range(first, last + 1)
+    ]
+
+
+def _days(dates: List[str]) -> np.ndarray:
+    return np.array(dates, dtype='datetime64[D]').astype('<i4')
+
+
+def _save_npz(path: str, **arrays) -> None:
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    write_atomic(path, buffer.getvalue())
+
+
+class Checkpoint:
+    """Finished download tasks with the day each was fetched"""
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.tasks: Dict[str, str] = json.load(f).get('tasks', {})
+        except (FileNotFoundError, ValueError):
+            self.tasks = {}
+        self.unsaved = 0
+
+    def done(self, task: str, fresh_since: date) -> bool:
+        fetched = self.tasks.get(task)
+        return fetched is not None and date.fromisoformat(fetched) >= fresh_since
+
+    def record(self, task: str, fetched: date) -> None:
+        self.tasks[task] = fetched.isoformat()
+        self.unsaved += 1
+        if self.unsaved >= CHECKPOINT_EVERY:
+            self.save()
+
+    def save(self) -> None:
+        if not self.unsaved and os.path.exists(self.path):
+            return
+        write_json_atomic(self.path, {'version': STORE_VERSION, 'tasks': self.tasks}, sort_keys=True)
+        self.unsaved = 0
+
+
+def trailing_pe(days: np.ndarray, close: np.ndarray, earnings_days: np.ndarray,
+                eps: np.ndarray, quarters: int = TTM_QUARTERS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Daily trailing P/E of one symbol
+
+    Each close is matched to the sum of the last `quarters` EPS reported
+    strictly before that day, so a report released after the close does
+    not leak into it. P/E is NaN where trailing EPS is missing or not
+    positive.
+
+    Returns:
+        (ttm_eps, pe) aligned with close
+    """
+    if len(eps) < quarters:
+        missing = np.full(len(days), np.nan)
+        return missing, missing.copy()
+    # ttm[i] sums reports i .. i+quarters-1, known from earnings_days[i+quarters-1]
+    ttm = np.convolve(eps, np.ones(quarters), 'valid')
+    report = np.searchsorted(earnings_days[quarters - 1:], days, side='left') - 1
+    ttm_eps = np.where(report >= 0, ttm[np.maximum(report, 0)], np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pe = np.where(ttm_eps > 0, close / ttm_eps, np.nan)
+    return ttm_eps, pe
+
+
+class PriceHistory:
+    """Memory-mapped daily price and trailing P/E columns for many symbols"""
+
+    def __init__(self, path: str = os.path.join(HISTORY_DIR, 'store')):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported price history version in {path}")
+        self.symbols: List[str] = self.meta['symbols']
+        self.row = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.offsets = np.array(self.meta['offsets'], dtype=np.int64)
+        self.earnings_offsets = np.array(self.meta['earnings_offsets'], dtype=np.int64)
+        self.columns = {
+            name: self._map(name, dtype, int(self.offsets[-1])) for name, dtype in COLUMNS.items()
+        }
+        self.columns.update({
+            name: self._map(name, dtype, int(self.earnings_offsets[-1]))
+            for name, dtype in EARNINGS_COLUMNS.items()
+        })
+
+    def _map(self, name: str, dtype: str, count: int) -> np.ndarray:
+        if not count:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, f'{name}.values'), dtype=dtype, mode='r', shape=(count,))
+
+    @classmethod
+    def build(cls, path: str, series: Dict[str, Dict[str, np.ndarray]]) -> 'PriceHistory':
+        """
+        Write a store from per-symbol arrays
+
+        Args:
+            series: {symbol: {'date', 'close', 'earnings_date', 'eps'}} with
+                day numbers since the epoch
+        """
+        symbols = sorted(series)
+        parts = {name: [np.zeros(0)] for name in {**COLUMNS, **EARNINGS_COLUMNS}}
+        for symbol in symbols:
+            entry = series[symbol]
+            ttm_eps, pe = trailing_pe(entry['date'], entry['close'], entry['earnings_date'], entry['eps'])
+            for name, values in {**entry, 'ttm_eps': ttm_eps, 'pe': pe}.items():
+                parts[name].append(values)
+        offsets = np.concatenate(([0], np.cumsum([len(series[s]['date']) for s in symbols])))
+        earnings_offsets = np.concatenate(([0], np.cumsum([len(series[s]['eps']) for s in symbols])))
+        columns = {name: np.concatenate(arrays) for name, arrays in parts.items()}
+
+        for name, dtype in {**COLUMNS, **EARNINGS_COLUMNS}.items():
+            write_atomic(os.path.join(path, f'{name}.values'), columns[name].astype(dtype).tobytes())
+        meta = {
+            'version': STORE_VERSION,
+            'symbols': symbols,
+            'offsets': offsets.tolist(),
+            'earnings_offsets': earnings_offsets.tolist(),
+            'built_at': date.today().isoformat(),
+        }
+        # meta.json goes last: it holds the row counts the column files are read with
+        write_json_atomic(os.path.join(path, 'meta.json'), meta)
+        return cls(path)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.row
+
+    def series(self, symbol: str) -> Dict[str, np.ndarray]:
+        """Daily dates, closes, trailing EPS and P/E of one symbol"""
+        i = self.row[symbol]
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        result = {name: np.asarray(self.columns[name][rows]) for name in COLUMNS}
+        result['date'] = result['date'].astype('datetime64[D]')
+        return result
+
+    def latest_pe(self) -> Dict[str, Optional[float]]:
+        """Most recent trailing P/E of every symbol"""
+        last = self.offsets[1:] - 1
+        has_rows = np.diff(self.offsets) > 0
+        pe = np.where(has_rows, self.columns['pe'][np.maximum(last, 0)] if len(self.columns['pe']) else np.nan,
+                      np.nan)
+        return {symbol: (round(float(v), 2) if np.isfinite(v) else None)
+                for symbol, v in zip(self.symbols, pe)}
+
+
+class Backfill:
+    def __init__(self, provider: Optional[QuoteProvider] = None, directory: str = HISTORY_DIR,
+                 chunk_days: int = DEFAULT_CHUNK_DAYS, max_workers: int = DEFAULT_MAX_WORKERS,
+                 rate_limit: float = DEFAULT_RATE_LIMIT):
+        self.provider = provider or get_provider()
+        self.directory = directory
+        self.chunk_dir = os.path.join(directory, 'chunks')
+        self.chunk_days = chunk_days
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rate_limit)
+        self.checkpoint = Checkpoint(os.path.join(directory, 'checkpoint.json'))
+
+    def _chunk_path(self, symbol: str, name: str) -> str:
+        return os.path.join(self.chunk_dir, symbol, f'{name}.npz')
+
+    def _prices(self, symbol: str, start: date, end: date) -> bool:
+        end = min(end, date.today() + timedelta(days=1))
+        history = self.provider.get_history(symbol, start.isoformat(), end.isoformat())
+        days = _days(history['dates'])
+        close = np.asarray(history['close'], dtype=np.float64)
+        keep = np.isfinite(close)
+        _save_npz(self._chunk_path(symbol, start.isoformat()), date=days[keep], close=close[keep])
+        metrics.count('history.rows', int(keep.sum()))
+        return True
+
+    def _earnings(self, symbol: str) -> bool:
+        earnings = self.provider.get_earnings(symbol)
+        days = _days(earnings['dates'])
+        eps = np.asarray(earnings['eps'], dtype=np.float64)
+        keep = np.isfinite(eps)
+        _save_npz(self._chunk_path(symbol, 'eps'), earnings_date=days[keep], eps=eps[keep])
+        return True
+
+    def tasks(self, symbols: List[str], start: date,
+              today: date) -> List[Tuple[str, str, Optional[Tuple[date, date]]]]:
+        """(task id, symbol, (start, end) or None for EPS) still to download"""
+        pending = []
+        grid = chunk_grid(start, today, self.chunk_days)
+        for symbol in symbols:
+            task = f'{symbol}|eps'
+            if not self.checkpoint.done(task, today - timedelta(days=EPS_MAX_AGE_DAYS)):
+                pending.append((task, symbol, None))
+            for chunk_start, chunk_end in grid:
+                task = f'{symbol}|{chunk_start.isoformat()}'
+                # A chunk reaching today is only complete once fetched after it closed
+                if not self.checkpoint.done(task, min(chunk_end, today)):
+                    pending.append((task, symbol, (chunk_start, chunk_end)))
+        return pending
+
+    def download(self, symbols: List[str], start: date, today: Optional[date] = None) -> int:
+        """
+        Fetch every unfinished chunk in parallel
+
+        Returns:
+            Number of chunks that still failed after retries
+        """
+        today = today or date.today()
+        pending = self.tasks(symbols, start, today)
+        print(f"✓ {len(pending)} chunks to download for {len(symbols)} symbols")
+
+        def run(task):
+            _, symbol, chunk = task
+            if chunk is None:
+                call = lambda: self._earnings(symbol)
+            else:
+                call = lambda: self._prices(symbol, *chunk)
+            return call_with_retry(call, task[0], self.provider.host, self.limiter, metric='history')
+
+        failed = 0
+        workers = max(1, min(self.max_workers, len(pending)))
+        try:
+            with metrics.timer('history.download'), ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(run, task): task for task in pending}
+                for finished, future in enumerate(as_completed(futures), start=1):
+                    if future.result():
+                        self.checkpoint.record(futures[future][0], today)
+                    else:
+                        failed += 1
+                    if finished % 500 == 0:
+                        print(f"  {finished}/{len(pending)} chunks")
+        finally:
+            self.checkpoint.save()
+        return failed
+
+    def load_symbol(self, symbol: str, start: date) -> Dict[str, np.ndarray]:
+        """Concatenate the downloaded chunks of one symbol from start on"""
+        directory = os.path.join(self.chunk_dir, symbol)
+        days, close = [np.zeros(0, dtype='<i4')], [np.zeros(0)]
+        earnings = {'earnings_date': np.zeros(0, dtype='<i4'), 'eps': np.zeros(0)}
+        names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+        for name in names:
+            with np.load(os.path.join(directory, name)) as chunk:
+                if name == 'eps.npz':
+                    earnings = {key: chunk[key] for key in earnings}
+                else:
+                    days.append(chunk['date'])
+                    close.append(chunk['close'])
+        days, close = np.concatenate(days), np.concatenate(close)
+        days, first = np.unique(days, return_index=True)
+        keep = days >= (start - date(1970, 1, 1)).days
+        order = np.argsort(earnings['earnings_date'], kind='stable')
+        return {
+            'date': days[keep], 'close': close[first][keep],
+            'earnings_date': earnings['earnings_date'][order], 'eps': earnings['eps'][order],
+        }
+
+    def run(self, symbols: List[str], years: int = DEFAULT_YEARS) -> Optional[PriceHistory]:
+        """Download what is missing and rebuild the store; None if chunks failed"""
+        today = date.today()
+        start = today - timedelta(days=round(years * 365.25))
+        failed = self.download(symbols, start, today)
+        self.provider.flush()
+        if failed:
+            print(f"⚠️ {failed} chunks failed; rerun to resume from the checkpoint")
+            return None
+        with metrics.timer('history.build'):
+            store = PriceHistory.build(os.path.join(self.directory, 'store'),
+                                       {symbol: self.load_symbol(symbol, start) for symbol in symbols})
+        print(f"✓ Price history for {len(store.symbols)} symbols, {int(store.offsets[-1])} daily rows")
+        return store
+
+
+def benchmark(symbols: int = 2_000, years: int = 10, scalar_symbols: int = 50) -> None:
+    """Time the array trailing P/E against a scalar per-day loop"""
+    provider = StubProvider()
+    start = (date.today() - timedelta(days=365 * years)).isoformat()
+    end = date.today().isoformat()
+    series = []
+    for i in range(symbols):
+        symbol = f'SYM{i:05d}'
+        history, earnings = provider.get_history(symbol, start, end), provider.get_earnings(symbol)
+        series.append((_days(history['dates']), np.array(history['close']),
+                       _days(earnings['dates']), np.array(earnings['eps'])))
+    rows = sum(len(s[0]) for s in series)
+
+    start_time = time.perf_counter()
+    pe = [trailing_pe(*s)[1] for s in series]
+    vectorized = time.perf_counter() - start_time
+
+    def scalar(days, close, earnings_days, eps):
+        days, close, earnings_days, eps = (a.tolist() for a in (days, close, earnings_days, eps))
+        result = []
+        for day, price in zip(days, close):
+            known = bisect.bisect_left(earnings_days, day)
+            ttm = sum(eps[known - TTM_QUARTERS:known]) if known >= TTM_QUARTERS else None
+            result.append(price / ttm if ttm and ttm > 0 else None)
+        return result
+
+    start_time = time.perf_counter()
+    for s in series[:scalar_symbols]:
+        scalar(*s)
+    looped = (time.perf_counter() - start_time) * symbols / scalar_symbols
+    print(f"✓ {symbols} symbols, {rows} daily rows: arrays {vectorized * 1000:.1f} ms, "
+          f"scalar loop ~{looped * 1000:.0f} ms, median P/E {np.nanmedian(np.concatenate(pe)):.1f}")
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description='Historical price and P/E backfill')
+    commands = parser.add_subparsers(dest='command', required=True)
+    backfill = commands.add_parser('backfill')
+    backfill.add_argument('--years', type=float, default=DEFAULT_YEARS)
+    backfill.add_argument('--chunk-days', type=int, default=DEFAULT_CHUNK_DAYS)
+    backfill.add_argument('--symbols', help='comma-separated, defaults to every tracked stock')
+    backfill.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS)
+    backfill.add_argument('--dir', default=HISTORY_DIR)
+    show = commands.add_parser('show')
+    show.add_argument('symbol')
+    show.add_argument('--dir', default=HISTORY_DIR)
+    commands.add_parser('benchmark')
+    args = parser.parse_args(argv)
+
+    if args.command == 'benchmark':
+        benchmark()
+        return 0
+    if args.command == 'show':
+        store = PriceHistory(os.path.join(args.dir, 'store'))
+        if args.symbol not in store:
+            print(f"❌ No history for {args.symbol}")
+            return 1
+        series = store.series(args.symbol)
+        for i in range(max(0, len(series['date']) - 10), len(series['date'])):
+            print(f"  {series['date'][i]}  close={series['close'][i]:.2f}  "
+                  f"ttm_eps={series['ttm_eps'][i]:.2f}  pe={series['pe'][i]:.2f}")
+        return 0
+
+    symbols = args.symbols.split(',') if args.symbols else tracked_symbols()
+    with instrumented('price_history'):
+        store = Backfill(directory=args.dir, chunk_days=args.chunk_days,
+                         max_workers=args.workers).run(symbols, args.years)
+    return 0 if store is not None else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
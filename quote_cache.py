@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Persistent TTL quote cache
+SQLite store keyed by (symbol, field) with per-field TTLs, an LRU bound on
+the number of cached symbols and hit/miss counters, shared by every updater
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_CACHE_PATH = '.cache/quotes.sqlite'
+DEFAULT_MAX_SYMBOLS = 10000
+
+MINUTE = 60
+DAY = 24 * 60 * MINUTE
+
+# Seconds each field stays fresh
+FIELD_TTLS = {
+    'currentPrice': 15 * MINUTE,
+    'regularMarketChangePercent': 15 * MINUTE,
+    'marketCap': DAY,
+    'trailingPE': DAY,
+    'longName': 28 * DAY,
+}
+DEFAULT_TTL = 15 * MINUTE
+
+
+class QuoteCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH,
+                 ttls: Optional[Dict[str, float]] = None,
+                 max_symbols: int = DEFAULT_MAX_SYMBOLS):
+        self.path = path
+        self.ttls = dict(FIELD_TTLS if ttls is None else ttls)
+        self.max_symbols = max_symbols
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS quote_fields (
+                symbol TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (symbol, field)
+            );
+            CREATE TABLE IF NOT EXISTS quote_access (
+                symbol TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            );
+        """)
+
+    def ttl(self, field: str) -> float:
+        return self.ttls.get(field, DEFAULT_TTL)
+
+    def get(self, symbol: str, fields: Iterable[str]) -> Tuple[Dict, bool]:
+        """
+        Look up cached fields for a symbol
+
+        Returns:
+            (values, fresh) where fresh is True only if every requested
+            field is cached and within its TTL
+        """
+        fields = list(fields)
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT field, value, stored_at FROM quote_fields WHERE symbol = ?',
+                (symbol,)
+            ).fetchall()
+            values = {}
+            stale = set(fields)
+            for field, value, stored_at in rows:
+                values[field] = json.loads(value)
+                if now - stored_at < self.ttl(field):
+                    stale.discard(field)
+            fresh = bool(rows) and not stale
+            if fresh:
+                self.hits += 1
+                self._touch(symbol, now)
+                self._conn.commit()
+            else:
+                self.misses += 1
+            return values, fresh
+
+    def put(self, symbol: str, info: Dict, fields: Iterable[str] = ()) -> None:
+        """Store every field of info, recording requested fields it lacks as None"""
+        now = time.time()
+        values = {field: None for field in fields}
+        values.update(info)
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO quote_fields VALUES (?, ?, ?, ?)',
+                [(symbol, field, json.dumps(value, default=str), now)
+                 for field, value in values.items()]
+            )
+            self._touch(symbol, now)
+            self._evict()
+            self._conn.commit()
+
+    def _touch(self, symbol: str, now: float) -> None:
+        self._conn.execute(
+            'INSERT OR REPLACE INTO quote_access VALUES (?, ?)', (symbol, now)
+        )
+
+    def _evict(self) -> None:
+        count = self._conn.execute('SELECT COUNT(*) FROM quote_access').fetchone()[0]
+        excess = count - self.max_symbols
+        if excess <= 0:
+            return
+        victims = [row[0] for row in self._conn.execute(
+            'SELECT symbol FROM quote_access ORDER BY last_access LIMIT ?', (excess,)
+        )]
+        self._conn.executemany('DELETE FROM quote_fields WHERE symbol = ?',
+                               [(s,) for s in victims])
+        self._conn.executemany('DELETE FROM quote_access WHERE symbol = ?',
+                               [(s,) for s in victims])
+        self.evictions += len(victims)
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
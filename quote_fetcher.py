@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Concurrent batch quote fetcher
+Fetches quote info for many symbols through a bounded thread pool with
+per-host rate limiting and retries with exponential backoff
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, TypeVar
+
+from quote_providers import QuoteNotFound, QuoteProvider, StubProvider, get_provider
+from run_metrics import metrics
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_RATE_LIMIT = 10.0   # requests per second per host
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5       # seconds, doubled on every retry
+
+T = TypeVar('T')
+
+
+class RateLimiter:
+    """Token bucket limiter keyed by host, safe to share between threads"""
+
+    def __init__(self, rate: float = DEFAULT_RATE_LIMIT, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str) -> None:
+        """Block until a request to host is allowed"""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                if tokens >= 1:
+                    self._buckets[host] = (tokens - 1, now)
+                    return
+                self._buckets[host] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+def call_with_retry(call: Callable[[], T], label: str, host: str, limiter: RateLimiter,
+                    retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF,
+                    metric: str = 'quotes') -> Optional[T]:
+    """
+    Rate-limited call with exponential backoff
+
+    Counts <metric>.requests, .retries and .failures; returns None once
+    every retry has failed. A missing symbol (QuoteNotFound) or a provider
+    without the data (NotImplementedError) fails at once without retrying.
+    """
+    for attempt in range(retries + 1):
+        limiter.acquire(host)
+        metrics.count(f'{metric}.requests')
+        try:
+            return call()
+        except (QuoteNotFound, NotImplementedError) as e:
+            metrics.count(f'{metric}.failures')
+            print(f"Error fetching {label}: {e}")
+            return None
+        except Exception as e:
+            if attempt == retries:
+                metrics.count(f'{metric}.failures')
+                print(f"Error fetching {label}: {e}")
+                return None
+            metrics.count(f'{metric}.retries')
+            time.sleep(backoff * (2 ** attempt))
+
+
+def _fetch_with_retry(symbol, provider, limiter, retries, backoff):
+    # Cache hits are served before taking a rate limit token
+    info = provider.cached_info(symbol)
+    if info is not None:
+        return info
+    return call_with_retry(lambda: provider.refresh_info(symbol), symbol, provider.host,
+                           limiter, retries, backoff)
+
+
+def fetch_quotes(symbols: Iterable[str],
+                 provider: Optional[QuoteProvider] = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 rate_limit: float = DEFAULT_RATE_LIMIT,
+                 retries: int = DEFAULT_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF) -> Dict[str, Optional[Dict]]:
+    """
+    Fetch quote info for every symbol concurrently
+
+    Args:
+        symbols: Ticker symbols to fetch, duplicates are fetched once
+        provider: Quote provider, defaults to the one selected by QUOTE_PROVIDER
+        max_workers: Maximum number of requests in flight
+        rate_limit: Requests per second allowed per provider host (0 disables)
+        retries: Number of retries after the first failed attempt
+        backoff: Initial retry delay in seconds
+
+    Returns:
+        Dict mapping each symbol to its info dict, or None if it failed
+    """
+    provider = provider or get_provider()
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+
+    limiter = RateLimiter(rate_limit)
+    workers = max(1, min(max_workers, len(symbols)))
+    with metrics.timer('quotes.fetch'), ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            lambda s: _fetch_with_retry(s, provider, limiter, retries, backoff),
+            symbols
+        )
+        quotes = dict(zip(symbols, results))
+    provider.flush()
+    return quotes
+
+
+def benchmark(sizes=(22, 2000), latency: float = 0.05, max_workers: int = 32) -> None:
+    """Time fetch_quotes against the stub provider with simulated latency"""
+    provider = StubProvider(latency)
+    for size in sizes:
+        symbols = [f'SYM{i:05d}' for i in range(size)]
+        start = time.perf_counter()
+        fetch_quotes(symbols, provider, max_workers=max_workers, rate_limit=0)
+        elapsed = time.perf_counter() - start
+        serial = size * latency
+        print(f"✓ {size} symbols: {elapsed:.2f}s (serial estimate {serial:.2f}s)")
+
+
+if __name__ == '__main__':
+    benchmark()
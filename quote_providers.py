@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Pluggable quote providers
+yfinance for live data, recorded fixtures for offline replay, a local HTTP
+stand-in and a deterministic stub for benchmarks
+
+The provider is selected with the QUOTE_PROVIDER environment variable:
+    yfinance (default), fixture, record, http, stub
+Live providers are wrapped in the persistent quote cache at QUOTE_CACHE
+(default .cache/quotes.sqlite, set to "off" to disable); one connection
+per cache path is shared by every provider in the process and closed at exit
+"""
+
+import atexit
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import quote, unquote, urlparse
+
+import numpy as np
+
+from quote_cache import DEFAULT_CACHE_PATH, FIELD_TTLS, QuoteCache
+from run_metrics import metrics
+
+DEFAULT_FIXTURE_PATH = 'fixtures/quotes.json'
+DEFAULT_HTTP_URL = 'http://127.0.0.1:8765'
+EARNINGS_LIMIT = 60    # quarters of reported EPS to request
+
+
+class QuoteNotFound(LookupError):
+    """The provider has no data for a symbol; retrying cannot help"""
+
+
+class QuoteProvider:
+    """Base class: returns the raw Yahoo-style info dict for a symbol"""
+    name = 'base'
+    host = 'localhost'
+
+    def get_info(self, symbol: str) -> Dict:
+        raise NotImplementedError
+
+    def cached_info(self, symbol: str) -> Optional[Dict]:
+        """Info available without a request, None if it has to be fetched"""
+        return None
+
+    def refresh_info(self, symbol: str) -> Dict:
+        """Fetch info from the source, bypassing any cache"""
+        return self.get_info(symbol)
+
+    def get_history(self, symbol: str, start: str, end: str) -> Dict[str, List]:
+        """Daily closes in [start, end) as {'dates': [ISO dates], 'close': [...]}"""
+        raise NotImplementedError(f"{self.name} provider has no price history")
+
+    def get_earnings(self, symbol: str) -> Dict[str, List]:
+        """Reported quarterly EPS as {'dates': [ISO report dates], 'eps': [...]}"""
+        raise NotImplementedError(f"{self.name} provider has no earnings history")
+
+    def flush(self) -> None:
+        """Persist any buffered state, called after each batch"""
+
+
+class YFinanceProvider(QuoteProvider):
+    name = 'yfinance'
+    host = 'query2.finance.yahoo.com'
+
+    def get_info(self, symbol: str) -> Dict:
+        import yfinance as yf
+        return yf.Ticker(symbol).info
+
+    def get_history(self, symbol: str, start: str, end: str) -> Dict[str, List]:
+        import yfinance as yf
+        frame = yf.Ticker(symbol).history(start=start, end=end, interval='1d', auto_adjust=False)
+        return {
+            'dates': [stamp.strftime('%Y-%m-%d') for stamp in frame.index],
+            'close': frame['Close'].tolist(),
+        }
+
+    def get_earnings(self, symbol: str) -> Dict[str, List]:
+        import yfinance as yf
+        frame = yf.Ticker(symbol).get_earnings_dates(limit=EARNINGS_LIMIT)
+        if frame is None:
+            return {'dates': [], 'eps': []}
+        # Upcoming reports are listed without an EPS yet
+        frame = frame.dropna(subset=['Reported EPS']).sort_index()
+        return {
+            'dates': [stamp.strftime('%Y-%m-%d') for stamp in frame.index],
+            'eps': frame['Reported EPS'].tolist(),
+        }
+
+
+class StubProvider(QuoteProvider):
+    """Deterministic offline quotes with optional simulated latency"""
+    name = 'stub'
+    host = 'stub'
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def get_info(self, symbol: str) -> Dict:
+        if self.latency:
+            time.sleep(self.latency)
+        rng = random.Random(symbol)
+        price = round(rng.uniform(5, 900), 2)
+        return {
+            'symbol': symbol,
+            'longName': symbol,
+            'currentPrice': price,
+            'trailingPE': round(rng.uniform(5, 60), 2),
+            'regularMarketChangePercent': round(rng.uniform(-5, 5), 2),
+            'marketCap': int(price * rng.randint(10**7, 10**10)),
+        }
+
+    def _price(self, symbol: str, days: np.ndarray) -> np.ndarray:
+        rng = random.Random(symbol)
+        base, drift, phase = rng.uniform(5, 900), rng.uniform(-1e-4, 3e-4), rng.uniform(0, 6.3)
+        return base * np.exp(drift * (days - 18_000) + 0.15 * np.sin(days / 60 + phase))
+
+    def get_history(self, symbol: str, start: str, end: str) -> Dict[str, List]:
+        if self.latency:
+            time.sleep(self.latency)
+        dates = np.arange(np.datetime64(start), np.datetime64(end), dtype='datetime64[D]')
+        dates = dates[np.is_busday(dates)]
+        close = np.round(self._price(symbol, dates.astype(np.int64)), 2)
+        return {'dates': dates.astype(str).tolist(), 'close': close.tolist()}
+
+    def get_earnings(self, symbol: str) -> Dict[str, List]:
+        if self.latency:
+            time.sleep(self.latency)
+        first = np.datetime64('2000-01-25') + random.Random(symbol).randrange(60)
+        dates = first + np.arange(EARNINGS_LIMIT * 2) * 91
+        dates = dates[dates < np.datetime64('today')][-EARNINGS_LIMIT:]
+        pe = random.Random(symbol + ':pe').uniform(8, 40)
+        eps = np.round(self._price(symbol, dates.astype(np.int64)) / pe / 4, 2)
+        return {'dates': dates.astype(str).tolist(), 'eps': eps.tolist()}
+
+
+def load_fixtures(path: str) -> Dict[str, Dict]:
+    """Load a recorded fixture file mapping symbol to info dict"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class FixtureProvider(QuoteProvider):
+    """Replays recorded responses from memory"""
+    name = 'fixture'
+    host = 'fixture'
+
+    def __init__(self, path: str = DEFAULT_FIXTURE_PATH):
+        self.path = path
+        self.fixtures = load_fixtures(path)
+
+    def get_info(self, symbol: str) -> Dict:
+        try:
+            return self.fixtures[symbol]
+        except KeyError:
+            raise QuoteNotFound(f"no recorded quote for {symbol} in {self.path}") from None
+
+
+class RecordingProvider(QuoteProvider):
+    """Wraps another provider and records every response to a fixture file"""
+    name = 'record'
+
+    def __init__(self, provider: QuoteProvider, path: str = DEFAULT_FIXTURE_PATH):
+        self.provider = provider
+        self.host = provider.host
+        self.path = path
+        self.recorded = load_fixtures(path)
+        self._lock = threading.Lock()
+
+    def get_info(self, symbol: str) -> Dict:
+        info = self.provider.get_info(symbol)
+        with self._lock:
+            self.recorded[symbol] = info
+        return info
+
+    def get_history(self, symbol: str, start: str, end: str) -> Dict[str, List]:
+        return self.provider.get_history(symbol, start, end)
+
+    def get_earnings(self, symbol: str) -> Dict[str, List]:
+        return self.provider.get_earnings(symbol)
+
+    def flush(self) -> None:
+        self.provider.flush()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.recorded, f, indent=2, sort_keys=True, default=str)
+
+
+class HTTPProvider(QuoteProvider):
+    """Fetches quotes from a local HTTP stand-in serving GET /quote/<symbol>"""
+    name = 'http'
+
+    def __init__(self, base_url: str = DEFAULT_HTTP_URL, timeout: float = 10):
+        self.base_url = base_url.rstrip('/')
+        self.host = urlparse(self.base_url).netloc
+        self.timeout = timeout
+
+    def get_info(self, symbol: str) -> Dict:
+        url = f"{self.base_url}/quote/{quote(symbol, safe='')}"
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                raise QuoteNotFound(f"no quote for {symbol} at {self.base_url}") from None
+            raise
+
+
+class CachedProvider(QuoteProvider):
+    """Serves fresh quotes from the persistent cache and refreshes stale ones"""
+    name = 'cached'
+
+    def __init__(self, provider: QuoteProvider, cache: QuoteCache, fields=tuple(FIELD_TTLS)):
+        self.provider = provider
+        self.host = provider.host
+        self.cache = cache
+        self.fields = fields
+
+    def get_info(self, symbol: str) -> Dict:
+        info = self.cached_info(symbol)
+        return info if info is not None else self.refresh_info(symbol)
+
+    def cached_info(self, symbol: str) -> Optional[Dict]:
+        values, fresh = self.cache.get(symbol, self.fields)
+        if fresh:
+            metrics.count('quotes.cache_hits')
+            return values
+        metrics.count('quotes.cache_misses')
+        return None
+
+    def refresh_info(self, symbol: str) -> Dict:
+        info = self.provider.get_info(symbol)
+        self.cache.put(symbol, info, self.fields)
+        return info
+
+    def get_history(self, symbol: str, start: str, end: str) -> Dict[str, List]:
+        return self.provider.get_history(symbol, start, end)
+
+    def get_earnings(self, symbol: str) -> Dict[str, List]:
+        return self.provider.get_earnings(symbol)
+
+    def flush(self) -> None:
+        self.provider.flush()
+        stats = self.cache.stats()
+        print(f"✓ Quote cache: {stats['hits']} hits, {stats['misses']} misses")
+
+
+_caches: Dict[str, QuoteCache] = {}
+_caches_lock = threading.Lock()
+
+
+def shared_cache(path: str) -> QuoteCache:
+    """The process-wide cache for path, opened on first use"""
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = QuoteCache(path)
+        return _caches[path]
+
+
+@atexit.register
+def close_caches() -> None:
+    with _caches_lock:
+        for cache in _caches.values():
+            cache.close()
+        _caches.clear()
+
+
+def get_provider(name: Optional[str] = None) -> QuoteProvider:
+    """Build the provider named by argument or the QUOTE_PROVIDER env var"""
+    name = name or os.environ.get('QUOTE_PROVIDER', 'yfinance')
+    fixture_path = os.environ.get('QUOTE_FIXTURES', DEFAULT_FIXTURE_PATH)
+    cache_path = os.environ.get('QUOTE_CACHE', DEFAULT_CACHE_PATH)
+
+    def cached(provider):
+        if cache_path == 'off':
+            return provider
+        return CachedProvider(provider, shared_cache(cache_path))
+
+    if name == 'yfinance':
+        return cached(YFinanceProvider())
+    if name == 'fixture':
+        return FixtureProvider(fixture_path)
+    if name == 'record':
+        return RecordingProvider(YFinanceProvider(), fixture_path)
+    if name == 'http':
+        return cached(HTTPProvider(os.environ.get('QUOTE_HTTP_URL', DEFAULT_HTTP_URL)))
+    if name == 'stub':
+        return StubProvider(float(os.environ.get('QUOTE_STUB_LATENCY', 0)))
+    raise ValueError(f"Unknown quote provider: {name}")
+
+
+def serve_fixtures(path: str = DEFAULT_FIXTURE_PATH, port: int = 8765) -> None:
+    """Serve a fixture file over HTTP as a local stand-in for the quote API"""
+    fixtures = load_fixtures(path)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            symbol = unquote(self.path.rsplit('/', 1)[-1])
+            if not self.path.startswith('/quote/') or symbol not in fixtures:
+                self.send_error(404)
+                return
+            body = json.dumps(fixtures[symbol]).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    print(f"✓ Serving {len(fixtures)} quotes from {path} on http://127.0.0.1:{port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    # python quote_providers.py [fixture_path] [port]
+    serve_fixtures(*sys.argv[1:2], *[int(a) for a in sys.argv[2:3]])
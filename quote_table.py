@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Columnar quote table
+Holds quotes for many symbols as one NumPy array per field plus a
+symbol-to-row index, instead of a dict per symbol. Rows are upserted in
+bulk from provider info dicts, filters are vectorized masks over the
+columns, and the numeric columns export to JSON or Arrow without
+per-symbol Python objects.
+"""
+
+import json
+import time
+import tracemalloc
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Column name -> provider info key, stored as float64 with NaN when missing
+NUMERIC_FIELDS = {
+    'pe': 'trailingPE',
+    'price': 'currentPrice',
+    'change_percent': 'regularMarketChangePercent',
+    'market_cap': 'marketCap',
+}
+# Numeric columns exported as whole numbers
+INTEGER_FIELDS = {'market_cap'}
+# Column name -> dtype; names vary widely in length so they are kept as
+# references to the provider strings rather than fixed-width text
+TEXT_FIELDS = {
+    'symbol': 'U16',
+    'name': object,
+    'region': 'U4',
+}
+
+
+def _to_float(values: List) -> np.ndarray:
+    """Floats from provider values; None, unparseable and infinite values become NaN"""
+    try:
+        result = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        def parse(value):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return np.nan
+        result = np.array([parse(v) for v in values], dtype=np.float64)
+    result[~np.isfinite(result)] = np.nan
+    return result
+
+
+def region_of(symbol: str) -> str:
+    """Market region from the ticker suffix"""
+    return 'HK' if symbol.endswith('.HK') else 'US'
+
+
+class QuoteTable:
+    def __init__(self, capacity: int = 16):
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, dtype in TEXT_FIELDS.items():
+            self.columns[name] = np.zeros(capacity, dtype=dtype)
+        for name in NUMERIC_FIELDS:
+            self.columns[name] = np.full(capacity, np.nan)
+        self.index: Dict[str, int] = {}
+        self.size = 0
+
+    @classmethod
+    def from_quotes(cls, quotes: Dict[str, Optional[Dict]],
+                    regions: Optional[Dict[str, str]] = None) -> 'QuoteTable':
+        table = cls(max(16, len(quotes)))
+        table.update(quotes, regions)
+        return table
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.index
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        """Live view of one column over the filled rows"""
+        return self.columns[column][:self.size]
+
+    @property
+    def symbols(self) -> np.ndarray:
+        return self['symbol']
+
+    def _reserve(self, rows: int) -> None:
+        capacity = len(self.columns['symbol'])
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2)
+        for name, column in self.columns.items():
+            if column.dtype.kind == 'f':
+                grown = np.full(capacity, np.nan)
+            else:
+                grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def update(self, quotes: Dict[str, Optional[Dict]],
+               regions: Optional[Dict[str, str]] = None) -> None:
+        """
+        Insert or overwrite rows from provider info dicts in one pass
+
+        Symbols whose quote is None are skipped so a failed fetch never
+        erases an earlier quote.
+        """
+        quotes = {symbol: info for symbol, info in quotes.items() if info is not None}
+        if not quotes:
+            return
+        symbols = list(quotes)
+        new = [s for s in symbols if s not in self.index]
+        self._reserve(self.size + len(new))
+        for symbol in new:
+            self.index[symbol] = self.size
+            self.size += 1
+        rows = np.fromiter((self.index[s] for s in symbols), dtype=np.intp, count=len(symbols))
+
+        infos = list(quotes.values())
+        self.columns['symbol'][rows] = symbols
+        self.columns['name'][rows] = [info.get('longName') or s for s, info in zip(symbols, infos)]
+        self.columns['region'][rows] = [(regions or {}).get(s) or region_of(s) for s in symbols]
+        for name, key in NUMERIC_FIELDS.items():
+            self.columns[name][rows] = _to_float([info.get(key) for info in infos])
+
+    def rows(self, symbols: Iterable[str]) -> np.ndarray:
+        return np.array([self.index[s] for s in symbols if s in self.index], dtype=np.intp)
+
+    def select(self, mask: np.ndarray) -> 'QuoteTable':
+        """New table with the rows where mask is true"""
+        rows = np.flatnonzero(mask)
+        table = QuoteTable(max(16, len(rows)))
+        for name, column in self.columns.items():
+            table.columns[name][:len(rows)] = column[rows]
+        table.size = len(rows)
+        table.index = {str(s): i for i, s in enumerate(table['symbol'])}
+        return table
+
+    def where(self, region: Optional[str] = None, pe_above: Optional[float] = None,
+              pe_below: Optional[float] = None) -> 'QuoteTable':
+        """Common filters, e.g. table.where(region='HK', pe_above=20)"""
+        mask = np.ones(self.size, dtype=bool)
+        if region is not None:
+            mask &= self['region'] == region
+        if pe_above is not None:
+            mask &= self['pe'] > pe_above
+        if pe_below is not None:
+            mask &= self['pe'] < pe_below
+        return self.select(mask)
+
+    def column_values(self, column: str, decimals: int = 2, missing=0) -> List:
+        """Rounded Python values for one numeric column, missing as given"""
+        values = self[column]
+        absent = np.isnan(values)
+        if column in INTEGER_FIELDS:
+            result = np.where(absent, 0, values).astype(np.int64).tolist()
+        else:
+            result = np.round(values, decimals).tolist()
+        if absent.any():
+            result = [missing if a else v for v, a in zip(result, absent.tolist())]
+        return result
+
+    def to_dicts(self, fields: Dict[str, str], symbols: Optional[Iterable[str]] = None,
+                 decimals: int = 2, missing=0) -> Dict[str, Dict]:
+        """
+        Per-symbol dicts in a legacy output format
+
+        Args:
+            fields: Output key -> column name
+            symbols: Rows to export in order, all rows if None
+        """
+        table = self if symbols is None else self.select(np.isin(self['symbol'], list(symbols)))
+        columns = {
+            key: (table[column].tolist() if column in TEXT_FIELDS
+                  else table.column_values(column, decimals, missing))
+            for key, column in fields.items()
+        }
+        keys = list(columns)
+        return {
+            symbol: dict(zip(keys, values))
+            for symbol, *values in zip(table['symbol'].tolist(), *columns.values())
+        }
+
+    def to_json(self, decimals: int = 2) -> str:
+        """Columnar JSON: {"symbol": [...], "pe": [...], ...} with null for missing"""
+        payload = {name: self[name].tolist() for name in TEXT_FIELDS}
+        for name in NUMERIC_FIELDS:
+            payload[name] = self.column_values(name, decimals, None)
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+    def to_arrow(self):
+        """
+        pyarrow Table whose numeric columns share the NumPy buffers
+
+        Missing numeric values stay NaN rather than null so no copy is made.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("QuoteTable.to_arrow requires pyarrow (pip install pyarrow)") from e
+        arrays = {name: pa.array(self[name].tolist()) for name in TEXT_FIELDS}
+        arrays.update({name: pa.array(self[name]) for name in NUMERIC_FIELDS})
+        return pa.table(arrays)
+
+
+def benchmark(sizes=(1_000, 10_000)) -> None:
+    """Memory and serialization time of dict-per-symbol quotes vs the table"""
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        quotes = {
+            f'S{i:05d}' + ('.HK' if i % 3 == 0 else ''): {
+                'trailingPE': float(rng.uniform(5, 60)), 'currentPrice': float(rng.uniform(1, 900)),
+                'regularMarketChangePercent': float(rng.normal()), 'marketCap': int(rng.uniform(1e8, 1e12)),
+                'longName': f'Company {i}',
+            }
+            for i in range(size)
+        }
+
+        def dicts():
+            return {
+                s: {'symbol': s, 'pe_ratio': round(float(q['trailingPE']), 2),
+                    'price': round(float(q['currentPrice']), 2),
+                    'change_percent': round(float(q['regularMarketChangePercent']), 2),
+                    'market_cap': q['marketCap'], 'name': q['longName'],
+                    'region': region_of(s)}
+                for s, q in quotes.items()
+            }
+
+        def measure(build):
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = build()
+            built = time.perf_counter() - start
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            return result, built, memory
+
+        records, dict_build, dict_memory = measure(dicts)
+        table, table_build, table_memory = measure(lambda: QuoteTable.from_quotes(quotes))
+
+        start = time.perf_counter()
+        json.dumps(records, ensure_ascii=False)
+        dict_json = time.perf_counter() - start
+        start = time.perf_counter()
+        table.to_json()
+        table_json = time.perf_counter() - start
+        start = time.perf_counter()
+        table.where(region='HK', pe_above=20)
+        table_filter = time.perf_counter() - start
+
+        print(f"{size} symbols:")
+        print(f"✓ Dicts: {dict_memory / size:.0f} B/symbol, build {dict_build * 1000:.1f} ms, "
+              f"JSON {dict_json * 1000:.1f} ms")
+        print(f"✓ QuoteTable: {table_memory / size:.0f} B/symbol, build {table_build * 1000:.1f} ms, "
+              f"JSON {table_json * 1000:.1f} ms, filter {table_filter * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    benchmark()
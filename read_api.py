@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Read API for the P/E series, quote snapshot and 13F holdings
+An asyncio HTTP/1.1 server that loads the published data into indexed
+in-memory structures at startup and answers range queries from them.
+Encoded responses are cached per data version with an ETag, so repeat
+requests are answered without touching the data, conditional requests get
+304 and clients that accept gzip get a compressed body. The source files
+are polled and the data reloaded in the background when an updater
+rewrites them.
+
+Endpoints (GET or HEAD):
+    /health
+    /pe/series?start=YYYY-MM-DD&end=YYYY-MM-DD&columns=PE_Shiller,PE_HSI
+    /quotes                          /quotes/<symbol>
+    /indices
+    /funds                           /funds/<name or CIK>/holdings?limit=N
+    /securities/<symbol>/holders
+
+Usage:
+    python read_api.py [--host 127.0.0.1] [--port 8780]
+    python read_api.py benchmark [--requests 20000] [--connections 50]
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+from data_bundle import DATA_DIR, MANIFEST_FILE, load_current_bundle
+from fund_valuation import CUSIP_SYMBOLS, FETCHED_HOLDINGS_FILE, HOLDINGS_FILE, load_holdings
+from pe_store import DEFAULT_CSV_PATH, DEFAULT_STORE_PATH
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8780
+RELOAD_INTERVAL = 1.0     # seconds between source file checks
+CACHE_SIZE = 2048         # encoded responses kept per data version
+GZIP_MIN_BYTES = 512      # smaller bodies are sent uncompressed
+MAX_HEADER_BYTES = 16384
+
+# Files whose change triggers a reload
+SOURCES = (
+    os.path.join(DEFAULT_STORE_PATH, 'meta.json'),
+    DEFAULT_CSV_PATH,
+    os.path.join(DATA_DIR, MANIFEST_FILE),
+    FETCHED_HOLDINGS_FILE,
+    HOLDINGS_FILE,
+)
+
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 431: 'Request Header Fields Too Large'}
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def source_signature(paths=SOURCES) -> Tuple:
+    """Modification time and size of every source file"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def _number(value) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if np.isfinite(value) else None
+
+
+class Snapshot:
+    """Immutable indexed view of the served data; replaced whole on reload"""
+
+    def __init__(self, version: int, timestamps: np.ndarray, series_names: List[str],
+                 matrix: np.ndarray, bundle: Dict, funds: Dict[str, Dict]):
+        self.version = version
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+        order = np.argsort(timestamps, kind='stable')
+        self.timestamps = timestamps[order].astype('datetime64[ns]')
+        self.series_names = list(series_names)
+        self.series_column = {name: i for i, name in enumerate(self.series_names)}
+        self.matrix = matrix[order]
+
+        self.quotes = {symbol.upper(): {'symbol': symbol, **quote}
+                       for symbol, quote in bundle.get('stock_prices', {}).items()}
+        self.indices = bundle.get('indices', {})
+        self.bundle_updated_at = bundle.get('updated_at')
+
+        self.funds = funds
+        self.fund_keys = {}
+        self.holders: Dict[str, List[Dict]] = {}
+        for name, fund in funds.items():
+            self.fund_keys[name.lower()] = name
+            if fund.get('cik'):
+                self.fund_keys[str(fund['cik']).lstrip('0')] = name
+            for holding in self._holdings(fund):
+                # Fetcher positions only carry a symbol for known CUSIPs
+                symbol = CUSIP_SYMBOLS.get(holding.get('cusip'), holding.get('symbol'))
+                if symbol:
+                    self.holders.setdefault(symbol.upper(), []).append({
+                        'fund': name,
+                        'value': _number(holding.get('value')),
+                        'shares': _number(holding.get('shares')),
+                        'percent': _number(holding.get('percent')),
+                    })
+        for entries in self.holders.values():
+            entries.sort(key=lambda entry: entry['value'] or 0, reverse=True)
+
+    @staticmethod
+    def _holdings(fund: Dict) -> List[Dict]:
+        holdings = fund.get('holdings', [])
+        if isinstance(holdings, dict):
+            holdings = holdings.get('positions', [])
+        return holdings
+
+    @classmethod
+    def load(cls, version: int) -> 'Snapshot':
+        from pe_statistics import load_series
+        from pe_store import open_store
+
+        timestamps, names, matrix = load_series(open_store())
+        return cls(version, timestamps, names, matrix, load_current_bundle(), load_holdings())
+
+    def fund(self, key: str) -> Tuple[str, Dict]:
+        name = self.fund_keys.get(key.lower()) or self.fund_keys.get(key.lstrip('0'))
+        if name is None:
+            raise RequestError(404, f"Unknown fund: {key}")
+        return name, self.funds[name]
+
+    # Handlers return JSON-serializable payloads
+
+    def health(self, query: Dict) -> Dict:
+        return {
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'bundle_updated_at': self.bundle_updated_at,
+            'series_rows': len(self.timestamps),
+            'quotes': len(self.quotes),
+            'funds': len(self.funds),
+        }
+
+    def series(self, query: Dict) -> Dict:
+        """Rows whose date falls in [start, end], found by binary search"""
+        try:
+            start = np.datetime64(query['start'][0], 'ns') if 'start' in query else None
+            end = np.datetime64(query['end'][0], 'ns') if 'end' in query else None
+        except ValueError:
+            raise RequestError(400, "start and end must be YYYY-MM-DD dates")
+        names = self.series_names
+        if 'columns' in query:
+            names = [name for value in query['columns'] for name in value.split(',') if name]
+            unknown = [name for name in names if name not in self.series_column]
+            if unknown:
+                raise RequestError(400, f"Unknown columns: {', '.join(unknown)}")
+        lo = 0 if start is None else int(np.searchsorted(self.timestamps, start, side='left'))
+        hi = len(self.timestamps) if end is None else int(np.searchsorted(self.timestamps, end, side='right'))
+        block = self.matrix[lo:hi, [self.series_column[name] for name in names]]
+        values = np.round(block, 4).astype(object)
+        values[np.isnan(block)] = None
+        return {
+            'dates': np.datetime_as_string(self.timestamps[lo:hi], unit='D').tolist(),
+            'values': {name: values[:, i].tolist() for i, name in enumerate(names)},
+        }
+
+    def quote_list(self, query: Dict) -> Dict:
+        return {'quotes': list(self.quotes.values())}
+
+    def quote(self, query: Dict, symbol: str) -> Dict:
+        try:
+            return self.quotes[symbol.upper()]
+        except KeyError:
+            raise RequestError(404, f"No quote for {symbol}")
+
+    def index_list(self, query: Dict) -> Dict:
+        return {'indices': self.indices}
+
+    def fund_list(self, query: Dict) -> Dict:
+        return {'funds': [
+            {'name': name, 'cik': fund.get('cik'), 'filing_date': fund.get('filing_date'),
+             'period_of_report': fund.get('period_of_report'),
+             'total_value': _number(fund.get('total_value')),
+             'holdings': len(self._holdings(fund))}
+            for name, fund in self.funds.items()
+        ]}
+
+    def fund_holdings(self, query: Dict, key: str) -> Dict:
+        name, fund = self.fund(key)
+        holdings = self._holdings(fund)
+        if 'limit' in query:
+            try:
+                holdings = holdings[:max(0, int(query['limit'][0]))]
+            except ValueError:
+                raise RequestError(400, "limit must be an integer")
+        return {'fund': name, 'filing_date': fund.get('filing_date'), 'holdings': holdings}
+
+    def security_holders(self, query: Dict, symbol: str) -> Dict:
+        return {'symbol': symbol.upper(), 'holders': self.holders.get(symbol.upper(), [])}
+
+
+def route(snapshot: Snapshot, path: str, query: Dict) -> Dict:
+    parts = [unquote(part) for part in path.strip('/').split('/') if part]
+    if parts == ['health']:
+        return snapshot.health(query)
+    if parts == ['pe', 'series']:
+        return snapshot.series(query)
+    if parts == ['quotes']:
+        return snapshot.quote_list(query)
+    if len(parts) == 2 and parts[0] == 'quotes':
+        return snapshot.quote(query, parts[1])
+    if parts == ['indices']:
+        return snapshot.index_list(query)
+    if parts == ['funds']:
+        return snapshot.fund_list(query)
+    if len(parts) == 3 and parts[0] == 'funds' and parts[2] == 'holdings':
+        return snapshot.fund_holdings(query, parts[1])
+    if len(parts) == 3 and parts[0] == 'securities' and parts[2] == 'holders':
+        return snapshot.security_holders(query, parts[1])
+    raise RequestError(404, f"No such endpoint: {path}")
+
+
+class Response:
+    """An encoded body with its ETag and lazily compressed variant"""
+    __slots__ = ('status', 'body', 'etag', '_gzipped')
+
+    def __init__(self, status: int, payload: Dict):
+        self.status = status
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'),
+                               default=str).encode('utf-8')
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()[:20]}"'
+        self._gzipped = None
+
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6)
+        return self._gzipped
+
+
+class ReadAPI:
+    def __init__(self, sources=SOURCES, reload_interval: float = RELOAD_INTERVAL):
+        self.sources = sources
+        self.reload_interval = reload_interval
+        self.signature = source_signature(sources)
+        self.snapshot = Snapshot.load(1)
+        self.cache: 'OrderedDict[str, Response]' = OrderedDict()
+
+    def response(self, target: str) -> Response:
+        """Cached encoded response for a request target under the current data"""
+        snapshot = self.snapshot
+        key = f'{snapshot.version} {target}'
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            return cached
+        url = urlsplit(target)
+        try:
+            response = Response(200, route(snapshot, url.path, parse_qs(url.query)))
+        except RequestError as e:
+            response = Response(e.status, {'error': str(e)})
+        self.cache[key] = response
+        if len(self.cache) > CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return response
+
+    async def watch(self) -> None:
+        """Reload the data whenever a source file changes"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            signature = source_signature(self.sources)
+            if signature == self.signature:
+                continue
+            try:
+                snapshot = await loop.run_in_executor(None, Snapshot.load, self.snapshot.version + 1)
+            except Exception as e:
+                # A writer may be midway through; keep serving and retry next tick
+                print(f"⚠️ Reload failed, serving version {self.snapshot.version}: {e}")
+                continue
+            self.signature = signature
+            self.snapshot = snapshot
+            self.cache.clear()
+            print(f"✓ Reloaded data as version {snapshot.version}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    writer.write(self._error(431, 'Headers too large', close=True))
+                    break
+                keep_alive = self._respond(head, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, head: bytes, writer: asyncio.StreamWriter) -> bool:
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            writer.write(self._error(400, 'Malformed request line', close=True))
+            return False
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+        if method not in ('GET', 'HEAD'):
+            writer.write(self._error(405, f'{method} not allowed', close=not keep_alive))
+            return keep_alive
+
+        response = self.response(target)
+        compress = len(response.body) >= GZIP_MIN_BYTES and 'gzip' in headers.get('accept-encoding', '')
+        # Each encoding is a separate representation with its own strong ETag
+        etag = response.etag[:-1] + '-gzip"' if compress else response.etag
+        extra = [f'ETag: {etag}', 'Vary: Accept-Encoding',
+                 'Cache-Control: no-cache', 'Content-Type: application/json; charset=utf-8']
+        if not keep_alive:
+            extra.append('Connection: close')
+        tags = headers.get('if-none-match')
+        if response.status == 200 and tags and (tags == '*' or etag in
+                                                [tag.strip().removeprefix('W/') for tag in tags.split(',')]):
+            writer.write(self._head(304, extra + ['Content-Length: 0']))
+            return keep_alive
+
+        body = response.body
+        if compress:
+            body = response.gzipped()
+            extra.append('Content-Encoding: gzip')
+        writer.write(self._head(response.status, extra + [f'Content-Length: {len(body)}']))
+        if method == 'GET':
+            writer.write(body)
+        return keep_alive
+
+    @staticmethod
+    def _head(status: int, headers: List[str]) -> bytes:
+        return (f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+                + ''.join(f'{header}\r\n' for header in headers) + '\r\n').encode('latin-1')
+
+    def _error(self, status: int, message: str, close: bool = False) -> bytes:
+        body = json.dumps({'error': message}).encode('utf-8')
+        headers = ['Content-Type: application/json', f'Content-Length: {len(body)}']
+        if close:
+            headers.append('Connection: close')
+        return self._head(status, headers) + body
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                    ready: Optional[asyncio.Future] = None) -> None:
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        watcher = asyncio.create_task(self.watch())
+        bound = server.sockets[0].getsockname()
+        print(f"✓ Serving P/E, quote and 13F data on http://{bound[0]}:{bound[1]} "
+              f"(version {self.snapshot.version})")
+        if ready is not None:
+            ready.set_result(bound[1])
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+async def _benchmark(requests: int, connections: int) -> None:
+    api = ReadAPI()
+    ready = asyncio.get_running_loop().create_future()
+    server = asyncio.create_task(api.serve(port=0, ready=ready))
+    port = await ready
+    targets = ['/health', '/quotes/AAPL', '/pe/series?start=2000-01-01&end=2010-12-31',
+               '/funds', '/securities/AAPL/holders', '/indices']
+
+    async def client(count: int, conditional: bool) -> None:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        etags = {}
+        for i in range(count):
+            target = targets[i % len(targets)]
+            extra = f'If-None-Match: {etags[target]}\r\n' if conditional and target in etags else ''
+            writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n'
+                         f'Accept-Encoding: gzip\r\n{extra}\r\n'.encode('latin-1'))
+            head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+            length = int(head.split('Content-Length: ', 1)[1].split('\r\n', 1)[0])
+            etags[target] = head.split('ETag: ', 1)[1].split('\r\n', 1)[0]
+            await reader.readexactly(length)
+        writer.close()
+
+    for conditional in (False, True):
+        start = time.perf_counter()
+        await asyncio.gather(*(client(requests // connections, conditional) for _ in range(connections)))
+        elapsed = time.perf_counter() - start
+        label = 'conditional (304)' if conditional else 'full responses'
+        print(f"✓ {requests} requests, {connections} connections, {label}: "
+              f"{requests / elapsed:,.0f} req/s (client and server on one core)")
+    server.cancel()
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description='Read API for P/E, quote and 13F data')
+    parser.add_argument('command', nargs='?', choices=['serve', 'benchmark'], default='serve')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--connections', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'benchmark':
+            asyncio.run(_benchmark(args.requests, args.connections))
+        else:
+            asyncio.run(ReadAPI().serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
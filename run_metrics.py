@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Run instrumentation for the update scripts
+A process-wide registry of timers and counters. Modules record into it
+with metrics.timer('name') and metrics.count('name'); each script wraps its
+main in instrumented('script'), which writes a JSON run report and appends
+a summary line to a history file so run times can be compared across
+scheduled executions.
+
+Environment:
+    RUN_REPORT_DIR   where reports go (default .cache/run_reports, 'off' disables)
+    RUN_PROFILE      write cProfile stats for the whole run to this path
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+DEFAULT_REPORT_DIR = '.cache/run_reports'
+HISTORY_FILE = 'history.jsonl'
+
+
+class Metrics:
+    """Thread-safe timers and counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.timers: Dict[str, Dict[str, float]] = {}
+            self.counters: Dict[str, float] = {}
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Accumulate the wall time spent in the block under name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.timers.setdefault(name, {'count': 0, 'total_s': 0.0, 'max_s': 0.0})
+            entry['count'] += 1
+            entry['total_s'] += seconds
+            entry['max_s'] = max(entry['max_s'], seconds)
+
+    def count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'timers': {
+                    name: {'count': entry['count'], 'total_s': round(entry['total_s'], 4),
+                           'max_s': round(entry['max_s'], 4)}
+                    for name, entry in sorted(self.timers.items())
+                },
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+
+metrics = Metrics()
+
+
+def _report_dir() -> Optional[str]:
+    directory = os.environ.get('RUN_REPORT_DIR', DEFAULT_REPORT_DIR)
+    return None if directory == 'off' else directory
+
+
+def write_report(script: str, started_at: datetime, duration: float,
+                 status: str, directory: Optional[str] = None) -> Optional[str]:
+    """Write the JSON run report and append its summary to the history"""
+    directory = directory or _report_dir()
+    if directory is None:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    report = {
+        'script': script,
+        'started_at': started_at.isoformat(),
+        'duration_s': round(duration, 4),
+        'status': status,
+        **metrics.snapshot(),
+    }
+    path = os.path.join(directory, f"{script}-{started_at.strftime('%Y%m%dT%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    summary = {key: report[key] for key in ('script', 'started_at', 'duration_s', 'status')}
+    summary['timers'] = {name: entry['total_s'] for name, entry in report['timers'].items()}
+    with open(os.path.join(directory, HISTORY_FILE), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(summary) + '\n')
+    return path
+
+
+@contextmanager
+def instrumented(script: str) -> Iterator[Metrics]:
+    """
+    Time a whole script run and write its report on exit
+
+    Set RUN_PROFILE to also write cProfile stats for the run.
+    """
+    metrics.reset()
+    profile_path = os.environ.get('RUN_PROFILE')
+    profiler = cProfile.Profile() if profile_path else None
+    started_at = datetime.now()
+    start = time.perf_counter()
+    status = 'ok'
+    if profiler:
+        profiler.enable()
+    try:
+        yield metrics
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            print(f"✓ Profile written to {profile_path}")
+        path = write_report(script, started_at, time.perf_counter() - start, status)
+        if path:
+            print(f"✓ Run report written to {path}")
+
+
+def load_history(script: Optional[str] = None, directory: Optional[str] = None) -> List[Dict]:
+    directory = directory or _report_dir() or DEFAULT_REPORT_DIR
+    try:
+        with open(os.path.join(directory, HISTORY_FILE), 'r', encoding='utf-8') as f:
+            runs = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+    return [run for run in runs if script is None or run['script'] == script]
+
+
+def print_history(script: Optional[str] = None, last: int = 10) -> None:
+    """Recent run times, flagging runs over 1.5x the median of earlier runs"""
+    runs = load_history(script)[-last:]
+    durations = []
+    for run in runs:
+        previous = sorted(durations)
+        median = previous[len(previous) // 2] if previous else None
+        flag = ' ⚠️ slower than usual' if median and run['duration_s'] > 1.5 * median else ''
+        slowest = max(run['timers'].items(), key=lambda item: item[1], default=(None, 0))
+        print(f"✓ {run['started_at']} {run['script']}: {run['duration_s']:.2f}s "
+              f"[{run['status']}] slowest={slowest[0]} ({slowest[1]:.2f}s){flag}")
+        durations.append(run['duration_s'])
+
+
+if __name__ == '__main__':
+    # python run_metrics.py [script]   show recent run history
+    print_history(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -4,89 +4,133 @@ Fixed script to fetch 13F data from SEC EDGAR API
 Supports: Berkshire Hathaway, Vanguard, Soros Fund Management
 """
 
-import requests
 import json
 import os
-import time
+import sys
 from datetime import datetime
-from typing import Dict, List
-import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from atomic_io import write_json_atomic
+from edgar_client import EdgarClient, EdgarError
+from fund_valuation import CUSIP_SYMBOLS
+from holdings_diff import CHANGE_QUARTERS, HoldingsHistory, annotate_positions, regenerate_change_fields, summarize_diff
+from info_table import from_records
+from run_metrics import instrumented
+
+TOP_POSITIONS = 20
+OUTPUT_FILE = 'scripts/13f-data.json'
+MANIFEST_FILE = 'data/13f_manifest.json'
+
+class FilingManifest:
+    """Accession numbers already ingested, per CIK"""
+    
+    def __init__(self, path: str = MANIFEST_FILE, funds: Optional[Dict[str, Dict]] = None):
+        self.path = path
+        self.funds = funds or {}
+    
+    @classmethod
+    def load(cls, path: str = MANIFEST_FILE) -> 'FilingManifest':
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(path, json.load(f))
+        except FileNotFoundError:
+            return cls(path)
+    
+    def known(self, cik: str) -> Set[str]:
+        return set(self.funds.get(cik, {}).get('accessions', []))
+    
+    def record(self, cik: str, accessions: Iterable[str]) -> None:
+        entry = self.funds.setdefault(cik, {'accessions': []})
+        entry['accessions'] = sorted(set(entry['accessions']) | set(accessions))
+        entry['synced_at'] = datetime.now().isoformat()
+    
+    def save(self) -> None:
+        write_json_atomic(self.path, self.funds, indent=2, sort_keys=True)
 
 class SEC13FDataFetcher:
     def __init__(self):
-        self.base_url = "https://www.sec.gov/cgi-bin/browse-edgar"
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-        self.sec_api_key = os.environ.get('SEC_API_KEY', '')
-        self.request_delay = 0.5  # 500ms delay between requests
+        # Shared, connection-pooled and rate limited to SEC's 10 requests/second
+        self.client = EdgarClient()
         
-    def fetch_13f_filings(self, cik: str, fund_name: str) -> List[Dict]:
+    def fetch_13f_filings(self, cik: str, fund_name: str, count: int = 1) -> List[Dict]:
         """
         Fetch 13F filings for a specific fund
         
         Args:
             cik: Central Index Key (CIK) for the fund
             fund_name: Name of the fund
+            count: Number of most recent filings to fetch
             
         Returns:
-            List of 13F filing information
+            List of 13F filing information with holdings, newest first
         """
         print(f"Fetching 13F data for {fund_name}...")
-        
-        params = {
-            'action': 'getcompany',
-            'CIK': cik,
-            'type': '13F-HR',
-            'dateb': '',
-            'owner': 'exclude',
-            'count': 10,
-            'search_text': ''
-        }
-        
-        try:
-            # Add delay to avoid rate limiting
-            time.sleep(self.request_delay)
-            
-            response = requests.get(
-                self.base_url, 
-                params=params, 
-                headers=self.headers, 
-                timeout=15
-            )
-            response.raise_for_status()
-            
-            # Parse HTML to extract filing information
-            filings = self._parse_filings_html(response.text, fund_name)
-            return filings
-            
-        except requests.exceptions.RequestException as e:
-            print(f"⚠️ Error fetching data for {fund_name}: {e}")
-            return []
+        filings = self.client.fetch_funds([cik], count)[cik]
+        if isinstance(filings, EdgarError):
+            raise filings
+        print(f"✅ Found {len(filings)} filings for {fund_name}")
+        return filings
     
-    def _parse_filings_html(self, html: str, fund_name: str) -> List[Dict]:
-        """Parse HTML response to extract filing information"""
-        filings = []
-        
-        try:
-            # Look for filing dates and accession numbers in the HTML
-            lines = html.split('\n')
-            for i, line in enumerate(lines):
-                if '13F-HR' in line and 'href' in line:
-                    # Extract accession number from href
-                    if '/Archives/edgar/container-' in line:
-                        parts = line.split('/Archives/edgar/container-')
-                        if len(parts) > 1:
-                            # This is a simplified extraction
-                            # In production, use BeautifulSoup for robust parsing
-                            pass
-            
-            print(f"✅ Found {len(filings)} filings for {fund_name}")
-            
-        except Exception as e:
-            print(f"⚠️ Error parsing filings for {fund_name}: {e}")
+    def fetch_all(self, funds: Dict[str, str], count: int = 1,
+                  manifest: Optional[FilingManifest] = None) -> Dict[str, List[Dict]]:
+        """
+        Fetch filings for every fund in parallel, keyed by CIK
         
-        return filings
+        With a manifest, only filings not ingested by an earlier sync are
+        downloaded and parsed.
+        """
+        known = {cik: manifest.known(cik) for cik in funds} if manifest else None
+        results = self.client.fetch_funds(list(funds), count, known=known)
+        for cik, filings in results.items():
+            if isinstance(filings, EdgarError):
+                print(f"❌ Could not fetch filings for {funds[cik]}")
+            else:
+                print(f"✅ Found {len(filings)} new filings for {funds[cik]}")
+        return results
+
+def summarize_filing(filing: Dict) -> Dict:
+    """
+    Convert a filing into the published fund format
+    Values are in billions of dollars and shares in millions; symbol is
+    only set for CUSIPs with a known ticker, the issuer goes in name
+    """
+    positions = {}
+    for holding in filing.get('holdings', []):
+        # Filers report one row per manager/share class; merge by CUSIP
+        position = positions.setdefault(holding['cusip'], {
+            'symbol': CUSIP_SYMBOLS.get(holding['cusip']),
+            'name': holding['name'],
+            'cusip': holding['cusip'],
+            'value': 0.0,
+            'shares': 0.0,
+        })
+        position['value'] += holding['value']
+        position['shares'] += holding['shares']
+    
+    ranked = sorted(positions.values(), key=lambda p: p['value'], reverse=True)
+    total_value = sum(p['value'] for p in ranked)
+    return {
+        'cik': filing['cik'],
+        'accession_number': filing['accession_number'],
+        'filing_date': filing['filing_date'],
+        'period_of_report': filing['period_of_report'],
+        'holdings': {
+            'total_value': round(total_value / 1e9, 1),
+            'positions': [
+                {
+                    'symbol': p['symbol'],
+                    'name': p['name'],
+                    'cusip': p['cusip'],
+                    'value': round(p['value'] / 1e9, 1),
+                    'shares': round(p['shares'] / 1e6, 1),
+                }
+                for p in ranked[:TOP_POSITIONS]
+            ]
+        }
+    }
 
 def create_static_data() -> Dict:
     """
@@ -143,26 +187,55 @@ def main():
     
     fetcher = SEC13FDataFetcher()
     
-    # Try to fetch live data
-    all_data = {}
-    
     # Fund CIKs (Central Index Keys)
     funds = {
-        '0000086365': 'Berkshire Hathaway Inc',
-        '0000102647': 'Vanguard Group Inc',
-        '0001086364': 'Soros Fund Management LLC'
+        '0001067983': 'Berkshire Hathaway Inc',
+        '0000102909': 'Vanguard Group Inc',
+        '0001029160': 'Soros Fund Management LLC'
     }
     
-    # Attempt to fetch data for each fund
-    for cik, fund_name in funds.items():
-        print(f"\nFetching data for {fund_name}...")
-        filings = fetcher.fetch_13f_filings(cik, fund_name)
-        
-        if filings:
-            all_data[fund_name] = {
-                'filing_date': datetime.now().isoformat(),
-                'holdings': {'total_value': 0, 'positions': []}
-            }
+    # Previous output; the manifest is only trusted alongside it
+    try:
+        with open(OUTPUT_FILE, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        manifest = FilingManifest.load()
+    except FileNotFoundError:
+        previous = {}
+        manifest = FilingManifest()
+    
+    # Fetch all funds in parallel under the shared SEC rate limit; enough
+    # filings are requested to fill the quarter-over-quarter change fields
+    history = HoldingsHistory()
+    all_data = {}
+    updated = 0
+    results = fetcher.fetch_all(funds, count=CHANGE_QUARTERS + 1, manifest=manifest)
+    failed = [cik for cik, filings in results.items() if isinstance(filings, EdgarError)]
+    for cik, filings in results.items():
+        fund_name = funds[cik]
+        if cik not in failed and filings and filings[0].get('holdings'):
+            for filing in filings:
+                history.save(filing, from_records(filing['holdings']))
+            summary = summarize_filing(filings[0])
+            diffs = history.quarterly_diffs(cik, CHANGE_QUARTERS)
+            if diffs:
+                annotate_positions(summary['holdings']['positions'], diffs)
+                summary['position_changes'] = summarize_diff(diffs[0]['diff'])
+            all_data[fund_name] = summary
+            manifest.record(cik, [f['accession_number'] for f in filings])
+            updated += 1
+        elif fund_name in previous:
+            all_data[fund_name] = previous[fund_name]
+    
+    # An outage must not look like a quiet quarter
+    if failed:
+        print(f"\n⚠️ 13F fetch failed for {', '.join(funds[cik] for cik in failed)}; "
+              f"keeping their previous data")
+        if len(failed) == len(funds):
+            raise EdgarError(f"13F fetch failed for all {len(funds)} funds")
+    
+    if previous and not updated:
+        print("\n✅ No new filings since the last sync")
+        return previous
     
     # If no data was fetched, use static fallback data
     if not all_data:
@@ -170,19 +243,22 @@ def main():
         print("✅ Using static fallback data instead")
         all_data = create_static_data()
     
-    # Save data to JSON file
-    output_file = 'scripts/13f-data.json'
-    os.makedirs('scripts', exist_ok=True)
+    # Output first: a crash before the manifest is saved only means the
+    # same filings are fetched again next run
+    write_json_atomic(OUTPUT_FILE, all_data, indent=2, default=str)
+    manifest.save()
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(all_data, f, indent=2, default=str)
-    
-    print(f"\n✅ Data saved to {output_file}")
+    print(f"\n✅ Data saved to {OUTPUT_FILE}")
     print(f"✅ Last updated: {datetime.now().isoformat()}")
-    print(f"✅ Funds in data: {len(all_data)}")
+    print(f"✅ Funds in data: {len(all_data)} ({updated} with new filings)")
+    
+    if os.path.exists('dist/13f-data.json'):
+        count = regenerate_change_fields('dist/13f-data.json', history)
+        print(f"✅ Regenerated position changes for {count} funds in dist/13f-data.json")
     
     return all_data
 
 if __name__ == '__main__':
-    main()
+    with instrumented('fetch_13f'):
+        main()
 
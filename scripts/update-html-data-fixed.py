@@ -4,11 +4,18 @@ Fixed script to update HTML files with latest 13F data
 """
 
 import json
-import re
+import sys
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Optional
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_bundle import load_current_bundle, publish
+from fund_valuation import bundled_quotes, fund_valuation_section, load_holdings
+from holdings_overlap import OverlapIndex
+from run_metrics import instrumented
+
 class HTMLDataUpdater:
     def __init__(self):
         self.data_file = 'scripts/13f-data.json'
@@ -53,90 +60,80 @@ class HTMLDataUpdater:
             }
         }
     
-    def update_berkshire_data(self, html_content: str, data: Dict) -> str:
-        """Update Berkshire Hathaway data in HTML"""
+    def berkshire_values(self, data: Dict) -> Dict:
+        """Slot values for Berkshire Hathaway data in HTML"""
         
         if 'Berkshire Hathaway Inc' not in data:
-            return html_content
+            return {}
         
         berkshire_data = data['Berkshire Hathaway Inc']
+        holdings = berkshire_data.get('holdings', {})
         
-        # Update filing date
-        filing_date = berkshire_data.get('filing_date', '')
-        html_content = re.sub(
-            r'<span>數據日期：.*?</span>',
-            f'<span>數據日期：{filing_date}</span>',
-            html_content
-        )
-        
-        # Update total portfolio value
-        total_value = berkshire_data.get('holdings', {}).get('total_value', 422.3)
-        html_content = re.sub(
-            r'<div class="summary-value">\$422\.3B</div>',
-            f'<div class="summary-value">${total_value:.1f}B</div>',
-            html_content,
-            count=1
-        )
-        
-        # Update cash position
-        cash = berkshire_data.get('holdings', {}).get('cash', 167.6)
-        html_content = re.sub(
-            r'<div class="summary-value">\$167\.6B</div>',
-            f'<div class="summary-value">${cash:.1f}B</div>',
-            html_content,
-            count=1
-        )
-        
-        print("✅ Berkshire data updated")
-        return html_content
+        return {
+            'filing_date': berkshire_data.get('filing_date', ''),
+            'berkshire_total_value': f"${holdings.get('total_value', 422.3):.1f}B",
+            'berkshire_cash': f"${holdings.get('cash', 167.6):.1f}B",
+        }
     
-    def update_vanguard_data(self, html_content: str, data: Dict) -> str:
-        """Update Vanguard data in HTML"""
+    def vanguard_values(self, data: Dict) -> Dict:
+        """Slot values for Vanguard data in HTML"""
         
         if 'Vanguard Group Inc' not in data:
-            return html_content
+            return {}
         
-        vanguard_data = data['Vanguard Group Inc']
-        
-        # Update Vanguard fund size
-        fund_size = vanguard_data.get('holdings', {}).get('total_value', 750.2)
-        html_content = re.sub(
-            r'<div class="summary-value">\$750\.2B</div>',
-            f'<div class="summary-value">${fund_size:.1f}B</div>',
-            html_content
-        )
-        
-        print("✅ Vanguard data updated")
-        return html_content
+        fund_size = data['Vanguard Group Inc'].get('holdings', {}).get('total_value', 750.2)
+        return {'vanguard_total_value': f"${fund_size:.1f}B"}
     
-    def update_soros_data(self, html_content: str, data: Dict) -> str:
-        """Update Soros Fund data in HTML"""
+    def soros_values(self, data: Dict) -> Dict:
+        """Slot values for Soros Fund data in HTML"""
         
         if 'Soros Fund Management LLC' not in data:
-            return html_content
-        
-        soros_data = data['Soros Fund Management LLC']
-        
-        # Update Soros fund size
-        fund_size = soros_data.get('holdings', {}).get('total_value', 32.8)
-        html_content = re.sub(
-            r'<div class="summary-value">\$32\.8B</div>',
-            f'<div class="summary-value">${fund_size:.1f}B</div>',
-            html_content
-        )
+            return {}
         
-        print("✅ Soros data updated")
-        return html_content
+        fund_size = data['Soros Fund Management LLC'].get('holdings', {}).get('total_value', 32.8)
+        return {'soros_total_value': f"${fund_size:.1f}B"}
     
-    def update_last_updated_time(self, html_content: str) -> str:
-        """Update the last updated timestamp"""
+    def overlap_section(self, data: Dict) -> Dict:
+        """Precomputed cross-fund overlap from the stored 13F history"""
+        fund_names = {fund['cik']: name for name, fund in data.items() if fund.get('cik')}
+        return OverlapIndex.from_history(fund_names).published()
+    
+    def last_updated_values(self) -> Dict:
+        """Slot value for the last updated timestamp"""
         now = datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')
-        html_content = re.sub(
-            r'最後更新：\d{4}年\d{2}月\d{2}日.*?UTC',
-            f'最後更新：{now} UTC',
-            html_content
-        )
-        return html_content
+        return {'last_updated': f'{now} UTC'}
+    
+    def page_values(self, data: Dict) -> Dict:
+        """Every slot value rendered into the pages"""
+        values = {}
+        values.update(self.berkshire_values(data))
+        values.update(self.vanguard_values(data))
+        values.update(self.soros_values(data))
+        values.update(self.last_updated_values())
+        return values
+    
+    def bundle_sections(self, data: Dict, holding_quotes: Optional[Dict] = None,
+                        indices: Optional[Dict] = None) -> Dict:
+        """
+        13F holdings, cross-fund overlap and fund valuation sections
+        
+        Funds are valued from the fetched 13F holdings (dist/13f-data.json
+        until a fetch exists), the same holdings the market update uses, and
+        quotes default to the holding quotes already in the bundle.
+        """
+        sections = {'thirteen_f': data}
+        overlap = self.overlap_section(data)
+        if overlap:
+            sections['fund_overlap'] = overlap
+        # New holdings change every fund's portfolio P/E
+        if holding_quotes is None or indices is None:
+            bundle = load_current_bundle()
+            holding_quotes = bundled_quotes(bundle) if holding_quotes is None else holding_quotes
+            indices = bundle.get('indices', {}) if indices is None else indices
+        fund_valuation = fund_valuation_section(load_holdings(), holding_quotes, indices)
+        if fund_valuation:
+            sections['fund_valuation'] = fund_valuation
+        return sections
     
     def update_all_files(self) -> None:
         """Update all HTML files with new data"""
@@ -146,31 +143,14 @@ class HTMLDataUpdater:
             print("⚠️ No data to update")
             return
         
+        # Holdings go into the shared data bundle; the pages keep only their
+        # formatted summary values, rendered in the same single pass
         for html_file in self.html_files:
             if not Path(html_file).exists():
                 print(f"⚠️ File not found: {html_file}")
-                continue
-            
-            print(f"\n📝 Updating {html_file}...")
-            
-            try:
-                with open(html_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Apply updates
-                content = self.update_berkshire_data(content, data)
-                content = self.update_vanguard_data(content, data)
-                content = self.update_soros_data(content, data)
-                content = self.update_last_updated_time(content)
-                
-                # Write back
-                with open(html_file, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                
-                print(f"✅ {html_file} updated successfully")
-                
-            except Exception as e:
-                print(f"❌ Error updating {html_file}: {e}")
+        publish(self.bundle_sections(data), html_files=self.html_files,
+                page_values=self.page_values(data))
+        print("✅ HTML files updated successfully")
 
 def main() -> None:
     """Main function"""
@@ -186,5 +166,6 @@ def main() -> None:
     print("=" * 60)
 
 if __name__ == '__main__':
-    main()
+    with instrumented('update_html_13f'):
+        main()
 
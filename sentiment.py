@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Fear & Greed sentiment series and joint analysis with P/E
+Builds a daily US and Hong Kong Fear & Greed series from local files (or a
+deterministic stub), attaches to every sentiment day the P/E last published
+on or before it with a vectorized as-of join, and computes rolling
+sentiment/P-E correlations and sentiment and valuation regimes. The latest
+reading of each market is published as the fear_greed bundle section,
+which the dashboard binds, and written to src/data/fearGreed.js for
+peRatioData.js.
+
+Input files, one per market, in data/sentiment/:
+    us.csv / hk.csv     date,value rows (value 0-100)
+    us.json / hk.json   CNN-style {"fear_and_greed_historical": {"data": [{"x": ms, "y": value}]}}
+The shipped CSVs hold the readings last published on the page; append new
+daily rows (or drop in a CNN JSON export) to extend them. A market without
+a file keeps its previous reading in fearGreed.js.
+
+Environment:
+    SENTIMENT_SOURCE    'file' (default) or 'stub'
+
+Usage:
+    python sentiment.py              analyze and publish the fear_greed section
+    python sentiment.py show [US|HK]
+    python sentiment.py benchmark
+"""
+
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from atomic_io import write_atomic
+from pe_statistics import load_series, rolling_mean_std
+from run_metrics import instrumented
+
+SENTIMENT_DIR = 'data/sentiment'
+JS_OUTPUT = 'src/data/fearGreed.js'
+JS_EXPORT = 'export const fearGreedIndex = '
+
+# Market -> P/E series in the store joined against its sentiment
+MARKET_PE = {'US': 'PE_Shiller', 'HK': 'PE_HSI'}
+MARKET_SOURCES = {
+    'US': 'CNN Fear & Greed Index',
+    'HK': 'MacroMicro MM Hong Kong Fear & Greed Index',
+}
+MARKET_NAMES_CHINESE = {'US': '美國市場', 'HK': '香港市場'}
+PE_MAX_AGE_DAYS = 62            # monthly P/E older than this is treated as missing
+CORRELATION_WINDOWS = {'3m': 63, '1y': 252}     # trading days
+VALUATION_WINDOW = 10 * 252     # trailing window of the P/E z-score
+STUB_START = '1990-01-01'
+
+# Upper bounds of each sentiment band, CNN's published cut-offs
+SENTIMENT_BANDS = (25, 45, 55, 75)
+SENTIMENT_LABELS = ('Extreme Fear', 'Fear', 'Neutral', 'Greed', 'Extreme Greed')
+SENTIMENT_LABELS_CHINESE = ('極度恐懼', '恐懼', '中性', '貪婪', '極度貪婪')
+SENTIMENT_NOTES = (
+    '投資者情緒極度悲觀，歷史上常伴隨估值低點，可能為逢低買入的機會。',
+    '投資者情緒偏向謹慎，可能為逢低買入的機會。',
+    '投資者情緒平穩，市場方向有待確認。',
+    '投資者情緒樂觀，建議謹慎評估風險。',
+    '投資者情緒過熱，需警惕回調風險。',
+)
+# Fields of each market's reading in fearGreed.js
+FRONTEND_FIELDS = ('value', 'sentiment', 'sentimentChinese', 'description', 'source', 'lastUpdated')
+# P/E z-score bounds against its trailing window
+VALUATION_BANDS = (-1.0, 1.0)
+VALUATION_LABELS = ('cheap', 'fair', 'expensive')
+
+
+def _unique_days(days: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sort by day and keep the last value given for each day"""
+    order = np.argsort(days, kind='stable')
+    days, values = days[order], values[order]
+    last = np.append(days[1:] != days[:-1], True)
+    return days[last], values[last]
+
+
+def load_file(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Read one sentiment file
+
+    Returns:
+        (datetime64[D] dates, float64 values), sorted with one row per day
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            points = json.load(f)['fear_and_greed_historical']['data']
+            stamps = np.array([p['x'] for p in points], dtype=np.int64)
+            days = (stamps // 86_400_000).astype('datetime64[D]')
+            values = np.array([p['y'] for p in points], dtype=np.float64)
+        else:
+            rows = [line.split(',') for line in f.read().splitlines()[1:] if line.strip()]
+            days = np.array([row[0].strip()[:10] for row in rows], dtype='datetime64[D]')
+            values = np.array([row[1] if row[1].strip() else 'nan' for row in rows], dtype=np.float64)
+    keep = np.isfinite(values)
+    return _unique_days(days[keep], values[keep])
+
+
+def stub_series(market: str, start: str = STUB_START,
+                end: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Deterministic business-day sentiment: smoothed noise around a slow cycle"""
+    end = end or str(date.today())
+    days = np.arange(np.datetime64(start), np.datetime64(end), dtype='datetime64[D]')
+    days = days[np.is_busday(days)]
+    rng = np.random.default_rng(zlib.crc32(market.encode('utf-8')))
+    kernel = 0.97 ** np.arange(150)
+    noise = np.convolve(rng.normal(0, 4, len(days) + len(kernel)), kernel, 'full')
+    noise = noise[len(kernel):len(kernel) + len(days)]
+    t = np.arange(len(days))
+    values = 50 + 15 * np.sin(2 * np.pi * t / (252 * 4) + rng.uniform(0, 6.3)) + noise
+    return days, np.round(np.clip(values, 0, 100), 2)
+
+
+def get_series(market: str, source: Optional[str] = None,
+               directory: str = SENTIMENT_DIR) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Sentiment for a market from the source named by argument or SENTIMENT_SOURCE"""
+    source = source or os.environ.get('SENTIMENT_SOURCE', 'file')
+    if source == 'stub':
+        return stub_series(market)
+    if source != 'file':
+        raise ValueError(f"Unknown sentiment source: {source}")
+    for extension in ('csv', 'json'):
+        path = os.path.join(directory, f'{market.lower()}.{extension}')
+        if os.path.exists(path):
+            return load_file(path)
+    return None
+
+
+def asof_join(days: np.ndarray, right_days: np.ndarray, right_values: np.ndarray,
+              max_age: Optional[int] = None) -> np.ndarray:
+    """
+    For each day, the right value last observed on or before it
+
+    Args:
+        days: Sorted datetime64[D] days to fill
+        right_days: Sorted observation days
+        right_values: Observations, NaN where missing
+        max_age: Days after which an observation no longer counts
+
+    Returns:
+        float64 array aligned with days, NaN where nothing qualifies
+    """
+    right_days = right_days.astype('datetime64[D]')
+    present = ~np.isnan(right_values)
+    right_days, right_values = right_days[present], right_values[present]
+    rows = np.searchsorted(right_days, days, side='right') - 1
+    result = right_values[np.maximum(rows, 0)] if len(right_values) else np.full(len(days), np.nan)
+    missing = rows < 0
+    if max_age is not None and len(right_days):
+        missing |= (days - right_days[np.maximum(rows, 0)]).astype(np.int64) > max_age
+    return np.where(missing, np.nan, result)
+
+
+def rolling_correlation(x: np.ndarray, y: np.ndarray, window: int,
+                        min_periods: Optional[int] = None) -> np.ndarray:
+    """Trailing Pearson correlation over rows where both series are present"""
+    min_periods = min_periods or window // 2
+    both = ~(np.isnan(x) | np.isnan(y))
+    x, y = np.where(both, x, 0.0), np.where(both, y, 0.0)
+
+    def window_sum(a):
+        c = np.cumsum(a)
+        c[window:] = c[window:] - c[:-window]
+        return c
+
+    n = window_sum(both.astype(np.float64))
+    sx, sy = window_sum(x), window_sum(y)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = window_sum(x * y) - sx * sy / n
+        var_x = window_sum(x * x) - sx * sx / n
+        var_y = window_sum(y * y) - sy * sy / n
+        corr = cov / np.sqrt(var_x * var_y)
+    # Cancellation in the running sums can leave a hair outside [-1, 1]
+    return np.where((n >= min_periods) & (var_x > 0) & (var_y > 0), np.clip(corr, -1, 1), np.nan)
+
+
+class JointSeries:
+    """Daily sentiment and as-of P/E for one market, with correlations and regimes"""
+
+    def __init__(self, market: str, days: np.ndarray, sentiment: np.ndarray,
+                 pe_days: np.ndarray, pe: np.ndarray):
+        self.market = market
+        self.days = days
+        self.sentiment = sentiment
+        self.pe = asof_join(days, pe_days, pe, PE_MAX_AGE_DAYS)
+
+        # z-score of the P/E against its own trailing window, on the daily grid
+        mean, std = rolling_mean_std(self.pe[:, None], min(VALUATION_WINDOW, len(days)))
+        mean, std = mean[:, 0], std[:, 0]
+        # A flat window leaves only rounding noise in the running-sum std
+        std = np.where(std > 1e-6 * np.abs(mean), std, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.pe_z = (self.pe - mean) / std
+        self.correlations = {
+            name: rolling_correlation(sentiment, self.pe, window)
+            for name, window in CORRELATION_WINDOWS.items()
+        }
+        # The band edges are inclusive upper bounds: 25 is still Extreme Fear
+        self.sentiment_regime = np.digitize(sentiment, SENTIMENT_BANDS, right=True)
+        valuation = np.digitize(self.pe_z, VALUATION_BANDS)
+        # np.digitize puts NaN past the last band
+        self.valuation_regime = np.where(np.isnan(self.pe_z), -1, valuation)
+
+    def regime_table(self) -> Dict[str, Dict[str, float]]:
+        """Share of days and mean P/E in each joint sentiment/valuation regime"""
+        valued = self.valuation_regime >= 0
+        codes = self.sentiment_regime[valued] * len(VALUATION_LABELS) + self.valuation_regime[valued]
+        size = len(SENTIMENT_LABELS) * len(VALUATION_LABELS)
+        counts = np.bincount(codes, minlength=size)
+        pe_sums = np.bincount(codes, weights=self.pe[valued], minlength=size)
+        table = {}
+        for code in np.flatnonzero(counts):
+            sentiment, valuation = divmod(int(code), len(VALUATION_LABELS))
+            table[f'{SENTIMENT_LABELS[sentiment]} / {VALUATION_LABELS[valuation]}'] = {
+                'share_pct': round(float(counts[code] / counts.sum() * 100), 1),
+                'mean_pe': round(float(pe_sums[code] / counts[code]), 2),
+            }
+        return table
+
+    def summary(self) -> Dict:
+        """The latest reading in the frontend's fearGreedIndex shape, plus the joint analysis"""
+        def clean(value):
+            value = float(value)
+            return round(value, 2) if np.isfinite(value) else None
+
+        band = int(self.sentiment_regime[-1])
+        valuation = int(self.valuation_regime[-1])
+        return {
+            'value': clean(self.sentiment[-1]),
+            'sentiment': SENTIMENT_LABELS[band],
+            'sentimentChinese': SENTIMENT_LABELS_CHINESE[band],
+            'description': f"{MARKET_NAMES_CHINESE[self.market]}當前處於{SENTIMENT_LABELS_CHINESE[band]}狀態，"
+                           f"{SENTIMENT_NOTES[band]}",
+            'source': MARKET_SOURCES[self.market],
+            'lastUpdated': str(self.days[-1]),
+            'pe_series': MARKET_PE[self.market],
+            'pe': clean(self.pe[-1]),
+            'pe_z_score': clean(self.pe_z[-1]),
+            'valuation': VALUATION_LABELS[valuation] if valuation >= 0 else None,
+            'correlations': {name: clean(values[-1]) for name, values in self.correlations.items()},
+            'regimes': self.regime_table(),
+        }
+
+
+def analyze(source: Optional[str] = None) -> Dict[str, JointSeries]:
+    """Joint series for every market with sentiment data"""
+    timestamps, names, matrix = load_series()
+    pe_days = timestamps.astype('datetime64[D]')
+    joint = {}
+    for market, column in MARKET_PE.items():
+        series = get_series(market, source)
+        if series is None:
+            print(f"⚠️ {market}: no sentiment file in {SENTIMENT_DIR}")
+            continue
+        if column not in names:
+            print(f"⚠️ {market}: P/E series {column} not in the store")
+            continue
+        days, values = series
+        joint[market] = JointSeries(market, days, values, pe_days, matrix[:, names.index(column)])
+    return joint
+
+
+def bundle_section(joint: Dict[str, JointSeries]) -> Dict:
+    return {market.lower(): series.summary() for market, series in joint.items()}
+
+
+def load_js(path: str = JS_OUTPUT) -> Dict[str, Dict]:
+    """Readings in a generated fearGreed.js, empty if it does not exist"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except FileNotFoundError:
+        return {}
+    return json.loads(content.split(JS_EXPORT, 1)[1].strip().rstrip(';'))
+
+
+def generate_js(section: Dict[str, Dict], path: str = JS_OUTPUT) -> None:
+    """Write the generated JS data module consumed by peRatioData.js"""
+    readings = load_js(path)
+    for market, summary in section.items():
+        readings[market] = {field: summary[field] for field in FRONTEND_FIELDS}
+    content = (
+        "// Generated by sentiment.py from data/sentiment/.\n"
+        "// Do not edit by hand; rerun `python sentiment.py` instead.\n\n"
+        f"{JS_EXPORT}{json.dumps(readings, indent=2, ensure_ascii=False)};\n"
+    )
+    write_atomic(path, content)
+
+
+def benchmark(years: int = 50, repeat: int = 5) -> None:
+    """Join, correlations and regimes for both markets over decades of daily data"""
+    start = str(np.datetime64('2026-01-01') - np.timedelta64(years * 365, 'D'))
+    series = {market: stub_series(market, start, '2026-01-01') for market in MARKET_PE}
+    pe_days = np.arange(np.datetime64(start[:7]), np.datetime64('2026-01'),
+                        dtype='datetime64[M]').astype('datetime64[D]')
+    rng = np.random.default_rng(0)
+    pe = 15 * np.exp(np.cumsum(rng.normal(0, 0.03, len(pe_days))))
+
+    elapsed = time.perf_counter()
+    for _ in range(repeat):
+        for market, (days, values) in series.items():
+            JointSeries(market, days, values, pe_days, pe).summary()
+    elapsed = (time.perf_counter() - elapsed) / repeat
+    rows = sum(len(days) for days, _ in series.values())
+    print(f"✓ {len(series)} markets x {years} years ({rows} daily rows): {elapsed * 1000:.1f} ms")
+
+    # The scalar equivalent of the as-of join, for comparison
+    days, values = series['US']
+    start_time = time.perf_counter()
+    row, joined = -1, []
+    for day in days:
+        while row + 1 < len(pe_days) and pe_days[row + 1] <= day:
+            row += 1
+        joined.append(pe[row] if row >= 0 else np.nan)
+    loop = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    asof_join(days, pe_days, pe)
+    vectorized = time.perf_counter() - start_time
+    print(f"✓ As-of join, {len(days)} rows: loop {loop * 1000:.1f} ms, searchsorted {vectorized * 1000:.2f} ms")
+
+
+def main(argv: List[str]) -> int:
+    if argv[:1] == ['benchmark']:
+        benchmark()
+        return 0
+    joint = analyze()
+    if not joint:
+        print("⚠️ No sentiment data to analyze")
+        return 1
+    if argv[:1] == ['show']:
+        markets = [m.upper() for m in argv[1:]] or list(joint)
+        for market in markets:
+            if market in joint:
+                print(json.dumps({market: joint[market].summary()}, indent=2, ensure_ascii=False))
+        return 0
+
+    from data_bundle import publish
+
+    section = bundle_section(joint)
+    for market, summary in section.items():
+        print(f"✓ {market.upper()}: {summary['value']} ({summary['sentiment']}), "
+              f"P/E {summary['pe']} ({summary['valuation']}), 1y correlation {summary['correlations']['1y']}")
+    generate_js(section)
+    publish({'fear_greed': section})
+    return 0
+
+
+if __name__ == '__main__':
+    with instrumented('sentiment'):
+        status = main(sys.argv[1:])
+    sys.exit(status)
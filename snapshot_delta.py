@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Quote snapshot deltas
+Compares freshly fetched quotes against the last published snapshot and
+records only the symbols whose price or P/E moved beyond a relative
+tolerance. Snapshots are kept as a base file followed by a chain of small
+delta files, so any recent state can be rebuilt from its base plus deltas,
+and callers skip rendering and committing when a fetch produced no delta.
+
+Layout under dist/data/snapshots/:
+    base-<seq>.json     every symbol's quote fields
+    delta-<seq>.json    changed fields of changed symbols since seq - 1
+    index.json          written last; lists the live bases and deltas
+
+Usage:
+    python snapshot_delta.py show
+    python snapshot_delta.py state SEQ [SYMBOL ...]
+    python snapshot_delta.py benchmark
+"""
+
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from atomic_io import file_lock, write_json_atomic
+from quote_cache import FIELD_TTLS
+from run_metrics import metrics
+
+SNAPSHOT_DIR = 'dist/data/snapshots'
+INDEX_FILE = 'index.json'
+QUOTE_FIELDS = tuple(FIELD_TTLS)    # fields carried in snapshots
+MAX_DELTAS = 48                     # deltas after a base before a new base is written
+KEEP_BASES = 3                      # older chains are pruned
+
+# Relative moves that make a symbol part of a delta; set
+# SNAPSHOT_TOLERANCES="currentPrice=0.001,trailingPE=0.005" to override
+DEFAULT_TOLERANCES = {
+    'currentPrice': 0.0005,
+    'trailingPE': 0.001,
+}
+
+
+def tolerances_from_env() -> Dict[str, float]:
+    tolerances = dict(DEFAULT_TOLERANCES)
+    spec = os.environ.get('SNAPSHOT_TOLERANCES', '')
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        field, _, value = item.partition('=')
+        try:
+            tolerances[field.strip()] = float(value)
+        except ValueError:
+            print(f"⚠️ Ignoring snapshot tolerance {item!r}")
+    return tolerances
+
+
+def quote_record(info: Dict) -> Dict:
+    """The snapshot fields of a provider info dict; non-finite numbers become None"""
+    record = {}
+    for field in QUOTE_FIELDS:
+        value = info.get(field)
+        if isinstance(value, float) and not math.isfinite(value):
+            value = None
+        record[field] = value
+    return record
+
+
+def _moved(old, new, tolerance: float) -> bool:
+    if old is None or new is None:
+        return old is not new
+    try:
+        old, new = float(old), float(new)
+    except (TypeError, ValueError):
+        return old != new
+    return abs(new - old) > tolerance * abs(old)
+
+
+def diff(state: Dict[str, Dict], quotes: Dict[str, Optional[Dict]],
+         tolerances: Dict[str, float]) -> Dict[str, Dict]:
+    """
+    Changes that take state to the new quotes
+
+    A symbol is included when it is new or one of the tolerance fields moved
+    beyond its tolerance, and then carries every field that differs.
+    Symbols whose quote is None are left out so a failed fetch never
+    erases a published quote.
+
+    Returns:
+        {symbol: {field: new value}}
+    """
+    changes = {}
+    for symbol, info in quotes.items():
+        if info is None:
+            continue
+        record = quote_record(info)
+        old = state.get(symbol)
+        if old is None:
+            changes[symbol] = record
+            continue
+        if any(_moved(old.get(field), record.get(field), tolerance)
+               for field, tolerance in tolerances.items()):
+            changes[symbol] = {field: value for field, value in record.items()
+                               if old.get(field) != value}
+    return changes
+
+
+def _write_json(path: str, payload: Dict) -> None:
+    write_json_atomic(path, payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def _read_json(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class SnapshotLog:
+    def __init__(self, directory: str = SNAPSHOT_DIR, max_deltas: int = MAX_DELTAS,
+                 keep_bases: int = KEEP_BASES, tolerances: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            directory: Where bases, deltas and the index are written
+            max_deltas: Deltas in a chain before the next publish writes a base
+            keep_bases: Chains kept for reconstruction, including the current one
+            tolerances: Field -> relative tolerance, defaults from the environment
+        """
+        self.directory = directory
+        self.max_deltas = max_deltas
+        self.keep_bases = keep_bases
+        self.tolerances = tolerances_from_env() if tolerances is None else dict(tolerances)
+        self.index = self._load_index()
+        self._state: Optional[Dict[str, Dict]] = None
+
+    def _load_index(self) -> Dict:
+        try:
+            index = _read_json(os.path.join(self.directory, INDEX_FILE))
+        except (FileNotFoundError, ValueError):
+            return {'latest': None, 'entries': []}
+        return index
+
+    @property
+    def latest(self) -> Optional[int]:
+        return self.index['latest']
+
+    def _path(self, entry: Dict) -> str:
+        return os.path.join(self.directory, f"{entry['kind']}-{entry['seq']}.json")
+
+    def state_at(self, seq: int) -> Dict[str, Dict]:
+        """Quotes as published at seq, rebuilt from its base and the deltas after it"""
+        entries = [e for e in self.index['entries'] if e['seq'] <= seq]
+        bases = [i for i, e in enumerate(entries) if e['kind'] == 'base']
+        if not bases or seq not in {e['seq'] for e in entries}:
+            raise KeyError(f"Snapshot {seq} is not available")
+        state = {}
+        for entry in entries[bases[-1]:]:
+            payload = _read_json(self._path(entry))
+            if entry['kind'] == 'base':
+                state = payload['quotes']
+                continue
+            for symbol, changes in payload['changes'].items():
+                state[symbol] = {**state.get(symbol, {}), **changes}
+        return state
+
+    def current(self) -> Dict[str, Dict]:
+        """The latest published quotes, empty before the first publish"""
+        if self._state is None:
+            self._state = {} if self.latest is None else self.state_at(self.latest)
+        return self._state
+
+    def publish(self, quotes: Dict[str, Optional[Dict]]) -> Tuple[Dict[str, Dict], Optional[Dict]]:
+        """
+        Record the quotes that moved since the last publish
+
+        Returns:
+            (published state after this call, delta written or None when nothing moved)
+        """
+        with file_lock(self.directory):
+            # Another process may have published since the index was read
+            index = self._load_index()
+            if index['latest'] != self.latest:
+                self.index, self._state = index, None
+            return self._publish(quotes)
+
+    def _publish(self, quotes: Dict[str, Optional[Dict]]) -> Tuple[Dict[str, Dict], Optional[Dict]]:
+        state = self.current()
+        changes = diff(state, quotes, self.tolerances)
+        metrics.count('snapshots.symbols_changed', len(changes))
+        if not changes:
+            metrics.count('snapshots.unchanged')
+            return state, None
+
+        state = {symbol: dict(record) for symbol, record in state.items()}
+        for symbol, record in changes.items():
+            state[symbol] = {**state.get(symbol, {}), **record}
+
+        seq = (self.latest or 0) + 1
+        entries = self.index['entries']
+        bases = [i for i, e in enumerate(entries) if e['kind'] == 'base']
+        created_at = datetime.now().isoformat()
+        if not bases or len(entries) - 1 - bases[-1] >= self.max_deltas:
+            entry = {'seq': seq, 'kind': 'base', 'created_at': created_at}
+            _write_json(self._path(entry), {'seq': seq, 'created_at': created_at, 'quotes': state})
+        else:
+            entry = {'seq': seq, 'kind': 'delta', 'created_at': created_at}
+            _write_json(self._path(entry), {'seq': seq, 'created_at': created_at,
+                                                 'changes': changes})
+        entries.append(entry)
+        self.index['latest'] = seq
+        stale = self._prune()
+        # The index is replaced last so readers never see an entry before its file
+        _write_json(os.path.join(self.directory, INDEX_FILE), self.index)
+        for old in stale:
+            try:
+                os.remove(self._path(old))
+            except FileNotFoundError:
+                pass
+        self._state = state
+        print(f"✓ Snapshot {seq} ({entry['kind']}): {len(changes)} symbols changed")
+        return state, {'seq': seq, 'changes': changes}
+
+    def _prune(self) -> List[Dict]:
+        entries = self.index['entries']
+        bases = [i for i, e in enumerate(entries) if e['kind'] == 'base']
+        if len(bases) <= self.keep_bases:
+            return []
+        cut = bases[-self.keep_bases]
+        self.index['entries'] = entries[cut:]
+        return entries[:cut]
+
+
+def benchmark(symbols: int = 2_000, runs: int = 200, moving: float = 0.05) -> None:
+    """Delta size and time when a small share of symbols moves each run"""
+    import random
+    import tempfile
+
+    rng = random.Random(0)
+    quotes = {
+        f'S{i:05d}': {'longName': f'Company {i}', 'currentPrice': rng.uniform(1, 900),
+                      'trailingPE': rng.uniform(5, 60), 'regularMarketChangePercent': 0.0,
+                      'marketCap': rng.randint(10**8, 10**12)}
+        for i in range(symbols)
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        log = SnapshotLog(directory)
+        log.publish(quotes)
+        base_size = os.path.getsize(os.path.join(directory, 'base-1.json'))
+        written, empty, elapsed = 0, 0, 0.0
+        for run in range(runs):
+            # Every fourth run nothing moves
+            if run % 4:
+                for symbol in rng.sample(list(quotes), int(symbols * moving)):
+                    quotes[symbol] = {**quotes[symbol],
+                                      'currentPrice': quotes[symbol]['currentPrice'] * rng.uniform(0.99, 1.01)}
+            start = time.perf_counter()
+            _, delta = log.publish(quotes)
+            elapsed += time.perf_counter() - start
+            if delta is None:
+                empty += 1
+            else:
+                written += os.path.getsize(log._path(log.index['entries'][-1]))
+        start = time.perf_counter()
+        log.state_at(log.latest)
+        rebuild = time.perf_counter() - start
+
+    print(f"{symbols} symbols, {moving:.0%} moving per run:")
+    print(f"✓ Full snapshot: {base_size / 1024:.0f} KB per run")
+    print(f"✓ Deltas: {written / runs / 1024:.1f} KB per run, {elapsed / runs * 1000:.1f} ms per publish, "
+          f"{empty} unchanged runs skipped")
+    print(f"✓ Rebuilding the latest state: {rebuild * 1000:.1f} ms")
+
+
+def main(argv: List[str]) -> int:
+    if not argv or argv[0] == 'show':
+        log = SnapshotLog()
+        if log.latest is None:
+            print(f"No snapshots in {log.directory}")
+            return 0
+        for entry in log.index['entries']:
+            print(f"  {entry['seq']:>5} {entry['kind']:<5} {entry['created_at']}")
+        print(f"✓ Latest snapshot {log.latest}: {len(log.current())} symbols")
+        return 0
+    if argv[0] == 'state' and len(argv) > 1:
+        state = SnapshotLog().state_at(int(argv[1]))
+        if len(argv) > 2:
+            state = {symbol: state.get(symbol) for symbol in argv[2:]}
+        print(json.dumps(state, indent=2, ensure_ascii=False))
+        return 0
+    if argv[0] == 'benchmark':
+        benchmark()
+        return 0
+    print(__doc__)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,21 @@
+// Generated by sentiment.py from data/sentiment/.
+// Do not edit by hand; rerun `python sentiment.py` instead.
+
+export const fearGreedIndex = {
+  "us": {
+    "value": 29.0,
+    "sentiment": "Fear",
+    "sentimentChinese": "恐懼",
+    "description": "美國市場當前處於恐懼狀態，投資者情緒偏向謹慎，可能為逢低買入的機會。",
+    "source": "CNN Fear & Greed Index",
+    "lastUpdated": "2025-10-11"
+  },
+  "hk": {
+    "value": 66.56,
+    "sentiment": "Greed",
+    "sentimentChinese": "貪婪",
+    "description": "香港市場當前處於貪婪狀態，投資者情緒樂觀，建議謹慎評估風險。",
+    "source": "MacroMicro MM Hong Kong Fear & Greed Index",
+    "lastUpdated": "2025-10-03"
+  }
+};
@@ -1,4 +1,30 @@
 // Historical P/E Ratio Analysis Data with Fear & Greed Index
+import { historicalAverages, currentRatios } from './peStatistics.js';
+import { fearGreedIndex } from './fearGreed.js';
+
+// Percentage change of the current P/E against its long-run average
+const changeFrom = (key) =>
+  Number(((currentRatios[key] / historicalAverages[key] - 1) * 100).toFixed(1));
+
+const valuationStatus = (change) =>
+  change >= 15 ? "高估" : change > 0 ? "輕微高估" : "低估";
+
+const differenceText = (change) =>
+  change >= 0 ? `高出${change}%` : `低${Math.abs(change)}%`;
+
+const marketEntry = (key, market, source, describe) => {
+  const change = changeFrom(key);
+  return {
+    market,
+    source,
+    historical: historicalAverages[key],
+    current: currentRatios[key],
+    change,
+    status: valuationStatus(change),
+    description: describe(currentRatios[key].toFixed(2), historicalAverages[key].toFixed(2), differenceText(change))
+  };
+};
+
 export const peRatioAnalysis = {
   summary: {
     title: "主要市場指數歷史本益比分析報告",
@@ -7,68 +33,21 @@ export const peRatioAnalysis = {
     description: "本報告對主要全球股票市場指數的歷史本益比進行了深入分析，包括標準普爾500指數、道瓊工業平均指數、納斯達克綜合指數以及恒生指數。同時整合了美國和香港市場的恐懼與貪婪指數，提供更全面的市場情緒分析。"
   },
   
-  historicalAverages: {
-    "PE_Shiller": 17.90,
-    "PE_multpl": 15.50,
-    "PE_investorsfriend": 20.10,
-    "PE_fullratio": 29.56,
-    "PE_HSI": 11.83
-  },
+  historicalAverages,
   
-  currentRatios: {
-    "PE_Shiller": 30.81,
-    "PE_multpl": 28.16,
-    "PE_investorsfriend": 17.00,
-    "PE_fullratio": 39.85,
-    "PE_HSI": 12.60
-  },
+  currentRatios,
   
   marketData: [
-    {
-      market: "S&P 500 (CAPE)",
-      source: "Shiller",
-      historical: 17.90,
-      current: 30.81,
-      change: 72.2,
-      status: "高估",
-      description: "Shiller CAPE 比率目前為30.81，比歷史平均值17.90高出72.2%。這一水平接近歷史高點，暗示市場可能存在泡沫風險。"
-    },
-    {
-      market: "S&P 500",
-      source: "multpl.com",
-      historical: 15.50,
-      current: 28.16,
-      change: 81.7,
-      status: "高估",
-      description: "來自 multpl.com 的數據顯示更為極端的情況，當前本益比28.16比歷史平均值15.50高出81.7%。"
-    },
-    {
-      market: "道瓊工業平均",
-      source: "investorsfriend.com",
-      historical: 20.10,
-      current: 17.00,
-      change: -15.4,
-      status: "低估",
-      description: "唯一顯示相對低估的主要美國指數，當前本益比17.00比歷史平均值20.10低15.4%。"
-    },
-    {
-      market: "NASDAQ",
-      source: "fullratio.com",
-      historical: 29.56,
-      current: 39.85,
-      change: 34.8,
-      status: "高估",
-      description: "顯示出科技股的高估值特徵，當前本益比39.85比歷史平均值29.56高出34.8%。"
-    },
-    {
-      market: "恒生指數",
-      source: "HSI 數據",
-      historical: 11.83,
-      current: 12.60,
-      change: 6.5,
-      status: "輕微高估",
-      description: "表現相對穩定，當前本益比12.60僅比歷史平均值11.83高出6.5%。"
-    }
+    marketEntry("PE_Shiller", "S&P 500 (CAPE)", "Shiller", (current, historical, diff) =>
+      `Shiller CAPE 比率目前為${current}，比歷史平均值${historical}${diff}。這一水平接近歷史高點，暗示市場可能存在泡沫風險。`),
+    marketEntry("PE_multpl", "S&P 500", "multpl.com", (current, historical, diff) =>
+      `來自 multpl.com 的數據顯示更為極端的情況，當前本益比${current}比歷史平均值${historical}${diff}。`),
+    marketEntry("PE_investorsfriend", "道瓊工業平均", "investorsfriend.com", (current, historical, diff) =>
+      `當前本益比${current}比歷史平均值${historical}${diff}。`),
+    marketEntry("PE_fullratio", "NASDAQ", "fullratio.com", (current, historical, diff) =>
+      `顯示出科技股的高估值特徵，當前本益比${current}比歷史平均值${historical}${diff}。`),
+    marketEntry("PE_HSI", "恒生指數", "HSI 數據", (current, historical, diff) =>
+      `表現相對穩定，當前本益比${current}僅比歷史平均值${historical}${diff}。`)
   ],
   
   insights: [
@@ -86,24 +65,7 @@ export const peRatioAnalysis = {
     }
   ],
   
-  fearGreedIndex: {
-    us: {
-      value: 29,
-      sentiment: "Fear",
-      sentimentChinese: "恐懼",
-      description: "美國市場當前處於恐懼狀態，投資者情緒偏向謹慎，可能為逢低買入的機會。",
-      source: "CNN Fear & Greed Index",
-      lastUpdated: "2025-10-11"
-    },
-    hk: {
-      value: 66.56,
-      sentiment: "Greed",
-      sentimentChinese: "貪婪",
-      description: "香港市場當前處於貪婪狀態，投資者情緒樂觀，建議謹慎評估風險。",
-      source: "MacroMicro MM Hong Kong Fear & Greed Index",
-      lastUpdated: "2025-10-03"
-    }
-  },
+  fearGreedIndex,
 
   fundFlows: {
     us: {
@@ -0,0 +1,133 @@
+// Generated by pe_statistics.py from src/assets/processed_pe_data.csv.
+// Do not edit by hand; rerun `python pe_statistics.py` instead.
+
+export const dataThrough = "2026-01-01";
+
+export const historicalAverages = {
+  "PE_Shiller": 17.4,
+  "PE_multpl": 15.4,
+  "PE_investorsfriend": 17.0,
+  "PE_fullratio": 26.29,
+  "PE_HSI": 11.99
+};
+
+export const currentRatios = {
+  "PE_Shiller": 30.81,
+  "PE_multpl": 28.16,
+  "PE_investorsfriend": 17.0,
+  "PE_fullratio": 39.85,
+  "PE_HSI": 12.6
+};
+
+export const peStatistics = {
+  "PE_Shiller": {
+    "count": 1712.0,
+    "mean": 17.4,
+    "median": 16.49,
+    "std": 7.19,
+    "current": 30.81,
+    "z_score": 1.86,
+    "percentile_rank": 94.8,
+    "change_pct": 77.06,
+    "max_drawdown_pct": -82.91,
+    "current_drawdown_pct": -30.29,
+    "p5": 7.91,
+    "p25": 11.95,
+    "p75": 21.14,
+    "p95": 30.94,
+    "rolling_5y_mean": 32.71,
+    "rolling_5y_std": 3.77,
+    "rolling_10y_mean": 30.46,
+    "rolling_10y_std": 3.36,
+    "rolling_20y_mean": 26.24,
+    "rolling_20y_std": 5.02
+  },
+  "PE_multpl": {
+    "count": 1856.0,
+    "mean": 15.4,
+    "median": 13.91,
+    "std": 8.72,
+    "current": 28.16,
+    "z_score": 1.46,
+    "percentile_rank": 95.58,
+    "change_pct": 82.86,
+    "max_drawdown_pct": -89.09,
+    "current_drawdown_pct": -77.24,
+    "p5": 7.21,
+    "p25": 10.89,
+    "p75": 17.49,
+    "p95": 27.66,
+    "rolling_5y_mean": 25.61,
+    "rolling_5y_std": 3.22,
+    "rolling_10y_mean": 24.96,
+    "rolling_10y_std": 3.8,
+    "rolling_20y_mean": 25.21,
+    "rolling_20y_std": 16.37
+  },
+  "PE_investorsfriend": {
+    "count": 1.0,
+    "mean": 17.0,
+    "median": 17.0,
+    "std": 0.0,
+    "current": 17.0,
+    "z_score": null,
+    "percentile_rank": 100.0,
+    "change_pct": 0.0,
+    "max_drawdown_pct": 0.0,
+    "current_drawdown_pct": 0.0,
+    "p5": 17.0,
+    "p25": 17.0,
+    "p75": 17.0,
+    "p95": 17.0,
+    "rolling_5y_mean": 17.0,
+    "rolling_5y_std": 0.0,
+    "rolling_10y_mean": 17.0,
+    "rolling_10y_std": 0.0,
+    "rolling_20y_mean": 17.0,
+    "rolling_20y_std": 0.0
+  },
+  "PE_fullratio": {
+    "count": 61.0,
+    "mean": 26.29,
+    "median": 26.91,
+    "std": 3.05,
+    "current": 39.85,
+    "z_score": 4.45,
+    "percentile_rank": 100.0,
+    "change_pct": 51.6,
+    "max_drawdown_pct": -8.5,
+    "current_drawdown_pct": 0.0,
+    "p5": 22.88,
+    "p25": 23.41,
+    "p75": 27.69,
+    "p95": 29.41,
+    "rolling_5y_mean": 28.19,
+    "rolling_5y_std": 2.29,
+    "rolling_10y_mean": 26.29,
+    "rolling_10y_std": 3.05,
+    "rolling_20y_mean": 26.29,
+    "rolling_20y_std": 3.05
+  },
+  "PE_HSI": {
+    "count": 10.0,
+    "mean": 11.99,
+    "median": 11.81,
+    "std": 0.6,
+    "current": 12.6,
+    "z_score": 1.02,
+    "percentile_rank": 90.0,
+    "change_pct": 5.1,
+    "max_drawdown_pct": -15.47,
+    "current_drawdown_pct": -4.91,
+    "p5": 11.25,
+    "p25": 11.62,
+    "p75": 12.37,
+    "p95": 12.96,
+    "rolling_5y_mean": 11.99,
+    "rolling_5y_std": 0.6,
+    "rolling_10y_mean": 11.99,
+    "rolling_10y_std": 0.6,
+    "rolling_20y_mean": 11.99,
+    "rolling_20y_std": 0.6
+  }
+};
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from pe_statistics import _drop_fills, _month_values, compute_statistics, load_series
+from pe_store import DEFAULT_CSV_PATH, PEStore
+
+
+@pytest.fixture(scope='module')
+def series(tmp_path_factory):
+    store = PEStore.from_csv(DEFAULT_CSV_PATH, str(tmp_path_factory.mktemp('pe_store')))
+    return load_series(store)
+
+
+def test_year_rows_decode_the_cross_product():
+    outer = np.array([10.0, 11.0, 12.0])
+    inner = np.array([1.0, 2.0, 3.0, 4.0])
+    np.testing.assert_array_equal(_month_values(np.repeat(outer, 4)), outer)
+    np.testing.assert_array_equal(_month_values(np.tile(inner, 3)), inner)
+    np.testing.assert_array_equal(_month_values(np.full(12, 5.0)), [5.0])
+
+
+def test_fill_runs_are_dropped():
+    values = np.array([7.0, 7.0, 7.0, 8.0, 9.0, 9.0, np.nan, 9.0])
+    np.testing.assert_array_equal(_drop_fills(values),
+                                  [np.nan, np.nan, np.nan, 8.0, 9.0, np.nan, np.nan, np.nan])
+    # A single leading observation is real, not a backfill
+    np.testing.assert_array_equal(_drop_fills(np.array([7.0, 8.0])), [7.0, 8.0])
+
+
+def test_series_are_monthly_real_history(series):
+    timestamps, names, matrix = series
+    months = timestamps.astype('datetime64[M]')
+    assert (np.diff(months).astype(np.int64) >= 1).all()
+    shiller = matrix[:, names.index('PE_Shiller')]
+    present = months[~np.isnan(shiller)]
+    assert str(present[0]) == '1881-02'
+    assert str(present[-1]) == '2023-09'
+
+
+def test_historical_medians(series):
+    timestamps, names, matrix = series
+    stats = compute_statistics(matrix, names)
+    assert stats['PE_Shiller']['median'] == 16.49
+    assert stats['PE_multpl']['median'] == 13.91
+    assert stats['PE_Shiller']['max_drawdown_pct'] < -50
+    assert stats['PE_Shiller']['percentile_rank'] < 100
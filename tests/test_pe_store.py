@@ -0,0 +1,49 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from pe_store import PEStore, open_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    stamps = np.array(['2025-01-01', '2025-02-01', '2025-03-01'], dtype='datetime64[ns]')
+    data = {'PE_A': np.array([10.0, 10.0, 11.0]), 'PE_B': np.array([20.0, np.nan, np.nan])}
+    return PEStore.create(str(tmp_path / 'store'), stamps.view('<i8'), data)
+
+
+def test_append_extends_runs(store):
+    store.append('2025-04-01', {'PE_A': 11.0, 'PE_B': 21.0})
+    reopened = PEStore(store.path)
+    assert len(reopened) == 4
+    np.testing.assert_array_equal(reopened.column('PE_A'), [10.0, 10.0, 11.0, 11.0])
+    np.testing.assert_array_equal(reopened.column('PE_B'), [20.0, np.nan, np.nan, 21.0])
+    assert reopened.meta['rows'] == 4
+
+
+@pytest.mark.parametrize('timestamp', ['2025-03-01', '2025-02-15'])
+def test_append_rejects_duplicate_and_out_of_order_rows(store, timestamp):
+    with pytest.raises(ValueError):
+        store.append(timestamp, {'PE_A': 12.0})
+    assert len(PEStore(store.path)) == 3
+
+
+def test_partial_append_is_detected_and_rebuilt(store, tmp_path):
+    meta_path = os.path.join(store.path, 'meta.json')
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    # A crash after the first column's run ends were rewritten, before meta.json
+    store.append('2025-04-01', {'PE_A': 11.0})
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    with pytest.raises(ValueError, match='partial append'):
+        PEStore(store.path)
+
+    csv_path = str(tmp_path / 'pe.csv')
+    with open(csv_path, 'w', encoding='utf-8') as f:
+        f.write(',PE_A,PE_B\n2025-01-01 00:00:00,10.0,20.0\n')
+    os.utime(csv_path, (0, 0))
+    rebuilt = open_store(store.path, csv_path)
+    assert len(rebuilt) == 1
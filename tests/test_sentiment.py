@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+from sentiment import JointSeries, SENTIMENT_LABELS
+
+
+@pytest.mark.parametrize('reading, label', [
+    (0, 'Extreme Fear'), (25, 'Extreme Fear'),
+    (26, 'Fear'), (45, 'Fear'),
+    (46, 'Neutral'), (55, 'Neutral'),
+    (56, 'Greed'), (75, 'Greed'),
+    (76, 'Extreme Greed'), (100, 'Extreme Greed'),
+])
+def test_sentiment_band_boundaries(reading, label):
+    days = np.arange(np.datetime64('2025-01-01'), np.datetime64('2025-01-04'))
+    sentiment = np.array([50.0, 50.0, reading])
+    joint = JointSeries('US', days, sentiment, days[:1], np.array([20.0]))
+    assert SENTIMENT_LABELS[joint.sentiment_regime[-1]] == label
+    assert joint.summary()['sentiment'] == label
@@ -0,0 +1,33 @@
+import pytest
+
+from valuation_bands import RollingWindow, ValuationBands
+
+
+def assert_same_window(window, expected):
+    fresh = RollingWindow(window.size, expected)
+    assert list(window.buffer) == expected
+    assert window.sorted == fresh.sorted
+    assert len(window) == len(fresh)
+    assert window.mean() == pytest.approx(fresh.mean())
+    assert window.std() == pytest.approx(fresh.std())
+    for q in (10, 50, 90):
+        assert window.percentile(q) == pytest.approx(fresh.percentile(q))
+
+
+def test_replace_last_keeps_window_full():
+    window = RollingWindow(4, [1.0, 2.0, 3.0, 4.0])
+    window.push(5.0)
+    window.replace_last(9.0)
+    assert_same_window(window, [2.0, 3.0, 4.0, 9.0])
+
+
+def test_same_day_reappend_on_full_window():
+    bands = ValuationBands(periods_per_year=1)
+    for year in range(2000, 2030):
+        bands.append(float(year % 7), key=str(year))
+    bands.append(10.0, key='2030')
+    bands.append(12.0, key='2030')
+    for window in bands.windows.values():
+        assert window.full
+        expected = [float(year % 7) for year in range(2031 - window.size, 2030)] + [12.0]
+        assert_same_window(window, expected)
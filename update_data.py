@@ -5,16 +5,22 @@ Fetches real-time stock data and updates HTML file
 Fixed version with correct paths and index P/E calculation
 """
 
-import yfinance as yf
 import json
 from datetime import datetime
 import os
 
-def get_stock_data(symbol):
-    """Fetch stock data from Yahoo Finance"""
+from atomic_io import write_json_atomic
+from index_pe import index_pe
+from quote_fetcher import fetch_quotes
+from quote_table import QuoteTable
+from run_metrics import instrumented
+from snapshot_delta import SnapshotLog
+
+def get_stock_data(symbol, info=None):
+    """Fetch stock data from Yahoo Finance, or build it from a prefetched info dict"""
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
+        if info is None:
+            info = fetch_quotes([symbol])[symbol]
         
         pe_ratio = info.get('trailingPE', 0)
         if pe_ratio is None:
@@ -34,9 +40,15 @@ def get_stock_data(symbol):
 
 def get_index_pe(symbol):
     """
-    Calculate P/E ratio for index by getting average P/E of major components
+    Calculate P/E ratio for index from its constituents
+    No constituent files are shipped, so the published P/E below stays
+    authoritative until `python index_pe.py refresh <symbol>` writes one
     """
-    # Predefined P/E ratios for indices based on latest market data
+    pe = index_pe(symbol)
+    if pe is not None:
+        return pe
+    
+    # Published P/E ratios, used for any index without a constituent file
     index_pe_map = {
         '^GSPC': 29.2,      # S&P 500
         '^IXIC': 36.5,      # Nasdaq
@@ -46,11 +58,11 @@ def get_index_pe(symbol):
     
     return index_pe_map.get(symbol, 0)
 
-def get_index_data(symbol, name):
-    """Fetch index data from Yahoo Finance"""
+def get_index_data(symbol, name, info=None):
+    """Fetch index data from Yahoo Finance, or build it from a prefetched info dict"""
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
+        if info is None:
+            info = fetch_quotes([symbol])[symbol]
         
         # Get P/E ratio from predefined map
         pe_ratio = get_index_pe(symbol)
@@ -66,53 +78,85 @@ def get_index_data(symbol, name):
         print(f"Error fetching index {symbol}: {e}")
         return None
 
-def main():
-    print("Starting Yahoo Finance data update...")
-    
-    # Define stocks and indices to fetch
-    stocks = {
-        'US': ['AAPL', 'MSFT', 'GOOGL', 'NVDA', 'TSLA', 'AMZN', 'META', 'JPM', 'BAC', 'GS', 'XOM', 'CVX', 'COP'],
-        'HK': ['0005.HK', '0001.HK', '0939.HK', '0016.HK', '0083.HK', '1113.HK', '0288.HK', '1928.HK', '0700.HK']
-    }
-    
-    indices = {
-        '^GSPC': 'S&P 500',
-        '^IXIC': 'Nasdaq',
-        '^DJI': 'Dow Jones',
-        '^HSI': 'Hang Seng'
-    }
-    
-    # Fetch data
+# Stocks and indices to fetch
+STOCKS = {
+    'US': ['AAPL', 'MSFT', 'GOOGL', 'NVDA', 'TSLA', 'AMZN', 'META', 'JPM', 'BAC', 'GS', 'XOM', 'CVX', 'COP'],
+    'HK': ['0005.HK', '0001.HK', '0939.HK', '0016.HK', '0083.HK', '1113.HK', '0288.HK', '1928.HK', '0700.HK']
+}
+
+INDICES = {
+    '^GSPC': 'S&P 500',
+    '^IXIC': 'Nasdaq',
+    '^DJI': 'Dow Jones',
+    '^HSI': 'Hang Seng'
+}
+
+# market_data.json stock keys -> QuoteTable columns
+STOCK_FIELDS = {
+    'symbol': 'symbol',
+    'pe_ratio': 'pe',
+    'price': 'price',
+    'change_percent': 'change_percent',
+    'market_cap': 'market_cap',
+    'name': 'name',
+}
+
+def all_symbols():
+    return [s for symbols in STOCKS.values() for s in symbols] + list(INDICES)
+
+def collect_market_data(quotes):
+    """Build the market_data.json payload from prefetched quotes"""
+    regions = {symbol: region for region, symbols in STOCKS.items() for symbol in symbols}
+    table = QuoteTable.from_quotes({s: quotes.get(s) for s in regions}, regions)
     stock_data = {}
-    for region, symbols in stocks.items():
-        stock_data[region] = {}
-        for symbol in symbols:
-            data = get_stock_data(symbol)
-            if data:
-                stock_data[region][symbol] = data
-                print(f"✓ {symbol}: P/E={data['pe_ratio']}, Price=${data['price']}, Change={data['change_percent']}%")
+    for region, symbols in STOCKS.items():
+        stock_data[region] = table.where(region=region).to_dicts(STOCK_FIELDS)
+        for symbol, data in stock_data[region].items():
+            print(f"✓ {symbol}: P/E={data['pe_ratio']}, Price=${data['price']}, Change={data['change_percent']}%")
     
     index_data = {}
-    for symbol, name in indices.items():
-        data = get_index_data(symbol, name)
+    for symbol, name in INDICES.items():
+        if quotes.get(symbol) is None:
+            continue
+        data = get_index_data(symbol, name, quotes[symbol])
         if data:
             index_data[name] = data
             print(f"✓ {name}: P/E={data['pe_ratio']}, Price=${data['price']}, Change={data['change_percent']}%")
     
-    # Save to JSON file in current directory
-    output = {
+    return {
         'timestamp': datetime.now().isoformat(),
         'stocks': stock_data,
         'indices': index_data
     }
+
+def published_seq(path):
+    """Snapshot sequence number recorded in an existing market_data.json"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get('snapshot_seq')
+    except (FileNotFoundError, ValueError):
+        return None
+
+def main():
+    print("Starting Yahoo Finance data update...")
+    
+    # Fetch all quotes in one concurrent batch
+    log = SnapshotLog()
+    state, delta = log.publish(fetch_quotes(all_symbols()))
     
     # Use current working directory instead of /home/ubuntu
     output_path = 'market_data.json'
-    with open(output_path, 'w') as f:
-        json.dump(output, f, indent=2)
+    if delta is None and published_seq(output_path) == log.latest:
+        print(f"\n✓ No quote moved beyond tolerance, {output_path} left as is")
+        return
+    
+    output = collect_market_data(state)
+    output['snapshot_seq'] = log.latest
+    write_json_atomic(output_path, output, indent=2)
     
     print(f"\n✓ Data saved to {output_path}")
     print(f"Update time: {output['timestamp']}")
 
 if __name__ == '__main__':
-    main()
+    with instrumented('update_data'):
+        main()
@@ -4,16 +4,21 @@ Enhanced Yahoo Finance Data Updater
 Updates indices P/E ratios, stock prices, and comparison tool data
 """
 
-import yfinance as yf
-import re
-import json
 from datetime import datetime
 
-def get_stock_data(symbol):
-    """Fetch stock P/E ratio and price"""
+from data_bundle import publish
+from fund_valuation import fund_valuation_section, holding_symbols, load_holdings
+from index_pe import index_pe
+from quote_fetcher import fetch_quotes
+from quote_table import QuoteTable
+from run_metrics import instrumented
+from valuation_bands import BandTracker
+
+def get_stock_data(symbol, info=None):
+    """Fetch stock P/E ratio and price, or read them from a prefetched info dict"""
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
+        if info is None:
+            info = fetch_quotes([symbol])[symbol]
         pe = info.get('trailingPE', 0)
         price = info.get('currentPrice', 0)
         return {
@@ -24,7 +29,15 @@ def get_stock_data(symbol):
         return {'pe': 0, 'price': 0}
 
 def get_index_pe(symbol):
-    """Get P/E ratio for index"""
+    """
+    Get P/E ratio for index, computed from constituents when available
+    No constituent files are shipped, so the published P/E below stays
+    authoritative until `python index_pe.py refresh <symbol>` writes one
+    """
+    pe = index_pe(symbol)
+    if pe is not None:
+        return pe
+    # Published P/E ratios, used for any index without a constituent file
     index_pe_map = {
         '^GSPC': 29.2,      # S&P 500
         '^IXIC': 36.5,      # Nasdaq
@@ -33,154 +46,120 @@ def get_index_pe(symbol):
     }
     return index_pe_map.get(symbol, 0)
 
-def update_html_file():
-    """Update HTML file with latest market data"""
-    
-    print("Starting enhanced market data update...")
-    
-    # Define indices
-    indices = {
-        '^GSPC': 'S&P 500',
-        '^IXIC': 'Nasdaq',
-        '^DJI': 'Dow Jones',
-        '^HSI': 'Hang Seng'
-    }
-    
-    # Common stocks for comparison tool
-    common_stocks = {
-        'AAPL': 'Apple',
-        'MSFT': 'Microsoft',
-        'GOOGL': 'Google',
-        'NVDA': 'NVIDIA',
-        'TSLA': 'Tesla',
-        'AMZN': 'Amazon',
-        'META': 'Meta',
-        'JPM': 'JPMorgan',
-        'BAC': 'Bank of America',
-        'GS': 'Goldman Sachs',
-        'XOM': 'ExxonMobil',
-        'CVX': 'Chevron',
-        'COP': 'ConocoPhillips',
-        '0005.HK': 'HSBC',
-        '0001.HK': '中銀香港',
-        '0939.HK': '中國銀行',
-        '0016.HK': '新世界',
-        '0083.HK': '信和置業',
-        '1113.HK': '長實集團',
-        '0288.HK': '恒安國際',
-        '1928.HK': '金沙中國',
-        '0700.HK': '騰訊控股'
-    }
-    
+# Indices shown on the page
+INDICES = {
+    '^GSPC': 'S&P 500',
+    '^IXIC': 'Nasdaq',
+    '^DJI': 'Dow Jones',
+    '^HSI': 'Hang Seng'
+}
+
+# Common stocks for comparison tool
+COMMON_STOCKS = {
+    'AAPL': 'Apple',
+    'MSFT': 'Microsoft',
+    'GOOGL': 'Google',
+    'NVDA': 'NVIDIA',
+    'TSLA': 'Tesla',
+    'AMZN': 'Amazon',
+    'META': 'Meta',
+    'JPM': 'JPMorgan',
+    'BAC': 'Bank of America',
+    'GS': 'Goldman Sachs',
+    'XOM': 'ExxonMobil',
+    'CVX': 'Chevron',
+    'COP': 'ConocoPhillips',
+    '0005.HK': 'HSBC',
+    '0001.HK': '中銀香港',
+    '0939.HK': '中國銀行',
+    '0016.HK': '新世界',
+    '0083.HK': '信和置業',
+    '1113.HK': '長實集團',
+    '0288.HK': '恒安國際',
+    '1928.HK': '金沙中國',
+    '0700.HK': '騰訊控股'
+}
+
+# stock_prices keys -> QuoteTable columns
+PRICE_FIELDS = {'pe': 'pe', 'price': 'price'}
+
+def quote_symbols(funds):
+    """Comparison-tool stocks plus names held by the tracked 13F funds"""
+    return list(COMMON_STOCKS) + [s for s in holding_symbols(funds) if s not in COMMON_STOCKS]
+
+def build_market_sections(quotes, funds):
+    """
+    Bundle sections for indices, stock prices and valuation bands
+
+    Returns:
+        (sections, holding_quotes) where holding_quotes covers every quoted
+        symbol in get_stock_data form, for the fund valuation
+    """
     # Fetch index P/E ratios
     index_data = {}
-    for symbol, name in indices.items():
+    for symbol, name in INDICES.items():
         pe = get_index_pe(symbol)
         index_data[name] = pe
         print(f"✓ {name}: P/E={pe}")
     
-    # Fetch stock data
-    stock_data = {}
-    print("\nFetching stock data...")
-    for symbol, name in common_stocks.items():
-        data = get_stock_data(symbol)
-        stock_data[symbol] = data
+    table = QuoteTable.from_quotes({s: quotes.get(s) or {} for s in quote_symbols(funds)})
+    holding_quotes = table.to_dicts(PRICE_FIELDS)
+    stock_data = {symbol: holding_quotes[symbol] for symbol in COMMON_STOCKS}
+    for symbol, data in stock_data.items():
         print(f"✓ {symbol}: P/E={data['pe']}, Price=${data['price']}")
     
-    # Read HTML file
-    try:
-        with open('dist/index.html', 'r', encoding='utf-8') as f:
-            html_content = f.read()
-    except FileNotFoundError:
-        print("Error: dist/index.html not found")
-        return False
-    
-    # Update index P/E ratios in dashboard
-    # S&P 500 (color: #667eea)
-    html_content = re.sub(
-        r'(<div style="font-size: 1\.5em; font-weight: bold; color: #667eea; margin: 10px 0;">)[\d.]+(<\/div>)',
-        rf'\g<1>{index_data["S&P 500"]}\g<2>',
-        html_content,
-        count=1
-    )
-    
-    # Nasdaq (color: #764ba2)
-    html_content = re.sub(
-        r'(<div style="font-size: 1\.5em; font-weight: bold; color: #764ba2; margin: 10px 0;">)[\d.]+(<\/div>)',
-        rf'\g<1>{index_data["Nasdaq"]}\g<2>',
-        html_content,
-        count=1
-    )
-    
-    # Hang Seng (color: #22c55e)
-    html_content = re.sub(
-        r'(<div style="font-size: 1\.5em; font-weight: bold; color: #22c55e; margin: 10px 0;">)[\d.]+(<\/div>)',
-        rf'\g<1>{index_data["Hang Seng"]}\g<2>',
-        html_content,
-        count=1
-    )
-    
-    # Dow Jones (color: #f97316)
-    html_content = re.sub(
-        r'(<div style="font-size: 1\.5em; font-weight: bold; color: #f97316; margin: 10px 0;">)[\d.]+(<\/div>)',
-        rf'\g<1>{index_data["Dow Jones"]}\g<2>',
-        html_content,
-        count=1
-    )
-    
-    # Update stock data in comparison tool
-    # Create JavaScript data object
-    stock_data_js = "const stockPriceData = " + json.dumps(stock_data) + ";"
-    
-    # Replace or add stock data script
-    if 'const stockPriceData' in html_content:
-        html_content = re.sub(
-            r'const stockPriceData = \{[^}]*\};',
-            stock_data_js,
-            html_content
-        )
-    else:
-        # Add before the closing script tag
-        html_content = html_content.replace(
-            '</script>\n</body>',
-            f'\n    {stock_data_js}\n</script>\n</body>'
-        )
+    # Extend each stock's rolling valuation bands with today's P/E
+    tracker = BandTracker.load()
+    today = datetime.now().strftime('%Y-%m-%d')
+    for symbol, data in stock_data.items():
+        if data['pe'] > 0:
+            tracker.append(symbol, data['pe'], key=today)
+    tracker.save()
+    
+    sections = {
+        'indices': {
+            name: {'symbol': symbol, 'name': name, 'pe_ratio': index_data[name]}
+            for symbol, name in INDICES.items()
+        },
+        # Stock data for the comparison tool
+        'stock_prices': stock_data,
+        # Every held symbol, so fund valuations can be redone from the bundle
+        'holding_quotes': holding_quotes,
+        'valuation_bands': tracker.snapshot(),
+    }
+    return sections, holding_quotes
+
+def update_html_file():
+    """Publish latest market data to the data bundle referenced by the HTML file"""
     
-    # Update timestamp
-    timestamp = datetime.now().strftime('%Y年%m月%d日')
-    html_content = re.sub(
-        r'發布日期：\d{4}年\d{2}月\d{2}日',
-        f'發布日期：{timestamp}',
-        html_content
-    )
+    print("Starting enhanced market data update...")
     
-    # Update data source with time
-    update_time = datetime.now().strftime('%H:%M UTC')
-    html_content = re.sub(
-        r'數據來源：[^<]+',
-        f'數據來源：Yahoo Finance (更新於 {update_time})',
-        html_content
-    )
+    # Fetch stock data, plus quotes for names held by the tracked 13F funds
+    print("\nFetching stock data...")
+    funds = load_holdings()
+    quotes = fetch_quotes(quote_symbols(funds))
+    return publish_market_data(quotes, funds)
+
+def publish_market_data(quotes, funds):
+    """Build the market sections from quotes and publish them with the fund valuation"""
+    sections, holding_quotes = build_market_sections(quotes, funds)
     
-    # Add last update time as a data attribute (for JavaScript to read)
-    last_update_time = datetime.now().isoformat()
-    html_content = re.sub(
-        r'<body>',
-        f'<body data-last-update="{last_update_time}">',
-        html_content
-    )
+    # Fresh quotes change every fund's portfolio P/E
+    fund_valuation = fund_valuation_section(funds, holding_quotes, sections['indices'])
+    if fund_valuation:
+        sections['fund_valuation'] = fund_valuation
     
-    # Write updated HTML
+    # Publish to the data bundle; the page only references its hash
     try:
-        with open('dist/index.html', 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        print("\n✓ HTML file updated successfully")
-        print(f"Update time: {last_update_time}")
+        publish(sections)
+        print("\n✓ Market data published successfully")
+        print(f"Update time: {datetime.now().isoformat()}")
         return True
     except Exception as e:
-        print(f"Error writing HTML file: {e}")
+        print(f"Error publishing market data: {e}")
         return False
 
 if __name__ == '__main__':
-    success = update_html_file()
+    with instrumented('update_market_data'):
+        success = update_html_file()
     exit(0 if success else 1)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Rolling valuation bands with incremental updates
+Maintains rolling mean/std/percentile bands (5y, 10y, 20y by default) for
+every P/E series and tracked stock. Appending an observation updates each
+window from running sums plus a sorted window buffer, so the cost depends
+on the window length but not on the length of the history. Window state is persisted between
+runs in data/valuation_bands.json so each run only appends new values.
+"""
+
+import bisect
+import json
+import math
+import sys
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+from atomic_io import write_json_atomic
+
+STATE_FILE = 'data/valuation_bands.json'
+WINDOW_YEARS = (5, 10, 20)
+BAND_PERCENTILES = (10, 50, 90)
+
+
+class RollingWindow:
+    """
+    Fixed-size window with O(1) mean/std and percentile lookups
+
+    Each update is O(window): the sorted buffer is a plain list, so
+    insort/del find the slot in O(log n) but shift the elements after it.
+    For the window sizes used here (at most a few thousand values) that
+    shift is a single memmove and stays well under the cost of a re-sort.
+    """
+
+    def __init__(self, size: int, values: Iterable[float] = ()):
+        self.size = size
+        self.buffer = deque()
+        self.sorted = []
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._since_resum = 0
+        for value in values:
+            self.push(value)
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def push(self, value: float) -> None:
+        self.buffer.append(value)
+        bisect.insort(self.sorted, value)
+        self.total += value
+        self.total_sq += value * value
+        if len(self.buffer) > self.size:
+            self._remove(self.buffer.popleft())
+        self._track_drift()
+
+    def replace_last(self, value: float) -> None:
+        """Replace the newest value in place (a same-day observation), never evicting"""
+        self._remove(self.buffer[-1])
+        self.buffer[-1] = value
+        bisect.insort(self.sorted, value)
+        self.total += value
+        self.total_sq += value * value
+        self._track_drift()
+
+    def _remove(self, value: float) -> None:
+        del self.sorted[bisect.bisect_left(self.sorted, value)]
+        self.total -= value
+        self.total_sq -= value * value
+
+    def _track_drift(self) -> None:
+        # Re-sum once per window length so float error cannot accumulate;
+        # amortized this stays constant time per update
+        self._since_resum += 1
+        if self._since_resum >= self.size:
+            self.total = math.fsum(self.buffer)
+            self.total_sq = math.fsum(v * v for v in self.buffer)
+            self._since_resum = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self.buffer) >= self.size
+
+    def mean(self) -> float:
+        return self.total / len(self.buffer) if self.buffer else float('nan')
+
+    def std(self) -> float:
+        if not self.buffer:
+            return float('nan')
+        mean = self.mean()
+        return math.sqrt(max(self.total_sq / len(self.buffer) - mean * mean, 0.0))
+
+    def percentile(self, q: float) -> float:
+        if not self.sorted:
+            return float('nan')
+        position = (len(self.sorted) - 1) * q / 100.0
+        lower = int(position)
+        upper = min(lower + 1, len(self.sorted) - 1)
+        return self.sorted[lower] + (self.sorted[upper] - self.sorted[lower]) * (position - lower)
+
+
+class ValuationBands:
+    """Rolling bands over several window lengths for one series"""
+
+    def __init__(self, periods_per_year: int = 12, values: Iterable[float] = (),
+                 last_key: Optional[str] = None):
+        self.periods_per_year = periods_per_year
+        self.last_key = last_key
+        values = list(values)
+        self.windows = {
+            f'{years}y': RollingWindow(years * periods_per_year,
+                                       values[-years * periods_per_year:])
+            for years in WINDOW_YEARS
+        }
+
+    def append(self, value: float, key: Optional[str] = None) -> None:
+        """
+        Add an observation
+
+        Args:
+            value: New observation
+            key: Period label such as a date; a repeated key replaces the
+                previous observation instead of adding a new one
+        """
+        replace = key is not None and key == self.last_key
+        for window in self.windows.values():
+            if replace and len(window):
+                window.replace_last(value)
+            else:
+                window.push(value)
+        self.last_key = key
+
+    def bands(self) -> Dict[str, Dict[str, Optional[float]]]:
+        def clean(value):
+            return round(value, 2) if math.isfinite(value) else None
+
+        result = {}
+        for name, window in self.windows.items():
+            mean, std = window.mean(), window.std()
+            band = {
+                'mean': clean(mean),
+                'std': clean(std),
+                'upper': clean(mean + 2 * std),
+                'lower': clean(mean - 2 * std),
+                'observations': len(window),
+                'complete': window.full,
+            }
+            band.update({f'p{q}': clean(window.percentile(q)) for q in BAND_PERCENTILES})
+            result[name] = band
+        return result
+
+    def history(self):
+        """Values needed to restore the largest window"""
+        return list(max(self.windows.values(), key=lambda w: w.size).buffer)
+
+
+class BandTracker:
+    """Valuation bands for many series, persisted between runs"""
+
+    def __init__(self, path: str = STATE_FILE):
+        self.path = path
+        self.series: Dict[str, ValuationBands] = {}
+
+    @classmethod
+    def load(cls, path: str = STATE_FILE) -> 'BandTracker':
+        tracker = cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return tracker
+        for name, entry in state.items():
+            tracker.series[name] = ValuationBands(
+                entry['periods_per_year'], entry['values'], entry.get('last_key')
+            )
+        return tracker
+
+    def save(self) -> None:
+        state = {
+            name: {
+                'periods_per_year': bands.periods_per_year,
+                'last_key': bands.last_key,
+                'values': bands.history(),
+            }
+            for name, bands in self.series.items()
+        }
+        write_json_atomic(self.path, state, separators=(',', ':'))
+
+    def append(self, name: str, value: float, key: Optional[str] = None,
+               periods_per_year: int = 252) -> None:
+        if name not in self.series:
+            self.series[name] = ValuationBands(periods_per_year)
+        self.series[name].append(value, key)
+
+    def snapshot(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        names = self.series if names is None else names
+        return {name: self.series[name].bands() for name in names if name in self.series}
+
+
+def seed_from_store(tracker: BandTracker) -> None:
+    """Rebuild the P/E series windows from the columnar store (one-off)"""
+    from pe_statistics import load_series
+
+    timestamps, names, matrix = load_series()
+    keys = [str(t)[:10] for t in timestamps]
+    for i, name in enumerate(names):
+        values = [float(v) for v in matrix[:, i] if v == v]
+        tracker.series[name] = ValuationBands(12, values, keys[-1])
+
+
+if __name__ == '__main__':
+    # python valuation_bands.py seed    rebuild P/E series bands from the store
+    # python valuation_bands.py         print the current bands
+    tracker = BandTracker.load()
+    if sys.argv[1:2] == ['seed']:
+        seed_from_store(tracker)
+        tracker.save()
+        print(f"✓ Seeded {len(tracker.series)} series into {tracker.path}")
+    for series_name, series_bands in tracker.snapshot().items():
+        ten_year = series_bands.get('10y', {})
+        print(f"✓ {series_name}: 10y mean={ten_year.get('mean')}, "
+              f"band=[{ten_year.get('lower')}, {ten_year.get('upper')}]")